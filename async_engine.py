@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Motor asyncio para ejecutar tests de SQL injection de forma concurrente
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from http_parser import HttpRequest, AsyncRequestHandler
+
+class AsyncScanEngine:
+    """Ejecuta los tests parámetro × payload concurrentemente con un límite de requests en vuelo
+
+    El motor vive lo mismo que el scanner: un event loop en un thread propio y un único cliente httpx
+    que reutilizan todos los targets (también los scans simultáneos del batch). close() los libera.
+    """
+
+    def __init__(self, scanner, max_in_flight: int = None, max_connections: int = None):
+        self.scanner = scanner
+        self.max_in_flight = max_in_flight or int(os.getenv("MAX_IN_FLIGHT", "10"))
+        # Límite del cliente compartido: varios targets del batch pueden escanearse a la vez
+        self.max_connections = max(max_connections or self.max_in_flight, self.max_in_flight)
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.handler = None
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        """Arranca el event loop la primera vez que se usa"""
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                # Pool de asyncio.to_thread (detecciones bloqueantes) compartido por todos los scans
+                loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_connections,
+                                                             thread_name_prefix='async-detect'))
+                self.thread = threading.Thread(target=loop.run_forever, name='async-engine', daemon=True)
+                self.thread.start()
+                self.loop = loop
+            return self.loop
+
+    def run(self, request: HttpRequest, plan: Dict[str, List[str]], baseline=None, state: Dict = None) -> Dict:
+        """Punto de entrada síncrono: ejecuta el scan en el loop del motor y devuelve los resultados"""
+        future = asyncio.run_coroutine_threadsafe(self.scan(request, plan, baseline, state), self._start())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()  # Ctrl+C u otro error en el llamante: se cancelan los tests del target
+            raise
+
+    def close(self):
+        """Cierra el cliente httpx y detiene el event loop"""
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+        if self.handler is not None:
+            asyncio.run_coroutine_threadsafe(self.handler.close(), loop).result()
+            self.handler = None
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join()
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+    def _get_handler(self) -> AsyncRequestHandler:
+        """Handler compartido, creado dentro del loop (solo se llama desde el thread del loop)"""
+        if self.handler is None:
+            self.handler = AsyncRequestHandler(
+                max_connections=self.max_connections,
+                stream=self.scanner.stream_responses,
+                signature_engine=self.scanner.manual_detector.engine,
+                host_control=self.scanner.host_control,
+                transport=self.scanner.transport
+            )
+        return self.handler
+
+    async def scan(self, request: HttpRequest, plan: Dict[str, List[str]], baseline=None, state: Dict = None) -> Dict:
+        """Lanza los workers y cancela el trabajo pendiente al encontrar una vulnerabilidad"""
+        handler = self._get_handler()
+        if state is None:
+            state = self.scanner.new_scan_state(request)
+        # Plan: payloads de cada parámetro; los tests ya completados en el journal no se repiten
+        work = (
+            (param_name, payload)
+            for param_name, payloads in plan.items() for payload in payloads
+            if (param_name, payload) not in state['completed']
+        )
+        stop = asyncio.Event()
+        if state['vulnerabilities']:
+            stop.set()  # Vulnerabilidad recuperada del journal: parada temprana
+
+        workers = [
+            asyncio.create_task(self._worker(handler, request, work, stop, state, baseline))
+            for _ in range(self.max_in_flight)
+        ]
+        stop_waiter = asyncio.create_task(stop.wait())
+
+        all_workers = asyncio.gather(*workers)
+
+        try:
+            # Esperar a que terminen todos los workers o a la parada temprana
+            await asyncio.wait([all_workers, stop_waiter], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Cancelar los tests pendientes
+            for task in workers + [stop_waiter]:
+                task.cancel()
+            await asyncio.gather(all_workers, stop_waiter, return_exceptions=True)
+
+        return state
+
+    async def _worker(self, handler: AsyncRequestHandler, request: HttpRequest, work, stop: asyncio.Event, state: Dict,
+                      baseline=None):
+        """Consume pares (parámetro, payload) del iterador compartido hasta agotarlo o parar"""
+        for param_name, payload in work:
+            if stop.is_set():
+                return
+
+            print(f"\n--- Test {state['total_tests'] + 1} | {param_name} ---")
+            test_result = await handler.test_parameter(request, param_name, payload)
+            if test_result.get('error') == 'circuit_open':
+                # Host caído: se cancelan los tests pendientes en lugar de esperar cada timeout
+                print(f"[CIRCUIT] {test_result['error_details']}. Deteniendo el scan del target")
+                state['circuit_open'] = True
+                stop.set()
+                return
+            self.scanner.record_test(state, test_result)
+
+            if 'error' in test_result:
+                self.scanner.log_test_error(test_result, payload)
+                self.scanner.finish_test(state, param_name, test_result)
+                continue
+
+            if self.scanner.matches_baseline(baseline, test_result, payload):
+                self.scanner.record_stage(state, 'baseline')
+                self.scanner.finish_test(state, param_name, test_result)
+                continue
+
+            # Las detecciones son bloqueantes (OpenAI, recheck, espera al cluster), se ejecutan en un thread
+            analysis = await asyncio.to_thread(
+                self.scanner.analyze_test,
+                state,
+                param_name,
+                test_result,
+                request,
+                baseline
+            )
+            self.scanner.finish_test(state, param_name, test_result, analysis)
+
+            if stop.is_set():
+                return
+
+            self.scanner.record_stage(state, analysis.get('decided_by', 'unknown'))
+
+            if self.scanner.is_finding(analysis):
+                print(f"[VULNERABILIDAD] ¡DETECTADA! Cancelando tests pendientes...")
+                print(f"   Parámetro: {param_name}")
+                print(f"   Payload: {payload}")
+                print(f"   Confianza: {analysis.get('confidence', 0)}")
+
+                vuln_data = self.scanner.build_vulnerability(test_result, analysis, payload)
+                vuln_data['parameter'] = param_name
+                self.scanner.add_vulnerability(state, vuln_data, request, test_result, analysis, baseline)
+                stop.set()
+                return
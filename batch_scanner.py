@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Modo batch: escanea múltiples requests desde un JSONL o un directorio
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+from http_parser import HttpRequest
+from traffic_import import RequestFilter, iter_import, raw_request_summary, source_format
+
+def iter_batch_requests(source: str, request_filter: RequestFilter = None) -> Iterator[Tuple[str, str]]:
+    """Lee las requests raw de forma incremental y devuelve pares (target_id, raw_request)
+
+    - JSONL: una línea por target con la clave "raw_request" (opcional "id")
+    - Directorio: cada archivo .txt es una request raw
+    - HAR o XML de Burp: exportaciones de proxy leídas en streaming (traffic_import.py)
+    Con request_filter solo pasan las requests del host, método y content-type indicados.
+    """
+    if request_filter is not None and request_filter.is_empty():
+        request_filter = None
+    source_type = source_format(source)
+    if source_type in ('har', 'burp'):
+        # El importador filtra antes de construir la request raw
+        yield from iter_import(source, request_filter, source_type)
+        return
+    for target_id, raw_request in _iter_raw_requests(source, source_type):
+        if request_filter is not None and isinstance(raw_request, str) and \
+                not request_filter.matches(*raw_request_summary(raw_request)):
+            continue
+        yield target_id, raw_request
+
+def _iter_raw_requests(source: str, source_type: str) -> Iterator[Tuple[str, str]]:
+    if source_type == 'dir':
+        for filename in sorted(os.listdir(source)):
+            if not filename.endswith('.txt'):
+                continue
+            path = os.path.join(source, filename)
+            with open(path, 'r', encoding='utf-8') as f:
+                yield filename, f.read()
+        return
+
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line-{line_number}", {'error': f"JSON inválido: {str(e)}"}
+                continue
+            if isinstance(entry, str):
+                yield f"line-{line_number}", entry
+            else:
+                target_id = str(entry.get('id', entry.get('request_id', f"line-{line_number}")))
+                yield target_id, entry.get('raw_request', entry.get('request', {'error': "Falta la clave 'raw_request'"}))
+
+def write_when_rechecked(report, result: Dict, rechecks: List):
+    """Escribe el registro del target cuando terminan sus rechecks, sin bloquear a los workers del batch
+
+    El recheck completa los hallazgos del reporte en su sitio, así que el registro lleva su resultado.
+    """
+    if not rechecks:
+        report.target(result)
+        return
+    lock = threading.Lock()
+    remaining = [len(rechecks)]
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            report.target(result)
+
+    for future in rechecks:
+        future.add_done_callback(done)
+
+class BatchScanner:
+    """Escanea muchos targets con un pool de workers acotado y límites por host"""
+
+    def __init__(self, scanner, workers: int = 4, per_host: int = 2, request_filter: RequestFilter = None):
+        # Un único scanner: la sesión HTTP y los clientes de detección se comparten entre targets
+        self.scanner = scanner
+        self.workers = workers
+        self.per_host = per_host
+        self.request_filter = request_filter
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def _host_slot(self, host: str) -> threading.Semaphore:
+        """Devuelve el semáforo que limita los scans concurrentes contra un host"""
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host)
+            return self._host_slots[host]
+
+    def scan_target(self, target_id: str, raw_request, payloads: List[str], rechecks: List = None) -> Dict:
+        """Escanea un target respetando el límite de concurrencia de su host
+
+        rechecks recibe los futures de los rechecks del target que siguen en curso al terminar el scan.
+        """
+        if isinstance(raw_request, dict):
+            return {'target_id': target_id, 'status': 'error', 'error': raw_request['error']}
+
+        try:
+            request = HttpRequest(raw_request, scheme=self.scanner.scheme)
+        except Exception as e:
+            return {'target_id': target_id, 'status': 'error', 'error': f"Request inválida: {str(e)}"}
+
+        host = urlparse(request.url).netloc
+        with self._host_slot(host):
+            try:
+                result = self.scanner.scan_request(request, payloads, rechecks=rechecks)
+            except Exception as e:
+                return {'target_id': target_id, 'target_url': request.url, 'status': 'error', 'error': str(e)}
+
+        result['target_id'] = target_id
+        return result
+
+    def run(self, source: str, payloads: List[str]) -> Dict:
+        """Procesa el origen en streaming y escribe un registro por target en el reporte del scanner"""
+        start_time = time.time()
+        summary = {'targets_scanned': 0, 'vulnerable': 0, 'secure': 0, 'errors': 0}
+        max_pending = self.workers * 2  # Ventana acotada: no se cargan todos los targets en memoria
+
+        report = self.scanner.report_sink
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}  # Future del scan -> futures de sus rechecks
+
+            def drain(return_when):
+                done, _ = wait(list(pending), return_when=return_when)
+                for future in done:
+                    rechecks = pending.pop(future)
+                    result = future.result()
+                    summary['targets_scanned'] += 1
+                    status = result.get('status', 'error')
+                    summary[status if status in ('vulnerable', 'secure') else 'errors'] += 1
+                    print(f"[BATCH] {result['target_id']} → {status}")
+                    write_when_rechecked(report, result, rechecks)
+
+            for target_id, raw_request in iter_batch_requests(source, self.request_filter):
+                if len(pending) >= max_pending:
+                    drain(FIRST_COMPLETED)
+                rechecks = []
+                pending[executor.submit(self.scan_target, target_id, raw_request, payloads, rechecks)] = rechecks
+
+            if pending:
+                drain(ALL_COMPLETED)
+
+        if self.request_filter is not None:
+            summary['filtered'] = self.request_filter.rejected
+        summary['execution_time'] = round(time.time() - start_time, 2)
+        return summary
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modo batch: threads en un proceso (BatchScanner) frente a coordinador con N procesos
+
+Levanta la aplicación mock con páginas grandes (el análisis de cada respuesta pesa en CPU), genera
+un batch de targets con un parámetro seguro y otro vulnerable y mide targets/s en cada modo.
+
+Uso: python benchmarks/bench_distributed.py [--targets N] [--page-kb KB] [--processes 1,2,4] [--verbose]
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main import SQLInjectionScanner, get_option
+from batch_scanner import BatchScanner
+from coordinator import Coordinator
+from report_sink import ReportSink
+from http_parser import PayloadManager
+from mock_app import MockApp
+
+# Sin LLM: el benchmark mide el reparto de CPU, no la latencia de la API
+SCANNER_OPTIONS = {'enable_cache': False, 'journal_file': None, 'adaptive_payloads': False,
+                   'injection_points': ['query']}
+
+def write_batch(app: MockApp, path: str, targets: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(targets):
+            f.write(json.dumps({'id': f"t{index}", 'raw_request': app.raw_request({'cat': str(index), 'artist': '1'})})
+                    + "\n")
+
+@contextlib.contextmanager
+def quiet(verbose: bool):
+    """Silencia la salida del scanner, también la de los procesos hijo (heredan el descriptor 1)"""
+    if verbose:
+        yield
+        return
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+def main():
+    targets = int(get_option('--targets', '24'))
+    page_kb = int(get_option('--page-kb', '512'))
+    process_counts = sorted({int(count) for count in get_option('--processes', f"1,2,{os.cpu_count() or 1}").split(',')})
+    verbose = '--verbose' in sys.argv
+    payloads = PayloadManager(os.path.join(ROOT, 'payloads.txt')).payloads
+    os.environ['DETECTION_STAGES'] = 'benign,regex,triage'
+
+    app = MockApp(page_kb=page_kb).start()
+    work_dir = tempfile.TemporaryDirectory()
+    batch_file = os.path.join(work_dir.name, 'batch.jsonl')
+    write_batch(app, batch_file, targets)
+    print(f"[BENCH] Targets: {targets} | Página: {page_kb} KB | Payloads: {len(payloads)} | CPUs: {os.cpu_count()}")
+    print(f"\n{'Modo':<22} {'Targets/s':>10} {'Total s':>8} {'Vulnerables':>12}")
+
+    try:
+        report_file = os.path.join(work_dir.name, 'threads.jsonl')
+        scanner = SQLInjectionScanner(pool_size=8, report_file=report_file, **SCANNER_OPTIONS)
+        scanner.wait_for_rechecks = False
+        start = time.perf_counter()
+        with quiet(verbose):
+            summary = BatchScanner(scanner, workers=8, per_host=8).run(batch_file, payloads)
+        elapsed = time.perf_counter() - start
+        scanner.close()
+        print(f"{'threads (8)':<22} {targets / elapsed:>10.1f} {elapsed:>8.2f} {summary['vulnerable']:>12}")
+
+        for processes in process_counts:
+            report_sink = ReportSink(os.path.join(work_dir.name, f"processes-{processes}.jsonl"))
+            coordinator = Coordinator(os.path.join(work_dir.name, f"queue-{processes}.sqlite3"), SCANNER_OPTIONS,
+                                      report_sink, processes)
+            start = time.perf_counter()
+            with quiet(verbose):
+                summary = coordinator.run(batch_file, payloads)
+            elapsed = time.perf_counter() - start
+            report_sink.close()
+            print(f"{f'coordinador ({processes} proc.)':<22} {targets / elapsed:>10.1f} {elapsed:>8.2f} "
+                  f"{summary['vulnerable']:>12}")
+    finally:
+        app.stop()
+        work_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
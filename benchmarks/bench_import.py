@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark del importador HAR: entradas/s y pico de RSS frente al tamaño de la exportación
+
+Genera HAR sintéticos (requests GET/POST a varios hosts con respuestas embebidas de --body-kb KB)
+y los lee en un proceso hijo con el importador en streaming y, como referencia, con json.load.
+El RSS del importador debe mantenerse plano al crecer el archivo; el de json.load crece con él.
+
+Uso: python benchmarks/bench_import.py [--entries 2000,20000] [--body-kb 4] [--no-baseline]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import get_option
+
+# El hijo cuenta las requests (filtradas por host) y devuelve el tiempo y el pico de RSS
+CHILD_CODE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+if {mode!r} == 'streaming':
+    from batch_scanner import iter_batch_requests
+    from traffic_import import RequestFilter
+    count = sum(1 for _ in iter_batch_requests({path!r}, RequestFilter.from_options(hosts='*.shop.test')))
+else:
+    with open({path!r}, 'r', encoding='utf-8') as f:
+        count = sum(1 for entry in json.load(f)['log']['entries'] if entry['request']['url'].split('/')[2].endswith('.shop.test'))
+elapsed = time.perf_counter() - start
+print(json.dumps({{'count': count, 'seconds': elapsed, 'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+def write_har(path: str, entries: int, body_kb: int):
+    """HAR sintético escrito entrada a entrada (el generador tampoco carga el archivo completo)"""
+    body = 'x' * (body_kb * 1024)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"log": {"version": "1.2", "creator": {"name": "bench"}, "pages": [], "entries": [\n')
+        for index in range(entries):
+            host = ('api', 'www', 'cdn')[index % 3] + '.shop.test' if index % 4 else 'tracker.ads.test'
+            request = {'method': 'POST' if index % 5 == 0 else 'GET',
+                       'url': f"https://{host}/items.php?id={index}&page=2", 'httpVersion': 'HTTP/2',
+                       'headers': [{'name': ':authority', 'value': host}, {'name': 'cookie', 'value': f"s={index}"}],
+                       'queryString': []}
+            if request['method'] == 'POST':
+                request['postData'] = {'mimeType': 'application/json', 'text': json.dumps({'id': index})}
+            entry = {'startedDateTime': '2024-01-01T00:00:00Z', 'request': request,
+                     'response': {'status': 200, 'content': {'size': len(body), 'text': body}}}
+            f.write(('' if index == 0 else ',\n') + json.dumps(entry))
+        f.write('\n]}}\n')
+
+def measure(path: str, mode: str) -> dict:
+    code = CHILD_CODE.format(root=ROOT, mode=mode, path=path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    sizes = [int(size) for size in get_option('--entries', '2000,20000').split(',')]
+    body_kb = int(get_option('--body-kb', '4'))
+    modes = ['streaming'] if '--no-baseline' in sys.argv else ['streaming', 'json.load']
+
+    print(f"[BENCH] Respuestas embebidas: {body_kb} KB | Filtro: *.shop.test")
+    print(f"\n{'Entradas':>9} {'MB':>7} {'Modo':<10} {'Requests':>9} {'Entradas/s':>11} {'RSS MB':>7}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for entries in sizes:
+            path = os.path.join(work_dir, f"export-{entries}.har")
+            write_har(path, entries, body_kb)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for mode in modes:
+                result = measure(path, mode)
+                print(f"{entries:>9} {size_mb:>7.1f} {mode:<10} {result['count']:>9} "
+                      f"{entries / result['seconds']:>11.0f} {result['rss_mb']:>7.1f}")
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end offline de SQLInjectionScanner contra la aplicación mock y el stub de OpenAI
+
+Métricas por escenario: requests/s, llamadas al LLM por hallazgo, tiempo y requests hasta el
+primer hallazgo (TTFF) y pico de memoria (RSS). Cada escenario corre en un proceso hijo para que
+el pico de RSS no se mezcle entre escenarios ni con los servidores mock.
+
+Uso: python benchmarks/bench_scanner.py [--repeat N] [--latency-ms MS] [--llm-latency-ms MS]
+                                        [--scenario nombre] [--json salida.json] [--verbose]
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import get_option
+from mock_app import MockApp, generate_certificate
+from mock_openai import MockOpenAI
+
+# Escenarios: opciones de la aplicación mock, parámetros de la request (y dónde van: query, form,
+# json o cookie), opciones del scanner y (opcional) opciones del stub de OpenAI.
+# Los escenarios con 'tls' sirven la aplicación por HTTPS con un certificado autofirmado.
+# Cada repetición parte de un historial de payloads vacío; con 'warmup' se hace antes un scan sin medir
+# que lo alimenta, y con 'quotes_last' los payloads con comilla simple (los que aciertan) van al final.
+# Los escenarios order-* desactivan las sondas de contexto para medir solo el orden de payloads.
+# En los escenarios vulnerables 'cat' (seguro) se prueba antes que 'artist' (vulnerable).
+SCENARIOS = [
+    {'name': 'vuln-seq', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {}},
+    {'name': 'vuln-async', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {'concurrency': 8}},
+    {'name': 'safe-seq', 'app': {}, 'params': {'cat': '1'}, 'scanner': {}},
+    {'name': 'generic-tiered', 'app': {'error_style': 'generic'}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {}},
+    {'name': 'vuln-full', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {'detection_mode': 'full'}},
+    {'name': 'vuln-recheck', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {'enable_recheck': True}},
+    {'name': 'generic-recheck', 'app': {'error_style': 'generic'}, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'enable_recheck': True}},
+    {'name': 'throttled', 'app': {'throttle_every': 4}, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'concurrency': 8}},
+    {'name': 'llm-throttled', 'app': {'error_style': 'generic'}, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'concurrency': 8}, 'llm': {'throttle_every': 3}},
+    {'name': 'llm-malformed', 'app': {'error_style': 'generic'}, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'enable_recheck': True}, 'llm': {'malformed_every': 2}},
+    {'name': 'form-post', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'location': 'form', 'scanner': {}},
+    {'name': 'json-post', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'location': 'json', 'scanner': {}},
+    {'name': 'cookie', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'location': 'cookie',
+     'scanner': {'injection_points': ['cookie']}},
+    {'name': 'https-seq', 'app': {}, 'tls': True, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'scheme': 'https'}},
+    {'name': 'https-async', 'app': {}, 'tls': True, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'scheme': 'https', 'concurrency': 8}},
+    {'name': 'large-stream', 'app': {'page_kb': 2048}, 'params': {'cat': '1', 'artist': '1'},
+     'scanner': {'stream_responses': True}},
+    {'name': 'order-cold', 'app': {}, 'params': {'artist': '1'}, 'quotes_last': True,
+     'scanner': {'context_probe': False}},
+    {'name': 'order-learned', 'app': {}, 'params': {'artist': '1'}, 'quotes_last': True, 'warmup': True,
+     'scanner': {'context_probe': False}},
+    {'name': 'probe-off', 'app': {}, 'params': {'cat': '1', 'artist': '1'}, 'scanner': {'context_probe': False}},
+    {'name': 'probe-numeric', 'app': {'numeric_params': ('id',)}, 'params': {'cat': '1', 'id': '1'}, 'scanner': {}}
+]
+
+def run_scan(raw_request: str, payloads: list, scanner_options: dict, verbose: bool, results):
+    """Proceso hijo: ejecuta un scan y devuelve tiempos, hallazgos y pico de RSS"""
+    from http_parser import HttpRequest
+    from main import SQLInjectionScanner
+
+    class TimedScanner(SQLInjectionScanner):
+        """Registra el instante en que se construye el primer hallazgo"""
+        first_finding = None
+
+        def build_vulnerability(self, test_result, analysis, payload):
+            if self.first_finding is None:
+                self.first_finding = time.perf_counter()
+            return super().build_vulnerability(test_result, analysis, payload)
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        scanner = TimedScanner(enable_cache=False, **scanner_options)
+        start = time.perf_counter()
+        report = scanner.scan_request(HttpRequest(raw_request, scheme=scanner.scheme), payloads)
+        elapsed = time.perf_counter() - start
+        scanner.close()
+
+    results.put({
+        'elapsed': elapsed,
+        'findings': report['vulnerabilities_found'],
+        'ttff': scanner.first_finding - start if scanner.first_finding else None,
+        # En Linux ru_maxrss está en KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'detection_stages': report['detection_stages'],
+        'connections': report['connections'],
+        'requests_to_first_finding': report['payload_schedule']['requests_to_first_finding'],
+        'llm_gateway': report['llm_gateway']
+    })
+
+def run_scenario(scenario: dict, stub: MockOpenAI, payloads: list, latency_ms: float, repeat: int,
+                 verbose: bool, tls_cert: str = None) -> dict:
+    """Ejecuta un escenario varias veces y devuelve las medianas de cada métrica"""
+    app = MockApp(latency_ms=latency_ms, tls_cert=tls_cert if scenario.get('tls') else None, **scenario['app']).start()
+    stub.throttle_every = scenario.get('llm', {}).get('throttle_every', 0)
+    stub.malformed_every = scenario.get('llm', {}).get('malformed_every', 0)
+    context = multiprocessing.get_context('spawn')
+    raw_request = app.raw_request(scenario['params'], location=scenario.get('location', 'query'))
+    if scenario.get('quotes_last'):
+        payloads = sorted(payloads, key=lambda payload: "'" in payload)
+
+    def scan_in_child():
+        results = context.Queue()
+        process = context.Process(target=run_scan, args=(raw_request, payloads, scenario['scanner'], verbose, results))
+        process.start()
+        run = results.get()
+        process.join()
+        return run
+
+    runs = []
+    try:
+        for _ in range(repeat):
+            # Los procesos hijo heredan el entorno: historial de payloads propio de esta repetición
+            with tempfile.TemporaryDirectory() as history_dir:
+                os.environ['PAYLOAD_STATS_FILE'] = os.path.join(history_dir, 'payload_stats.sqlite3')
+                if scenario.get('warmup'):
+                    scan_in_child()
+                requests_before, calls_before = app.requests, stub.calls
+                run = scan_in_child()
+            run['http_requests'] = app.requests - requests_before
+            run['llm_calls'] = stub.calls - calls_before
+            runs.append(run)
+    finally:
+        app.stop()
+        stub.throttle_every = stub.malformed_every = 0
+        os.environ.pop('PAYLOAD_STATS_FILE', None)
+
+    ttffs = [run['ttff'] for run in runs if run['ttff'] is not None]
+    first_finding_requests = [run['requests_to_first_finding'] for run in runs
+                              if run['requests_to_first_finding'] is not None]
+    findings = runs[-1]['findings']
+    llm_calls = statistics.median(run['llm_calls'] for run in runs)
+    return {
+        'scenario': scenario['name'],
+        'runs': repeat,
+        'findings': findings,
+        'http_requests': runs[-1]['http_requests'],
+        'requests_per_second': round(statistics.median(run['http_requests'] / run['elapsed'] for run in runs), 1),
+        'llm_calls': llm_calls,
+        'llm_calls_per_finding': round(llm_calls / findings, 2) if findings else None,
+        'ttff_ms': round(statistics.median(ttffs) * 1000, 1) if ttffs else None,
+        'requests_to_first_finding': statistics.median(first_finding_requests) if first_finding_requests else None,
+        'elapsed_ms': round(statistics.median(run['elapsed'] for run in runs) * 1000, 1),
+        'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+        'detection_stages': runs[-1]['detection_stages'],
+        'connections': runs[-1]['connections'],
+        'llm_gateway': runs[-1]['llm_gateway']
+    }
+
+def main():
+    """Levanta los servidores mock y ejecuta los escenarios"""
+    repeat = int(get_option('--repeat', '3'))
+    latency_ms = float(get_option('--latency-ms', '5'))
+    llm_latency_ms = float(get_option('--llm-latency-ms', '50'))
+    only = get_option('--scenario')
+    output_file = get_option('--json')
+    verbose = '--verbose' in sys.argv
+
+    with open(get_option('--payloads', os.path.join(ROOT, 'payloads.txt')), 'r', encoding='utf-8') as f:
+        payloads = [line.strip() for line in f if line.strip()]
+
+    stub = MockOpenAI(latency_ms=llm_latency_ms).start()
+    # Los procesos hijo heredan el entorno: el cliente de OpenAI apunta al stub local
+    os.environ['OPENAI_API_KEY'] = 'sk-benchmark'
+    os.environ['OPENAI_BASE_URL'] = stub.base_url
+
+    # Certificado para los escenarios HTTPS: los procesos hijo lo usan como CA (TLS_VERIFY)
+    cert_dir = tempfile.TemporaryDirectory()
+    tls_cert = generate_certificate(cert_dir.name)
+    if tls_cert:
+        os.environ['TLS_VERIFY'] = tls_cert
+    else:
+        print("[BENCH] openssl no disponible: se omiten los escenarios HTTPS")
+
+    print(f"[BENCH] Payloads: {len(payloads)} | Repeticiones: {repeat} | "
+          f"Latencia app: {latency_ms} ms | Latencia LLM: {llm_latency_ms} ms")
+    print(f"\n{'Escenario':<16} {'Hallazgos':>9} {'HTTP':>5} {'req/s':>8} {'LLM':>5} {'LLM/hall.':>9} "
+          f"{'TTFF ms':>9} {'Req.1er':>7} {'Total ms':>9} {'RSS MB':>7} {'Conex.':>6} {'Reuso':>6}")
+
+    results = []
+    try:
+        for scenario in SCENARIOS:
+            if (only and scenario['name'] != only) or (scenario.get('tls') and not tls_cert):
+                continue
+            result = run_scenario(scenario, stub, payloads, latency_ms, repeat, verbose, tls_cert)
+            results.append(result)
+            print(f"{result['scenario']:<16} {result['findings']:>9} {result['http_requests']:>5} "
+                  f"{result['requests_per_second']:>8} {result['llm_calls']:>5} "
+                  f"{str(result['llm_calls_per_finding']):>9} {str(result['ttff_ms']):>9} "
+                  f"{str(result['requests_to_first_finding']):>7} "
+                  f"{result['elapsed_ms']:>9} {result['peak_rss_mb']:>7} "
+                  f"{result['connections']['new_connections']:>6} {result['connections']['reuse_ratio']:>6.0%}")
+    finally:
+        stub.stop()
+        cert_dir.cleanup()
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en: {output_file}")
+
+if __name__ == "__main__":
+    main()
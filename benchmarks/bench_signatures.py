@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del motor de firmas: throughput (MB/s) sobre bodies HTML grandes
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from signature_engine import SignatureEngine
+
+ERROR_SNIPPET = "<b>Warning</b>: You have an error in your SQL syntax; check the manual that corresponds to your MySQL server version"
+
+def build_html(size_mb: float, with_error: bool, seed: int = 7) -> str:
+    """Genera un HTML sintético del tamaño pedido (opcionalmente con un error SQL al final)"""
+    rng = random.Random(seed)
+    words = ("product price cart user account order shipping table select query error login "
+             "warning database server version search results page content").split()
+    rows = []
+    size = 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        row = "<tr><td class='cell'>" + " ".join(rng.choice(words) for _ in range(12)) + "</td></tr>\n"
+        rows.append(row)
+        size += len(row)
+    body = "<html><head><script>var x = 1;</script></head><body><table>" + "".join(rows) + "</table>"
+    if with_error:
+        body += ERROR_SNIPPET
+    return body + "</body></html>"
+
+def naive_scan(engine: SignatureEngine, content: str) -> int:
+    """Referencia: una búsqueda regex por firma sobre el body completo"""
+    return sum(1 for signature in engine.signatures if signature.regex.search(content))
+
+def measure(label: str, func, content: str, repeat: int) -> float:
+    """Ejecuta la función varias veces y devuelve el throughput en MB/s"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    elapsed = (time.perf_counter() - start) / repeat
+    throughput = len(content) / (1024 * 1024) / elapsed
+    print(f"  {label:<10} {elapsed * 1000:8.1f} ms  {throughput:8.2f} MB/s")
+    return throughput
+
+def main():
+    """Compara el motor compilado contra el loop regex ingenuo"""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    engine = SignatureEngine.from_file()
+    print(f"[FIRMAS] {len(engine.signatures)} firmas | {len(engine.literals)} literales de prefiltro")
+
+    for size_mb in (0.1, 1, 5):
+        for with_error in (False, True):
+            content = build_html(size_mb, with_error)
+            print(f"\n[BODY] {size_mb} MB | {'con error SQL' if with_error else 'sin error'}")
+            naive = measure('naive', lambda c: naive_scan(engine, c), content, repeat)
+            compiled = measure('compilado', engine.scan, content, repeat)
+            print(f"  Speedup: {compiled / naive:.1f}x")
+
+if __name__ == "__main__":
+    main()
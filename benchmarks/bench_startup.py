@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque: tiempo hasta tener un SQLInjectionScanner listo con cada conjunto de detectores
+
+Cada medición es un intérprete nuevo (sin módulos en caché de sys.modules). Se informa la mediana
+del tiempo total del proceso y del import + construcción del scanner, y qué módulos pesados se
+cargaron. El modo solo-regex debe arrancar sin importar el SDK de OpenAI y dentro del presupuesto
+(--budget-ms, por defecto 500 ms); si no, el script termina con código 1.
+
+Uso: python benchmarks/bench_startup.py [--repeat N] [--budget-ms MS] [--detectors regex,local,openai]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import get_option
+
+# Sin caché, journal ni historial de payloads: solo se mide el coste de imports y construcción
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+main.SQLInjectionScanner(detectors={detectors!r}, enable_cache=False, adaptive_payloads=False)
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{'init_ms': elapsed, 'modules': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+HEAVY_MODULES = ['openai', 'httpx', 'numpy']
+
+CONFIGURATIONS = ['regex', 'regex,local', 'regex,local,openai']
+
+def measure(detectors: str) -> dict:
+    """Arranca un intérprete, construye el scanner y devuelve tiempos y módulos pesados cargados"""
+    code = CHILD_CODE.format(detectors=detectors.split(','), heavy=HEAVY_MODULES)
+    # Clave ficticia: el gateway se construye sin llamar a la API
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-benchmark"))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    total_ms = (time.perf_counter() - start) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result['total_ms'] = total_ms
+    return result
+
+def main():
+    repeat = int(get_option('--repeat', '5'))
+    budget_ms = float(get_option('--budget-ms', '500'))
+    configurations = [get_option('--detectors')] if get_option('--detectors') else CONFIGURATIONS
+
+    print(f"[BENCH] Repeticiones: {repeat} | Presupuesto solo-regex: {budget_ms:.0f} ms")
+    print(f"\n{'Detectores':<20} {'Proceso ms':>10} {'Init ms':>8}  Módulos pesados")
+    failures = []
+    for detectors in configurations:
+        runs = [measure(detectors) for _ in range(repeat)]
+        total_ms = statistics.median(run['total_ms'] for run in runs)
+        init_ms = statistics.median(run['init_ms'] for run in runs)
+        modules = runs[-1]['modules']
+        print(f"{detectors:<20} {total_ms:>10.1f} {init_ms:>8.1f}  {', '.join(modules) or '-'}")
+        if 'openai' not in detectors.split(','):
+            if 'openai' in modules:
+                failures.append(f"{detectors}: se importó el SDK de OpenAI")
+            if total_ms > budget_ms:
+                failures.append(f"{detectors}: {total_ms:.0f} ms supera el presupuesto de {budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"[FALLO] {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
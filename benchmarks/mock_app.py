@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Aplicación web local vulnerable (sqlite3) para benchmarks offline del scanner
+"""
+
+import html
+import json
+import os
+import sqlite3
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Marca visible en las páginas de error: el stub de OpenAI la usa para sus verdicts automáticos
+MOCK_ERROR_MARKER = "[mock-db]"
+
+# Formato del mensaje de error según el motor que se quiere simular
+ERROR_TEMPLATES = {
+    'sqlite': "<b>Warning</b>: sqlite3.OperationalError: {error} " + MOCK_ERROR_MARKER,
+    'mysql': ("<b>Warning</b>: You have an error in your SQL syntax; check the manual that corresponds to your "
+              "MySQL server version for the right syntax to use near '{value}' at line 1 " + MOCK_ERROR_MARKER),
+    # Sin firma conocida: solo la triage/OpenAI pueden decidir
+    'generic': "Internal error: the data layer rejected the request (query aborted) " + MOCK_ERROR_MARKER
+}
+
+ARTISTS = [
+    (1, 'r4w8173', 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.'),
+    (2, 'Blad3', 'Sed ut perspiciatis unde omnis iste natus error sit voluptatem.'),
+    (3, 'lyzae', 'Nemo enim ipsam voluptatem quia voluptas sit aspernatur aut odit.')
+]
+
+def generate_certificate(directory: str) -> str:
+    """Certificado autofirmado para 127.0.0.1 (PEM con clave y certificado); None si no hay openssl"""
+    path = os.path.join(directory, 'mock_app.pem')
+    key_path = os.path.join(directory, 'mock_app.key')
+    try:
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+             '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key_path, '-out', path],
+            check=True, capture_output=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    with open(key_path, 'r') as key, open(path, 'a') as pem:
+        pem.write(key.read())
+    return path
+
+def create_database() -> sqlite3.Connection:
+    """Base de datos en memoria con la tabla de artistas"""
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    connection.execute("CREATE TABLE artists (id INTEGER PRIMARY KEY, name TEXT, bio TEXT)")
+    connection.executemany("INSERT INTO artists VALUES (?, ?, ?)", ARTISTS)
+    connection.commit()
+    return connection
+
+class MockApp:
+    """Servidor HTTP con parámetros vulnerables (SQL concatenado) y seguros (SQL parametrizado)
+
+    - vulnerable_params / safe_params: nombres de parámetros de /artists.php
+    - numeric_params: parámetros vulnerables concatenados sin comillas (contexto numérico)
+    - latency_ms: retardo artificial de cada respuesta
+    - page_kb: relleno HTML para simular páginas grandes
+    - error_style: 'sqlite', 'mysql' o 'generic' (ver ERROR_TEMPLATES)
+    - throttle_every: responde 429 con Retry-After a una de cada N requests (0 = nunca)
+    - tls_cert: PEM con certificado y clave para servir HTTPS (ver generate_certificate)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, vulnerable_params: Iterable[str] = ('artist',),
+                 safe_params: Iterable[str] = ('cat',), numeric_params: Iterable[str] = (), latency_ms: float = 0, page_kb: int = 4,
+                 error_style: str = 'sqlite', throttle_every: int = 0, retry_after: int = 1, tls_cert: str = None):
+        self.vulnerable_params = set(vulnerable_params)
+        self.safe_params = set(safe_params)
+        self.numeric_params = set(numeric_params)
+        self.latency = latency_ms / 1000
+        self.padding = self.build_padding(page_kb)
+        self.error_template = ERROR_TEMPLATES[error_style]
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.throttled = 0
+        self.database = create_database()
+        self.db_lock = threading.Lock()  # sqlite3 no admite consultas simultáneas sobre la misma conexión
+        self.requests = 0
+        self.counter_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.scheme = 'https' if tls_cert else 'http'
+        if tls_cert:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(tls_cert)
+            # El handshake se hace en el thread de cada conexión, no en el que acepta
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True,
+                                                     do_handshake_on_connect=False)
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def build_padding(self, page_kb: int) -> str:
+        """Filas de producto repetidas hasta ocupar page_kb"""
+        row = "<tr><td class='product'>Product item lorem ipsum dolor sit amet</td><td>9.99</td></tr>\n"
+        return "<table>" + row * max(page_kb * 1024 // len(row), 0) + "</table>"
+
+    def raw_request(self, params: Dict[str, str] = None, path: str = '/artists.php', location: str = 'query') -> str:
+        """Request raw (formato de main.py) apuntando a esta aplicación
+
+        location indica dónde van los parámetros: 'query', 'form' (POST), 'json' (POST) o 'cookie'.
+        """
+        params = params or {name: '1' for name in sorted(self.vulnerable_params)}
+        encoded = '&'.join(f"{name}={value}" for name, value in params.items())
+        host, port = self.server.server_address[:2]
+        headers = f"Host: {host}:{port}\nUser-Agent: Mozilla/5.0\nAccept: */*\n"
+        if location == 'form':
+            return (f"POST {path} HTTP/1.1\n{headers}Content-Type: application/x-www-form-urlencoded\n"
+                    f"Content-Length: {len(encoded)}\n\n{encoded}")
+        if location == 'json':
+            body = json.dumps(params)
+            return (f"POST {path} HTTP/1.1\n{headers}Content-Type: application/json\n"
+                    f"Content-Length: {len(body)}\n\n{body}")
+        if location == 'cookie':
+            cookies = '; '.join(f"{name}={value}" for name, value in params.items())
+            return f"GET {path} HTTP/1.1\n{headers}Cookie: {cookies}\n"
+        return f"GET {path}?{encoded} HTTP/1.1\n{headers}"
+
+    def render(self, params: Dict[str, str]) -> str:
+        """Ejecuta las consultas de cada parámetro y construye la página"""
+        sections = []
+        for name, value in params.items():
+            if name in self.vulnerable_params:
+                # Vulnerable a propósito: el valor se concatena en la consulta
+                query = f"SELECT name, bio FROM artists WHERE id = '{value}'"
+                arguments = ()
+            elif name in self.numeric_params:
+                query = f"SELECT name, bio FROM artists WHERE id = {value}"
+                arguments = ()
+            elif name in self.safe_params:
+                query = "SELECT name, bio FROM artists WHERE id = ?"
+                arguments = (value,)
+            else:
+                continue
+
+            try:
+                with self.db_lock:
+                    rows = self.database.execute(query, arguments).fetchall()
+            except sqlite3.Error as e:
+                sections.append(self.error_template.format(error=html.escape(str(e)), value=html.escape(value)))
+                continue
+
+            if rows:
+                sections.extend(f"<h2>{html.escape(row[0])}</h2><p>{html.escape(row[1])}</p>" for row in rows)
+            else:
+                sections.append("<p>No artists found</p>")
+
+        return ("<html><head><title>Artists</title></head><body><div id='content'>"
+                + "\n".join(sections) + "</div>\n" + self.padding + "</body></html>")
+
+    def handler_class(self):
+        app = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers y body se escriben por separado: sin TCP_NODELAY cada respuesta keep-alive espera el ACK retrasado
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, ssl.SSLError):
+                    pass  # El scanner cortó una conexión keep-alive (descarga en streaming cancelada)
+
+            def request_params(self) -> Dict[str, str]:
+                """Parámetros de la query, del body (form o JSON) y de las cookies"""
+                parsed = urlparse(self.path)
+                params = {name: values[0] for name, values in parse_qs(parsed.query, keep_blank_values=True).items()}
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8', errors='replace') if length else ''
+                content_type = self.headers.get('Content-Type', '')
+                if body and 'json' in content_type:
+                    try:
+                        document = json.loads(body)
+                    except ValueError:
+                        document = {}
+                    if isinstance(document, dict):
+                        params.update({name: str(value) for name, value in document.items()})
+                elif body:
+                    params.update({name: values[0] for name, values in parse_qs(body, keep_blank_values=True).items()})
+                cookies = SimpleCookie()
+                try:
+                    cookies.load(self.headers.get('Cookie', ''))
+                except Exception:
+                    pass
+                params.update({name: unquote(morsel.value) for name, morsel in cookies.items()})
+                return params
+
+            def do_POST(self):
+                self.do_GET()
+
+            def do_GET(self):
+                params = self.request_params()  # Se lee el body antes de responder (también en los 429)
+                with app.counter_lock:
+                    app.requests += 1
+                    throttle = app.throttle_every and app.requests % app.throttle_every == 0
+                    if throttle:
+                        app.throttled += 1
+                if throttle:
+                    self.send_response(429)
+                    self.send_header('Retry-After', str(app.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if app.latency:
+                    time.sleep(app.latency)
+                body = app.render(params).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El scanner cancela tests en vuelo y corta descargas en modo streaming
+                    self.close_connection = True
+
+        return Handler
+
+    def start(self) -> 'MockApp':
+        """Arranca el servidor en un hilo en segundo plano"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    app = MockApp(port=port)
+    print(f"[MOCK APP] {app.base_url}/artists.php?artist=1 (vulnerable: artist | seguro: cat)")
+    app.server.serve_forever()
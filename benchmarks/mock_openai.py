@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Stub local compatible con la API de chat completions de OpenAI para benchmarks offline
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from mock_app import MOCK_ERROR_MARKER
+
+RECHECK_PAYLOAD = "' AND 1=CAST((SELECT sqlite_version()) AS INT)-- -"
+
+def canned_verdict(positive: bool) -> Dict:
+    """Verdict válido tanto para OpenAIDetector como para RecheckDetector"""
+    return {
+        "contains_sql_error": positive,
+        "is_sql_injection": positive,
+        "error_type": "SQLite error" if positive else None,
+        "confidence": 0.85 if positive else 0.1,
+        "details": "Verdict simulado por el stub de OpenAI",
+        "recheck_payload": RECHECK_PAYLOAD if positive else "",
+        "database_engine": "SQLite" if positive else "Unknown",
+        "reasoning": "Verdict simulado por el stub de OpenAI"
+    }
+
+class MockOpenAI:
+    """Servidor /v1/chat/completions con latencia configurable y verdicts predefinidos
+
+    - verdict: 'auto' (positivo si el prompt contiene MOCK_ERROR_MARKER), 'positive' o 'negative'
+    - latency_ms: retardo artificial de cada llamada
+    - throttle_every: responde 429 con Retry-After a una de cada N llamadas (0 = nunca)
+    - malformed_every: responde un JSON truncado a una de cada N llamadas (0 = nunca)
+    - unsupported_formats: tipos de response_format que se rechazan con 400 (p.ej. ('json_schema',))
+    - Caché de prefijos simulada: un mensaje system ya visto cuenta como cached_tokens
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0, verdict: str = 'auto',
+                 throttle_every: int = 0, retry_after: int = 1, malformed_every: int = 0, unsupported_formats=()):
+        self.latency = latency_ms / 1000
+        self.verdict = verdict
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.throttled = 0
+        self.malformed_every = malformed_every
+        self.malformed = 0
+        self.unsupported_formats = set(unsupported_formats)
+        self.seen_prefixes = set()
+        self.response_formats = {}
+        self.calls = 0
+        self.prompt_chars = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def answer(self, prompt: str) -> Dict:
+        """Decide el verdict para un prompt"""
+        if self.verdict == 'auto':
+            return canned_verdict(MOCK_ERROR_MARKER in prompt)
+        return canned_verdict(self.verdict == 'positive')
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers y body se escriben por separado: sin TCP_NODELAY cada respuesta keep-alive espera el ACK retrasado
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                messages = request.get('messages', [])
+                prompt = ''.join(message.get('content', '') for message in messages)
+                prefix = messages[0]['content'] if messages and messages[0].get('role') == 'system' else ''
+                response_format = (request.get('response_format') or {}).get('type', 'none')
+                with stub.lock:
+                    stub.calls += 1
+                    stub.prompt_chars += len(prompt)
+                    stub.response_formats[response_format] = stub.response_formats.get(response_format, 0) + 1
+                    throttle = stub.throttle_every and stub.calls % stub.throttle_every == 0
+                    if throttle:
+                        stub.throttled += 1
+                    malformed = not throttle and stub.malformed_every and stub.calls % stub.malformed_every == 0
+                    if malformed:
+                        stub.malformed += 1
+                    cached_tokens = len(prefix) // 4 if prefix in stub.seen_prefixes else 0
+                    if prefix:
+                        stub.seen_prefixes.add(prefix)
+                if throttle:
+                    body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode('utf-8')
+                    self.send_response(429)
+                    self.send_header('Retry-After', str(stub.retry_after))
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if response_format in stub.unsupported_formats:
+                    # Mismo error que la API con un modelo sin structured outputs
+                    body = json.dumps({"error": {
+                        "message": f"Invalid parameter: 'response_format' of type '{response_format}' is not "
+                                   f"supported with this model.",
+                        "type": "invalid_request_error", "param": "response_format", "code": None
+                    }}).encode('utf-8')
+                    self.send_response(400)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                content = json.dumps(stub.answer(prompt))
+                if malformed:
+                    content = content[:40]  # JSON truncado: el gateway debe reintentar
+                completion = {
+                    "id": f"chatcmpl-mock-{stub.calls}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get('model', 'mock'),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content}
+                    }],
+                    "usage": {
+                        "prompt_tokens": len(prompt) // 4,
+                        "completion_tokens": 60,
+                        "total_tokens": len(prompt) // 4 + 60,
+                        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+                    }
+                }
+                body = json.dumps(completion).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> 'MockOpenAI':
+        """Arranca el servidor en un hilo en segundo plano"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    stub = MockOpenAI(port=port)
+    print(f"[MOCK OPENAI] OPENAI_BASE_URL={stub.base_url}")
+    stub.server.serve_forever()
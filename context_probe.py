@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Sondas diferenciales para inferir el contexto de inyección de cada parámetro y podar los payloads
+"""
+
+from typing import Dict, List
+
+from response_fingerprint import fingerprint_result
+
+# Contextos: valor entre comillas simples, entre comillas dobles o expresión numérica
+CONTEXT_QUOTES = {'single': "'", 'double': '"'}
+# Payloads que rompen cualquier expresión numérica (se mantienen en contexto numérico)
+NUMERIC_BREAKERS = {"'", '"'}
+# Máximo de sondas por parámetro: con menos payloads que esto el sondeo no compensa
+MAX_PROBES = 5
+
+def payload_context(payload: str) -> str:
+    """Contexto para el que está escrito un payload según la primera comilla que contiene"""
+    for context, quote in CONTEXT_QUOTES.items():
+        if quote in payload:
+            return context
+    return 'numeric'
+
+def payloads_for_context(payloads: List[str], context: str) -> List[str]:
+    """Payloads válidos para el contexto inferido (todos si el contexto es desconocido)"""
+    if context not in ('single', 'double', 'numeric'):
+        return list(payloads)
+    return [payload for payload in payloads
+            if payload_context(payload) == context or (context == 'numeric' and payload in NUMERIC_BREAKERS)]
+
+def is_numeric(value: str) -> bool:
+    return value.lstrip('-').isdigit()
+
+class ContextProber:
+    """Clasifica el contexto de un parámetro con pares de sondas comparadas entre sí y con el baseline
+
+    - v' frente a v'': si la comilla suelta cambia la respuesta y la pareja balanceada no da lo mismo,
+      el valor está entre comillas simples (igual con " y "" para comillas dobles)
+    - v-0 (solo valores numéricos): si equivale al baseline mientras v' no, el valor es una expresión numérica
+    - 'none': ninguna sonda cambia la respuesta respecto al baseline ni da error SQL; el parámetro se descarta
+    - 'unknown': alguna sonda falló, hubo un error SQL o una comilla cambió la respuesta sin contexto
+      claro; se prueban todos los payloads
+    """
+
+    def __init__(self, request_handler, signature_engine=None):
+        self.request_handler = request_handler
+        self.signature_engine = signature_engine
+
+    def send(self, request, param_name: str, value: str, probes: List[str], on_result=None):
+        """Envía una sonda y devuelve (fingerprint, hay firma SQL); fingerprint None si el test falló"""
+        probes.append(value)
+        result = self.request_handler.test_parameter(request, param_name, value)
+        if on_result is not None:
+            on_result(result)
+        fingerprint = fingerprint_result(result, value)
+        has_signature = fingerprint is not None and self.signature_engine is not None and \
+            bool(self.signature_engine.scan(result['response_text']))
+        return fingerprint, has_signature
+
+    def probe(self, request, param_name: str, baseline, on_result=None) -> Dict:
+        """Infiere el contexto del parámetro; devuelve contexto, motivo y sondas enviadas
+
+        on_result recibe el resultado de cada sonda (para contarla como un test más del scan).
+        """
+        original = request.slots[param_name].original
+        probes = []
+        changed = signature_seen = failed = False
+
+        for context, quote in CONTEXT_QUOTES.items():
+            broken, broken_signature = self.send(request, param_name, original + quote, probes, on_result)
+            if broken is None:
+                failed = True
+                continue
+            signature_seen = signature_seen or broken_signature
+            if baseline.compare(broken)['equivalent'] and not broken_signature:
+                continue  # La comilla suelta no cambia nada: no es este contexto
+            changed = True
+            balanced, balanced_signature = self.send(request, param_name, original + quote * 2, probes, on_result)
+            if balanced is None:
+                failed = True
+                continue
+            if not balanced_signature and (broken_signature or not balanced.compare(broken)['equivalent']):
+                return {'context': context, 'reason': f"{quote} rompe la consulta y {quote * 2} no", 'probes': probes}
+
+        if changed and is_numeric(original):
+            same, same_signature = self.send(request, param_name, f"{original}-0", probes, on_result)
+            if same is None:
+                failed = True
+            elif not same_signature and baseline.compare(same)['equivalent']:
+                return {'context': 'numeric', 'reason': f"{original}-0 equivale al baseline", 'probes': probes}
+
+        if failed:
+            return {'context': 'unknown', 'reason': "Alguna sonda no obtuvo respuesta", 'probes': probes}
+        if signature_seen:
+            return {'context': 'unknown', 'reason': "Error SQL sin contexto claro", 'probes': probes}
+        if changed:
+            # El parámetro reaccionó: solo se descartan los que no reaccionan a ninguna sonda
+            return {'context': 'unknown', 'reason': "Una comilla cambia la respuesta sin contexto claro", 'probes': probes}
+        # Ninguna comilla cambia la respuesta ni da errores SQL: la sintaxis no llega a la consulta
+        return {'context': 'none', 'reason': "Ninguna sonda provoca una reacción sintáctica", 'probes': probes}
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Modo coordinador/workers: reparte unidades (target, parámetro) entre procesos y máquinas
+"""
+
+import multiprocessing
+import os
+import socket
+import time
+from typing import Dict, List
+
+from batch_scanner import iter_batch_requests
+from http_parser import HttpRequest
+from work_queue import WorkQueue
+
+def run_worker(queue_path: str, scanner_options: Dict, worker_id: str = None, poll_interval: float = 0.5) -> int:
+    """Bucle de un worker: reclama unidades, escanea su parámetro y guarda el reporte en la cola
+
+    Termina cuando la cola está cerrada y no quedan unidades pendientes ni en curso. Devuelve
+    el número de unidades procesadas.
+    """
+    # Importación diferida: main importa este módulo
+    from main import SQLInjectionScanner
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    # Sin journal ni reporte propios: el reporte de cada unidad vuelve al coordinador por la cola
+    scanner = SQLInjectionScanner(**dict(scanner_options, journal_file=None, resume=False, report_file=None))
+    payloads = None
+    processed = 0
+    print(f"[WORKER] {worker_id} | cola: {queue_path}")
+
+    while True:
+        unit = queue.claim(worker_id)
+        if unit is None:
+            if queue.is_closed() and queue.unfinished() == 0:
+                break
+            time.sleep(poll_interval)  # Cola vacía de momento: el coordinador sigue encolando o hay unidades en curso
+            continue
+        if payloads is None:
+            payloads = queue.payloads()
+        try:
+            request = HttpRequest(unit['raw_request'], scheme=scanner.scheme)
+            result = scanner.scan_request(request, payloads, parameters=[unit['parameter']])
+            queue.complete(unit, result)
+        except Exception as e:
+            queue.complete(unit, {'status': 'error', 'error': str(e)}, status='error')
+        processed += 1
+
+    scanner.close()
+    print(f"[WORKER] {worker_id} terminado: {processed} unidades")
+    return processed
+
+def merge_units(units: List[Dict]) -> Dict:
+    """Reporte de un target a partir de los reportes de sus unidades (un parámetro cada una)"""
+    reports = [unit['result'] for unit in units if unit['result'] is not None]
+    vulnerabilities = [vulnerability for report in reports for vulnerability in report.get('vulnerabilities', [])]
+    statuses = {report.get('status') for report in reports}
+    if vulnerabilities:
+        status = 'vulnerable'
+    elif 'error' in statuses:
+        status = 'error'
+    elif statuses == {'unreachable'}:
+        status = 'unreachable'
+    else:
+        status = 'secure'
+
+    first = next((report for report in reports if 'target_url' in report), {})
+    merged = {
+        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'target_id': units[0]['target_id'],
+        'target_url': first.get('target_url'),
+        'method': first.get('method'),
+        'parameters_tested': [unit['parameter'] for unit in units if unit['status'] != 'skipped'],
+        'vulnerabilities_found': len(vulnerabilities),
+        'vulnerabilities': vulnerabilities,
+        # Suma del tiempo de los workers (las unidades de un target pueden correr en paralelo)
+        'execution_time': round(sum(report.get('execution_time', 0) for report in reports), 2),
+        'units': [{
+            'parameter': unit['parameter'],
+            'status': unit['status'] if unit['status'] != 'done' else unit['result'].get('status'),
+            'worker': unit['worker'],
+            'execution_time': (unit['result'] or {}).get('execution_time'),
+            'context': ((unit['result'] or {}).get('context_probes') or {}).get(unit['parameter'], {}).get('context'),
+            'error': (unit['result'] or {}).get('error')
+        } for unit in units],
+        'status': status
+    }
+    return merged
+
+class Coordinator:
+    """Encola el batch en unidades (target, parámetro), lanza los workers locales y fusiona el reporte
+
+    - processes: workers locales (multiprocessing, uno por core); 0 = solo workers remotos
+      (python3 main.py --worker <cola> en otras máquinas con acceso al archivo de la cola)
+    - Si un worker local muere, sus unidades en curso se marcan 'error' y se relanza otro
+      (hasta WORKER_RESTARTS veces). Sin workers locales vivos, las unidades que quedan se marcan
+      'error' y el scan termina; solo con processes=0 se espera indefinidamente a los remotos
+    - Los hallazgos se escriben en el reporte JSONL en cuanto llega la unidad que los encontró;
+      el registro 'target' cuando han terminado todas las unidades del target
+    """
+
+    def __init__(self, queue_path: str, scanner_options: Dict, report_sink, processes: int = None,
+                 request_filter=None):
+        self.queue_path = queue_path
+        self.request_filter = request_filter
+        self.scanner_options = scanner_options
+        self.report_sink = report_sink
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.max_restarts = int(os.getenv("WORKER_RESTARTS", "3"))
+        self.injection_points = scanner_options.get('injection_points')
+        self.scheme = scanner_options.get('scheme')
+
+    def enqueue_source(self, queue: WorkQueue, source: str, summary: Dict):
+        """Lee el origen en streaming y encola una unidad por parámetro de cada target"""
+        for target_id, raw_request in iter_batch_requests(source, self.request_filter):
+            if isinstance(raw_request, dict):
+                self.finish_target(summary, {'target_id': target_id, 'status': 'error', 'error': raw_request['error']})
+                continue
+            try:
+                parameters = HttpRequest(raw_request, scheme=self.scheme).injection_points(self.injection_points)
+            except Exception as e:
+                self.finish_target(summary, {'target_id': target_id, 'status': 'error',
+                                             'error': f"Request inválida: {str(e)}"})
+                continue
+            if not parameters:
+                self.finish_target(summary, {'target_id': target_id, 'status': 'secure', 'parameters_tested': [],
+                                             'vulnerabilities_found': 0, 'vulnerabilities': []})
+                continue
+            queue.enqueue(target_id, raw_request, parameters)
+
+    def finish_target(self, summary: Dict, result: Dict):
+        summary['targets_scanned'] += 1
+        status = result.get('status', 'error')
+        summary[status if status in ('vulnerable', 'secure') else 'errors'] += 1
+        print(f"[COORDINADOR] {result['target_id']} → {status}")
+        self.report_sink.target(result)
+
+    def merge_finished(self, queue: WorkQueue, summary: Dict):
+        """Incorpora al reporte las unidades terminadas desde la última pasada"""
+        units = queue.finished_units()
+        for unit in units:
+            for vulnerability in (unit['result'] or {}).get('vulnerabilities', []):
+                self.report_sink.finding(unit['result']['target_url'], vulnerability)
+            target_units = queue.target_units(unit['target_seq'])
+            if target_units is not None:
+                self.finish_target(summary, merge_units(target_units))
+        queue.mark_merged([unit['id'] for unit in units])
+
+    def start_worker(self, context, workers: Dict, worker_id: str):
+        process = context.Process(target=run_worker, args=(self.queue_path, self.scanner_options, worker_id),
+                                  daemon=True)
+        process.start()
+        workers[worker_id] = process
+
+    def check_workers(self, context, queue: WorkQueue, workers: Dict, restarts: int) -> int:
+        """Retira los workers locales caídos, falla sus unidades y los relanza; devuelve los relanzamientos"""
+        for worker_id, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            del workers[worker_id]
+            if process.exitcode == 0:
+                continue
+            failed = queue.fail_units(f"El worker {worker_id} terminó con código {process.exitcode}", worker_id)
+            print(f"[COORDINADOR] Worker {worker_id} caído (código {process.exitcode}): {failed} unidades con error")
+            if restarts < self.max_restarts and queue.unfinished() > 0:
+                restarts += 1
+                self.start_worker(context, workers, f"{worker_id.split('.')[0]}.{restarts}")
+        if self.processes > 0 and not workers and queue.unfinished() > 0:
+            failed = queue.fail_units("Sin workers locales vivos")
+            print(f"[COORDINADOR] No quedan workers locales: {failed} unidades sin completar se marcan con error "
+                  f"(--processes 0 para esperar solo a workers remotos)")
+        return restarts
+
+    def run(self, source: str, payloads: List[str], poll_interval: float = 0.2) -> Dict:
+        """Ejecuta el batch distribuido y devuelve el resumen (mismas claves que BatchScanner.run)"""
+        start_time = time.time()
+        summary = {'targets_scanned': 0, 'vulnerable': 0, 'secure': 0, 'errors': 0}
+        queue = WorkQueue(self.queue_path)
+        queue.reset(payloads)
+
+        # Los workers arrancan antes de terminar de encolar: empiezan con los primeros targets
+        context = multiprocessing.get_context('spawn')
+        workers = {}  # worker_id -> proceso local
+        for index in range(self.processes):
+            self.start_worker(context, workers, f"local-{index}")
+        print(f"[COORDINADOR] Cola: {self.queue_path} | Workers locales: {self.processes}")
+        restarts = 0
+
+        try:
+            self.enqueue_source(queue, source, summary)
+            queue.close()
+            while True:
+                self.merge_finished(queue, summary)
+                if queue.unfinished() == 0:
+                    self.merge_finished(queue, summary)
+                    break
+                restarts = self.check_workers(context, queue, workers, restarts)
+                if queue.unfinished() > 0:
+                    time.sleep(poll_interval)
+        finally:
+            for process in workers.values():
+                process.join(timeout=5)
+
+        summary['units'] = queue.stats()
+        if self.request_filter is not None:
+            summary['filtered'] = self.request_filter.rejected
+        summary['execution_time'] = round(time.time() - start_time, 2)
+        return summary
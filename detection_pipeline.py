@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Pipeline de detección por etapas: primero las etapas baratas, OpenAI solo si es ambiguo
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from excerpt_extractor import has_sql_hints
+from scan_metrics import StageTimer
+
+DEFAULT_STAGES = "benign,regex,triage,ml,openai"
+
+class DetectionPipeline:
+    """Ejecuta las etapas de detección en orden y se detiene en la primera que decide"""
+
+    def __init__(self, manual_detector, openai_detector, stages: List[str] = None, mode: str = None,
+                 ml_detector=None):
+        self.manual_detector = manual_detector
+        self.openai_detector = openai_detector
+        # Clasificador local opcional: la etapa 'ml' se omite si no hay modelo cargado
+        self.ml_detector = ml_detector
+        self.mode = mode or os.getenv("DETECTION_MODE", "tiered")
+        self.stages = stages or [s.strip() for s in os.getenv("DETECTION_STAGES", DEFAULT_STAGES).split(',') if s.strip()]
+        self.regex_decisive_confidence = float(os.getenv("REGEX_DECISIVE_CONFIDENCE", "0.9"))
+        # Hashes de respuestas ya clasificadas como benignas (LRU acotado: el pipeline vive todo el batch)
+        self.benign_hashes = OrderedDict()
+        self.benign_max_entries = int(os.getenv("BENIGN_CACHE_MAX_ENTRIES", "100000"))
+        self.benign_lock = threading.Lock()
+
+    def run(self, response_text: str, parameter: str, payload: str, manual_result: Dict = None,
+            baseline_lines=None) -> Dict:
+        """Analiza una respuesta y devuelve el resultado combinado con la etapa que decidió
+
+        manual_result permite reutilizar una detección regex ya hecha (p.ej. durante el streaming)
+        y baseline_lines se usa para centrar el extracto del LLM en lo que cambió.
+        """
+        if self.mode == 'full':
+            result = self._run_full(response_text, parameter, payload, manual_result, baseline_lines)
+        else:
+            result = self._run_tiered(response_text, parameter, payload, manual_result, baseline_lines)
+
+        # Solo se memorizan verdicts negativos reales (no fallos de la API)
+        if not result['contains_sql_error'] and \
+                result['openai_detection'].get('error_type') not in ('openai_error', 'json_decode_error'):
+            self._remember_benign(self._hash(response_text))
+
+        return result
+
+    def _run_full(self, response_text: str, parameter: str, payload: str, manual_result: Dict = None,
+                  baseline_lines=None) -> Dict:
+        """Modo completo: ejecuta siempre detección manual y OpenAI"""
+        timings = {}
+        manual_detection_result = manual_result
+        if manual_detection_result is None:
+            with StageTimer(timings, 'regex'):
+                manual_detection_result = self.manual_detector.detect(response_text)
+        with StageTimer(timings, 'openai'):
+            openai_detection_result = self.openai_detector.detect(response_text, parameter, payload, baseline_lines)
+        return self._combine(manual_detection_result, openai_detection_result, 'combined', timings)
+
+    def _run_tiered(self, response_text: str, parameter: str, payload: str, manual_result: Dict = None,
+                    baseline_lines=None) -> Dict:
+        """Modo por etapas: cortocircuita en cuanto una etapa barata es concluyente"""
+        manual_detection_result = self._skipped("regex no ejecutado")
+        openai_detection_result = self._skipped("OpenAI no ejecutado")
+        ml_detection_result = None
+        timings = {}  # Duración en ms de cada etapa ejecutada
+
+        for stage in self.stages:
+            if stage == 'benign':
+                with StageTimer(timings, 'benign'):
+                    known_benign = self._is_benign(self._hash(response_text))
+                if known_benign:
+                    manual_detection_result = self._skipped("Respuesta idéntica a una ya clasificada como benigna")
+                    return self._combine(manual_detection_result, openai_detection_result, 'benign', timings)
+
+            elif stage == 'regex':
+                manual_detection_result = manual_result
+                if manual_detection_result is None:
+                    with StageTimer(timings, 'regex'):
+                        manual_detection_result = self.manual_detector.detect(response_text)
+                if manual_detection_result['contains_sql_error'] and \
+                        manual_detection_result['confidence'] >= self.regex_decisive_confidence:
+                    return self._combine(manual_detection_result, self._skipped("Decidido por regex"), 'regex', timings)
+
+            elif stage == 'triage':
+                with StageTimer(timings, 'triage'):
+                    ambiguous = has_sql_hints(response_text)
+                if not manual_detection_result['contains_sql_error'] and not ambiguous:
+                    openai_detection_result = self._skipped("Sin indicios SQL/DB, no se escala a OpenAI")
+                    return self._combine(manual_detection_result, openai_detection_result, 'triage', timings)
+
+            elif stage == 'ml':
+                if self.ml_detector is None or not self.ml_detector.is_available():
+                    continue
+                with StageTimer(timings, 'ml'):
+                    ml_detection_result = self.ml_detector.detect(response_text, baseline_lines)
+                if ml_detection_result['decisive']:
+                    return self._combine(manual_detection_result, self._skipped("Decidido por el clasificador local"),
+                                         'ml', timings, ml_detection_result)
+
+            elif stage == 'openai':
+                with StageTimer(timings, 'openai'):
+                    openai_detection_result = self.openai_detector.detect(response_text, parameter, payload, baseline_lines)
+                return self._combine(manual_detection_result, openai_detection_result, 'openai', timings,
+                                     ml_detection_result)
+
+        # Ninguna etapa fue concluyente: se decide con lo que haya
+        return self._combine(manual_detection_result, openai_detection_result,
+                             self.stages[-1] if self.stages else 'none', timings, ml_detection_result)
+
+    def _combine(self, manual_detection_result: Dict, openai_detection_result: Dict, decided_by: str,
+                 timings: Dict = None, ml_detection_result: Dict = None) -> Dict:
+        """Crea el resultado combinado con el mismo formato que la detección original"""
+        manual_found = manual_detection_result['contains_sql_error']
+        openai_found = openai_detection_result['contains_sql_error']
+        confidence = max(manual_detection_result['confidence'], openai_detection_result['confidence'])
+        details = f"Manual: {manual_detection_result['details']} | OpenAI: {openai_detection_result['details']}"
+
+        # El clasificador local cuenta solo si OpenAI no dio verdict (no se ejecutó o falló la API)
+        ml_found = False
+        if ml_detection_result is not None:
+            details += f" | ML: {ml_detection_result['details']}"
+            if openai_detection_result.get('error_type') in ('skipped', 'openai_error', 'json_decode_error'):
+                ml_found = ml_detection_result['contains_sql_error']
+                if ml_found:
+                    confidence = max(confidence, ml_detection_result['confidence'])
+
+        return {
+            'contains_sql_error': manual_found or openai_found or ml_found,  # Si al menos una detecta
+            'error_type': 'Combined Detection',
+            'confidence': confidence,
+            'details': details,
+            'manual_detection': manual_detection_result,
+            'openai_detection': openai_detection_result,
+            'ml_detection': ml_detection_result,
+            'both_detected': manual_found and openai_found,
+            'decided_by': decided_by,
+            'timings': timings or {}
+        }
+
+    def _skipped(self, reason: str) -> Dict:
+        """Resultado neutro para una etapa que no se ejecutó"""
+        return {
+            "contains_sql_error": False,
+            "error_type": "skipped",
+            "confidence": 0.0,
+            "details": reason
+        }
+
+    def _hash(self, response_text: str) -> str:
+        """Hash exacto del contenido de la respuesta"""
+        return hashlib.sha256(response_text.encode('utf-8', errors='replace')).hexdigest()
+
+    def _is_benign(self, response_hash: str) -> bool:
+        """Indica si la respuesta ya se clasificó como benigna (y la marca como usada recientemente)"""
+        with self.benign_lock:
+            if response_hash not in self.benign_hashes:
+                return False
+            self.benign_hashes.move_to_end(response_hash)
+            return True
+
+    def _remember_benign(self, response_hash: str):
+        """Memoriza un hash benigno; con más de BENIGN_CACHE_MAX_ENTRIES se descartan los menos usados"""
+        with self.benign_lock:
+            self.benign_hashes[response_hash] = True
+            self.benign_hashes.move_to_end(response_hash)
+            while self.benign_max_entries and len(self.benign_hashes) > self.benign_max_entries:
+                self.benign_hashes.popitem(last=False)
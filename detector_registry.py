@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Registro de detectores: cada backend se importa solo si está habilitado (--detectors / DETECTORS)
+"""
+
+import importlib
+import os
+from typing import Dict, List
+
+# Etapas del pipeline que aporta cada hueco: 'benign' y 'triage' dependen del detector regex
+STAGE_GROUPS = {
+    'regex': ('benign', 'regex', 'triage'),
+    'ml': ('ml',),
+    'openai': ('openai',)
+}
+
+# nombre -> (módulo, clase, hueco del pipeline); el módulo no se importa hasta load_detector()
+DETECTORS = {
+    'regex': ('manual_detector', 'ManualDetector', 'regex'),
+    'local': ('ml_detector', 'MLDetector', 'ml'),
+    'openai': ('openai_detector', 'OpenAIDetector', 'openai')
+}
+
+DEFAULT_DETECTORS = "regex,local,openai"
+
+def register_detector(name: str, module: str, class_name: str, slot: str):
+    """Registra un backend alternativo para un hueco del pipeline
+
+    La clase debe tener la interfaz del detector que sustituye (p.ej. detect() de OpenAIDetector
+    para el hueco 'openai') y se activa con --detectors <nombre>.
+    """
+    if slot not in STAGE_GROUPS:
+        raise ValueError(f"Hueco de detector desconocido: {slot} (válidos: {', '.join(STAGE_GROUPS)})")
+    DETECTORS[name] = (module, class_name, slot)
+
+def detectors_from_env() -> List[str]:
+    """Detectores habilitados por DETECTORS (por defecto todos los integrados)"""
+    return [name.strip() for name in os.getenv("DETECTORS", DEFAULT_DETECTORS).split(',') if name.strip()]
+
+def resolve_detectors(names: List[str] = None) -> Dict[str, str]:
+    """Hueco del pipeline -> detector que lo ocupa
+
+    El hueco 'regex' se ocupa siempre: firmas, streaming y sondas de contexto dependen del ManualDetector.
+    """
+    slots = {}
+    for name in names or detectors_from_env():
+        if name not in DETECTORS:
+            raise ValueError(f"Detector desconocido: {name} (disponibles: {', '.join(DETECTORS)})")
+        slot = DETECTORS[name][2]
+        if slots.get(slot, name) != name:
+            raise ValueError(f"Los detectores {slots[slot]} y {name} ocupan el mismo hueco '{slot}'")
+        slots[slot] = name
+    slots.setdefault('regex', 'regex')
+    return slots
+
+def enabled_stages(stages: List[str], slots: Dict[str, str]) -> List[str]:
+    """Etapas configuradas cuyo detector está habilitado, en el orden configurado"""
+    allowed = {stage for slot in slots for stage in STAGE_GROUPS[slot]}
+    return [stage for stage in stages if stage in allowed]
+
+def load_detector(name: str, *args, **kwargs):
+    """Importa el módulo del detector (la primera vez) y crea una instancia"""
+    module, class_name, _ = DETECTORS[name]
+    return getattr(importlib.import_module(module), class_name)(*args, **kwargs)
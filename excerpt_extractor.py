@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Extracción de ventanas de error de una respuesta para los prompts del LLM
+"""
+
+import html
+import os
+import re
+from typing import List, Optional, Set
+
+# Indicios de que una respuesta sin match regex aún merece análisis con LLM (se buscan en el texto visible)
+AMBIGUOUS_KEYWORDS = re.compile(
+    r"sql|query|database|syntax|odbc|jdbc|pdo|driver|exception|stack ?trace|traceback|warning|fatal error|"
+    r"unterminated|quoted string|unclosed|column|table|select|ora-|db2|sqlstate",
+    re.IGNORECASE
+)
+# La misma lista sin IGNORECASE para texto ya en minúsculas: en páginas grandes es ~10x más rápida
+LOWERCASE_KEYWORDS = re.compile(AMBIGUOUS_KEYWORDS.pattern)
+
+SCRIPT_STYLE_PATTERN = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+BLOCK_TAG_PATTERN = re.compile(
+    r"</?(?:address|article|aside|blockquote|br|dd|div|dl|dt|fieldset|footer|form|h[1-6]|header|hr|li|"
+    r"main|nav|ol|p|pre|section|table|tbody|td|tfoot|th|thead|title|tr|ul)\b[^>]*>",
+    re.IGNORECASE
+)
+SPACES_PATTERN = re.compile(r"[ \t\r\f\v]+")
+
+# Aproximación de tokens: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+def visible_text(text: str) -> str:
+    """Quita scripts, estilos, comentarios y tags; los tags de bloque se convierten en saltos de línea"""
+    text = SCRIPT_STYLE_PATTERN.sub("\n", text)
+    text = COMMENT_PATTERN.sub("\n", text)
+    # Los tags de bloque separan líneas; los inline (b, span, a...) se eliminan sin cortar el texto
+    text = BLOCK_TAG_PATTERN.sub("\n", text)
+    text = TAG_PATTERN.sub("", text)
+    return html.unescape(text)
+
+def has_sql_hints(text: str) -> bool:
+    """Indica si el texto visible tiene indicios SQL/DB: <table>, <select> o los scripts no cuentan"""
+    lowered = text.lower()
+    # Sin ninguna palabra clave en el HTML crudo no hace falta quitar el markup
+    return LOWERCASE_KEYWORDS.search(lowered) is not None and \
+        LOWERCASE_KEYWORDS.search(visible_text(lowered)) is not None
+
+def visible_lines(text: str) -> List[str]:
+    """Quita scripts, estilos, comentarios y tags, y devuelve las líneas de texto visibles"""
+    lines = []
+    for line in visible_text(text).split("\n"):
+        line = SPACES_PATTERN.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+class ExcerptExtractor:
+    """Selecciona las ventanas de texto alrededor de palabras clave SQL/DB y de las zonas que cambian respecto al baseline"""
+
+    def __init__(self, token_budget: int = None, context_lines: int = None, max_line_chars: int = 400,
+                 max_input_chars: int = None):
+        self.token_budget = token_budget or int(os.getenv("LLM_EXCERPT_TOKENS", "800"))
+        self.context_lines = context_lines if context_lines is not None else int(os.getenv("LLM_EXCERPT_CONTEXT", "1"))
+        self.max_line_chars = max_line_chars
+        # Páginas enormes: solo se analizan el principio y el final (ahí suelen quedar los errores de PHP/ASP)
+        self.max_input_chars = max_input_chars or int(os.getenv("LLM_EXCERPT_MAX_KB", "256")) * 1024
+
+    def extract(self, text: str, baseline_lines: Optional[Set[str]] = None) -> str:
+        """Devuelve el extracto de la respuesta dentro del presupuesto de tokens"""
+        budget = self.token_budget * CHARS_PER_TOKEN
+        lines = visible_lines(self._cap(text))
+        if not lines:
+            return text[:budget]
+
+        # Prioridad 3: indicios SQL/DB en líneas nuevas respecto al baseline; 2: resto de líneas nuevas;
+        # 1: indicios que ya estaban en el baseline (sin baseline, todos los indicios son prioridad 3)
+        hits = []
+        for index, line in enumerate(lines):
+            keyword = LOWERCASE_KEYWORDS.search(line.lower())
+            is_new = baseline_lines is not None and line not in baseline_lines
+            if keyword:
+                hits.append((3 if is_new or baseline_lines is None else 1, index, keyword.start()))
+            elif is_new:
+                hits.append((2, index, None))
+
+        if not hits:
+            return self._join([self._clip(line, None) for line in lines], budget)
+
+        selected = {}
+        seen = set()  # Las líneas repetidas (plantillas, listados) solo se envían una vez
+        used = 0
+        for priority, index, position in sorted(hits, key=lambda hit: (-hit[0], hit[1])):
+            start = max(index - self.context_lines, 0)
+            end = min(index + self.context_lines, len(lines) - 1)
+            for line_index in range(start, end + 1):
+                if line_index in selected or lines[line_index] in seen:
+                    continue
+                clipped = self._clip(lines[line_index], position if line_index == index else None)
+                if used + len(clipped) + 1 > budget:
+                    break
+                selected[line_index] = clipped
+                seen.add(lines[line_index])
+                used += len(clipped) + 1
+            if used >= budget:
+                break
+
+        # Reconstruir en orden del documento marcando los saltos entre ventanas
+        parts = []
+        previous = None
+        for line_index in sorted(selected):
+            if previous is not None and line_index != previous + 1:
+                parts.append("[...]")
+            parts.append(selected[line_index])
+            previous = line_index
+        return "\n".join(parts)
+
+    def _cap(self, text: str) -> str:
+        """Recorta el HTML a max_input_chars conservando la primera y la última mitad (cortadas entre tags)"""
+        if len(text) <= self.max_input_chars:
+            return text
+        half = self.max_input_chars // 2
+        head, tail = text[:half], text[-half:]
+        head = head[:head.rfind('>') + 1] or head
+        tail = tail[tail.find('<'):] if '<' in tail else tail
+        return head + "\n" + tail
+
+    def _clip(self, line: str, position: Optional[int]) -> str:
+        """Recorta líneas largas (p.ej. HTML minificado) alrededor de la palabra clave"""
+        if len(line) <= self.max_line_chars:
+            return line
+        center = position if position is not None else 0
+        start = max(center - self.max_line_chars // 2, 0)
+        return line[start:start + self.max_line_chars]
+
+    def _join(self, lines: List[str], budget: int) -> str:
+        """Une líneas hasta agotar el presupuesto"""
+        parts = []
+        used = 0
+        for line in lines:
+            if used + len(line) + 1 > budget:
+                break
+            parts.append(line)
+            used += len(line) + 1
+        return "\n".join(parts)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Control adaptativo de concurrencia por host: AIMD, backoff con jitter, Retry-After y circuit breaker
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+# Segundos entre consultas mientras la request de prueba del circuito half-open está en vuelo
+HALF_OPEN_POLL = 0.05
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convierte el header Retry-After (segundos o fecha HTTP) en segundos de espera"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def circuit_open_result(test_url: str, payload: str, host: str) -> Dict:
+    """Resultado de un test que no se envía porque el circuito del host está abierto"""
+    return {
+        'url': test_url,
+        'payload': payload,
+        'error': 'circuit_open',
+        'error_details': f"Circuit breaker abierto: {host} no responde"
+    }
+
+class HostController:
+    """Límite de requests en vuelo para un host, ajustado según latencia, errores y throttling
+
+    - Éxito con latencia normal: aumento aditivo (+1 por ventana; +1 por respuesta hasta la
+      primera congestión, como el slow start de TCP)
+    - Latencia > HOST_LATENCY_FACTOR × latencia mínima (y > HOST_LATENCY_FLOOR), cualquier error de la request o 429/503:
+      reducción multiplicativa (×0.5), como mucho una vez por ventana de latencia
+    - 429/503: pausa el host durante Retry-After (o backoff exponencial con jitter)
+    - HOST_CIRCUIT_THRESHOLD fallos seguidos: circuito abierto durante HOST_CIRCUIT_COOLDOWN;
+      después se deja pasar una sola request de prueba (half-open) y el resto espera su resultado
+    """
+
+    def __init__(self, host: str, max_limit: int = 10):
+        self.host = host
+        self.max_limit = max(max_limit, 1)
+        self.limit = float(min(int(os.getenv("HOST_INITIAL_CONCURRENCY", "2")), self.max_limit))
+        self.latency_factor = float(os.getenv("HOST_LATENCY_FACTOR", "3"))
+        self.latency_floor = float(os.getenv("HOST_LATENCY_FLOOR", "0.5"))  # Segundos: por debajo no hay congestión
+        self.backoff_base = float(os.getenv("HOST_BACKOFF_BASE", "0.5"))
+        self.backoff_cap = float(os.getenv("HOST_BACKOFF_CAP", "30"))
+        self.max_retry_after = float(os.getenv("HOST_MAX_RETRY_AFTER", "120"))
+        self.circuit_threshold = int(os.getenv("HOST_CIRCUIT_THRESHOLD", "5"))
+        self.circuit_cooldown = float(os.getenv("HOST_CIRCUIT_COOLDOWN", "30"))
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.slow_start = True
+        self.min_latency = None
+        self.last_decrease = 0.0
+        self.pause_until = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_throttles = 0
+        self.circuit = 'closed'  # closed | open | half_open
+        self.circuit_until = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'failures': 0, 'decreases': 0, 'circuit_opened': 0}
+
+    def try_acquire(self) -> Tuple[str, float]:
+        """Intenta reservar un slot: ('ok', 0), ('wait', segundos) o ('open', 0) si el circuito está abierto"""
+        with self.lock:
+            now = time.monotonic()
+            if self.circuit == 'open':
+                if now < self.circuit_until:
+                    return 'open', 0.0
+                self.circuit = 'half_open'  # Cooldown cumplido: una request de prueba
+                self.limit = 1.0
+            if self.circuit == 'half_open' and self.in_flight > 0:
+                # La request de prueba está en vuelo: se espera su resultado ('open' solo si falla)
+                return 'wait', HALF_OPEN_POLL
+            if now < self.pause_until:
+                return 'wait', self.pause_until - now
+            if self.in_flight >= int(self.limit):
+                return 'wait', 0.01
+            self.in_flight += 1
+            self.stats['requests'] += 1
+            return 'ok', 0.0
+
+    def release(self, outcome: str, latency: float = None, retry_after: float = None):
+        """Libera el slot y ajusta el límite según el resultado ('success', 'throttled', 'failure' o 'cancelled')"""
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if outcome == 'cancelled':
+                return  # Request abortada por el scanner: no dice nada del host
+
+            if outcome == 'success':
+                self.consecutive_failures = 0
+                self.consecutive_throttles = 0
+                if self.circuit == 'half_open':
+                    self.circuit = 'closed'
+                    print(f"[HOST] {self.host}: circuito cerrado, el host vuelve a responder")
+                congested = self.min_latency is not None and \
+                    latency > max(self.min_latency * self.latency_factor, self.latency_floor)
+                self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+                if congested:
+                    self._decrease(now)
+                elif self.slow_start:
+                    self.limit = min(self.limit + 1, self.max_limit)
+                else:
+                    self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+            elif outcome == 'throttled':
+                self.stats['throttled'] += 1
+                self.consecutive_throttles += 1
+                self._decrease(now)
+                delay = min(retry_after, self.max_retry_after) if retry_after is not None \
+                    else self._backoff(self.consecutive_throttles)
+                self.pause_until = max(self.pause_until, now + delay)
+                print(f"[HOST] {self.host}: throttling, pausa de {delay:.1f}s (límite {int(self.limit)})")
+
+            else:
+                self.stats['failures'] += 1
+                self.consecutive_failures += 1
+                self._decrease(now)
+                self.pause_until = max(self.pause_until, now + self._backoff(self.consecutive_failures))
+                if self.circuit == 'half_open' or self.consecutive_failures >= self.circuit_threshold:
+                    self.circuit = 'open'
+                    self.circuit_until = now + self.circuit_cooldown
+                    self.stats['circuit_opened'] += 1
+                    print(f"[HOST] {self.host}: circuito abierto tras {self.consecutive_failures} fallos seguidos")
+
+    def _decrease(self, now: float):
+        """Reducción multiplicativa, una sola vez por ventana de latencia"""
+        window = max(self.min_latency or 0.0, 0.1)
+        self.slow_start = False
+        if now - self.last_decrease < window:
+            return
+        self.last_decrease = now
+        self.limit = max(self.limit / 2, 1.0)
+        self.stats['decreases'] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def snapshot(self) -> Dict:
+        """Estado serializable para el reporte"""
+        with self.lock:
+            snapshot = dict(self.stats)
+            snapshot.update({
+                'limit': int(self.limit),
+                'circuit': self.circuit,
+                'min_latency_ms': round(self.min_latency * 1000, 2) if self.min_latency is not None else None
+            })
+            return snapshot
+
+class HostControl:
+    """Registro de controladores por host compartido por los handlers síncrono y asíncrono"""
+
+    def __init__(self, max_limit: int = 10):
+        self.max_limit = int(os.getenv("HOST_MAX_CONCURRENCY", str(max_limit)))
+        self.max_retries = int(os.getenv("HOST_MAX_RETRIES", "3"))
+        self.controllers = {}
+        self.lock = threading.Lock()
+
+    def get(self, host: str) -> HostController:
+        with self.lock:
+            if host not in self.controllers:
+                self.controllers[host] = HostController(host, self.max_limit)
+            return self.controllers[host]
+
+    def acquire(self, host: str) -> bool:
+        """Espera un slot para el host (False si el circuito está abierto)"""
+        controller = self.get(host)
+        while True:
+            decision, delay = controller.try_acquire()
+            if decision != 'wait':
+                return decision == 'ok'
+            time.sleep(delay)
+
+    async def acquire_async(self, host: str) -> bool:
+        """Versión asíncrona de acquire"""
+        controller = self.get(host)
+        while True:
+            decision, delay = controller.try_acquire()
+            if decision != 'wait':
+                return decision == 'ok'
+            await asyncio.sleep(delay)
+
+    def release(self, host: str, result: Dict, retry_after: Optional[str] = None):
+        """Clasifica el resultado de un test y lo comunica al controlador del host"""
+        controller = self.get(host)
+        if 'error' in result:
+            # Error de conexión, timeout o error general: ninguno prueba que el host responda
+            controller.release('failure')
+        elif result.get('status_code') in (429, 503):
+            controller.release('throttled', retry_after=parse_retry_after(retry_after))
+        else:
+            controller.release('success', latency=result.get('elapsed_ms', 0) / 1000)
+
+    def should_retry(self, result: Dict, attempt: int) -> bool:
+        """Las respuestas 429/503 se reintentan tras la pausa del host"""
+        return result.get('status_code') in (429, 503) and attempt < self.max_retries
+
+    def snapshot(self, host: str) -> Dict:
+        return self.get(host).snapshot()
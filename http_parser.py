@@ -3,65 +3,279 @@
 Módulo para manejo de requests HTTP, payloads y responses
 """
 
+import asyncio
 import requests
+import codecs
+import json
 import time
 import os
-from typing import Dict, List
-from urllib.parse import parse_qs, urlencode
+import re
+import uuid
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, parse_qsl, quote, quote_plus, urlencode, urlparse
 from dotenv import load_dotenv
 
+from signature_engine import StreamMatcher
+from host_control import circuit_open_result
+from transport import Transport, detect_scheme
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Ubicaciones de los puntos de inyección; INJECTION_POINTS elige cuáles se prueban
+INJECTION_LOCATIONS = ('query', 'form', 'json', 'cookie', 'header', 'path')
+DEFAULT_INJECTION_POINTS = "query,form,json"
+# Headers que se prueban con la ubicación 'header' (si están en la request)
+DEFAULT_INJECTION_HEADERS = "User-Agent,Referer,X-Forwarded-For"
+# Headers que no se reenvían: los recalcula el cliente HTTP para el body inyectado
+HOP_HEADERS = {'content-length', 'transfer-encoding'}
+# Fin de los headers: primera línea en blanco (LF o CRLF, como en las exportaciones de proxies)
+HEADER_END = re.compile(r'\r?\n[ \t]*\r?\n')
+# Marcador que se serializa en lugar del valor para partir la request alrededor del slot
+SLOT_MARKER = f"sqlislot{uuid.uuid4().hex}"
+
+def injection_points_from_env() -> List[str]:
+    """Ubicaciones configuradas en INJECTION_POINTS"""
+    points = os.getenv("INJECTION_POINTS", DEFAULT_INJECTION_POINTS)
+    return [point.strip() for point in points.split(',') if point.strip()]
+
+def encode_form_value(payload: str) -> str:
+    return quote_plus(payload)
+
+def encode_json_value(payload: str) -> str:
+    return json.dumps(payload, ensure_ascii=False)
+
+def encode_segment_value(payload: str) -> str:
+    return quote(payload, safe='')
+
+def encode_header_value(payload: str) -> str:
+    # Un salto de línea partiría el header
+    return payload.replace('\r', ' ').replace('\n', ' ')
+
+# Versión HTTP de urllib3 (response.raw.version) en el formato de httpx
+HTTP_VERSIONS = {10: 'HTTP/1.0', 11: 'HTTP/1.1', 20: 'HTTP/2'}
+# Headers que identifican la tecnología del servidor (fingerprint del orden adaptativo de payloads)
+SERVER_HEADERS = ('Server', 'X-Powered-By')
+
+def server_headers(headers) -> Dict[str, str]:
+    """Headers de tecnología presentes en la respuesta"""
+    return {name: headers[name] for name in SERVER_HEADERS if name in headers}
+
+class InjectionSlot:
+    """Punto de inyección precompilado: la parte de la request antes y después del valor"""
+    
+    __slots__ = ('name', 'location', 'key', 'original', 'prefix', 'suffix', 'encode', 'header')
+    
+    def __init__(self, name: str, location: str, key: str, original: str, serialized, marker, encode,
+                 header: str = None):
+        self.name = name
+        self.location = location
+        self.key = key
+        self.original = original
+        self.prefix, self.suffix = serialized.split(marker, 1)
+        self.encode = encode
+        self.header = header  # Header que contiene el slot (cookie/header)
+
+class PreparedTest:
+    """Request lista para enviar con el payload ya insertado"""
+    
+    __slots__ = ('method', 'url', 'headers', 'body', 'location')
+    
+    def __init__(self, method: str, url: str, headers: Dict[str, str], body: bytes, location: str):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.location = location
+
 class HttpRequest:
-    """Clase para parsear requests HTTP raw"""
+    """Request HTTP raw compilada como plantilla con slots de inyección con nombre
+
+    Cada slot guarda la request serializada partida alrededor del valor original, así que
+    construir un test solo codifica el payload y lo concatena (sin reparsear ni re-codificar el resto).
+    Nombres: los parámetros de query y form usan su nombre; el resto lleva prefijo
+    ('json:user.id', 'cookie:session', 'header:User-Agent', 'path:2').
+    """
     
-    def __init__(self, raw_request: str):
+    def __init__(self, raw_request: str, scheme: str = None):
         self.raw_request = raw_request
+        self.scheme = scheme  # http, https o None/'auto' (se detecta al parsear)
         self.method = ""
         self.url = ""
         self.headers = {}
         self.body = ""
-        self.params = {}
+        self.params = {}  # Parámetros de query y form (nombre -> lista de valores)
+        self.slots = {}  # Nombre -> InjectionSlot
         self._parse_request()
+        self._compile_slots()
     
     def _parse_request(self):
-        """Parsea la request HTTP raw"""
-        lines = self.raw_request.strip().split('\n')
+        """Parsea la request HTTP raw (LF o CRLF); el body se conserva tal cual tras la línea en blanco"""
+        raw_request = self.raw_request.strip()
+        header_end = HEADER_END.search(raw_request)
+        head = raw_request[:header_end.start()] if header_end else raw_request
+        lines = [line.rstrip('\r') for line in head.split('\n')]
         
         # Primera línea: método, URL, versión
         first_line = lines[0].strip()
-        parts = first_line.split(' ')
+        parts = first_line.split()
         self.method = parts[0]
         full_url = parts[1]
         
+        # Forma absoluta (requests exportadas de un proxy): el esquema y el host van en la línea
+        absolute = urlparse(full_url) if full_url.startswith(('http://', 'https://')) else None
+        if absolute is not None:
+            full_url = absolute.path or '/'
+            if absolute.query:
+                full_url += f"?{absolute.query}"
+        
         # Separar URL y parámetros GET
+        self.query_string = ''
         if '?' in full_url:
-            base_url, query_string = full_url.split('?', 1)
-            self.params.update(parse_qs(query_string, keep_blank_values=True))
+            base_url, self.query_string = full_url.split('?', 1)
+            self.params.update(parse_qs(self.query_string, keep_blank_values=True))
         else:
             base_url = full_url
+        self.path = base_url
         
-        # Procesar headers
-        header_end = 1
-        for i, line in enumerate(lines[1:], 1):
-            if line.strip() == '':
-                header_end = i + 1
-                break
+        # Procesar headers; las cookies repetidas (HTTP/2) se unen en un único header
+        for line in lines[1:]:
             if ':' in line:
                 key, value = line.split(':', 1)
-                self.headers[key.strip()] = value.strip()
+                key, value = key.strip(), value.strip()
+                if key.lower() == 'cookie' and self.header('Cookie') is not None:
+                    key = next(name for name in self.headers if name.lower() == 'cookie')
+                    value = f"{self.headers[key]}; {value}"
+                self.headers[key] = value
         
         # Host header para construir URL completa
-        host = self.headers.get('Host', 'localhost')
-        self.url = f"http://{host}{base_url}"
+        host = absolute.netloc if absolute is not None else self.header('Host', 'localhost')
+        self.scheme = absolute.scheme if absolute is not None else detect_scheme(host, self.headers, self.scheme)
+        self.origin = f"{self.scheme}://{host}"
+        self.url = f"{self.origin}{base_url}"
         
-        # Body (si existe)
-        if header_end < len(lines):
-            self.body = '\n'.join(lines[header_end:])
+        # Body (sin línea en blanco no hay body)
+        if header_end:
+            self.body = raw_request[header_end.end():]
             # Parsear parámetros POST si es form-encoded
-            if 'application/x-www-form-urlencoded' in self.headers.get('Content-Type', ''):
+            if 'application/x-www-form-urlencoded' in self.header('Content-Type', ''):
                 self.params.update(parse_qs(self.body, keep_blank_values=True))
+    
+    def header(self, name: str, default: str = None) -> str:
+        """Valor de un header sin distinguir mayúsculas (HTTP/2 y los HAR los exportan en minúsculas)"""
+        name = name.lower()
+        return next((value for key, value in self.headers.items() if key.lower() == name), default)
+    
+    def _compile_slots(self):
+        """Precalcula la URL, headers y body originales y los slots de cada ubicación"""
+        self.baseline_url = f"{self.url}?{self.query_string}" if self.query_string else self.url
+        self.send_headers = {key: value for key, value in self.headers.items() if key.lower() not in HOP_HEADERS}
+        self.body_bytes = self.body.encode('utf-8')
+        content_type = self.header('Content-Type', '')
+        
+        if self.query_string:
+            pairs = parse_qsl(self.query_string, keep_blank_values=True)
+            for slot_name, name, original, query in self._form_variants(pairs):
+                self._add_slot(slot_name, 'query', name, original, f"{self.url}?{query}", quote_plus(SLOT_MARKER),
+                               encode_form_value)
+        
+        if self.body and 'application/x-www-form-urlencoded' in content_type:
+            pairs = parse_qsl(self.body, keep_blank_values=True)
+            for slot_name, name, original, body in self._form_variants(pairs):
+                slot_name = slot_name if slot_name not in self.slots else f"form:{slot_name}"
+                self._add_slot(slot_name, 'form', name, original, body.encode('utf-8'),
+                               quote_plus(SLOT_MARKER).encode('utf-8'), encode_form_value)
+        
+        if self.body and 'json' in content_type:
+            try:
+                document = json.loads(self.body)
+            except ValueError:
+                document = None
+            if document is not None:
+                marker = json.dumps(SLOT_MARKER).encode('utf-8')
+                for path, original, body in self._json_variants(document):
+                    self._add_slot(f"json:{path}", 'json', path, original, body.encode('utf-8'), marker,
+                                   encode_json_value)
+        
+        cookie_header = next((key for key in self.send_headers if key.lower() == 'cookie'), None)
+        if cookie_header:
+            cookies = [part.strip() for part in self.send_headers[cookie_header].split(';') if part.strip()]
+            for i, cookie in enumerate(cookies):
+                name, _, original = cookie.partition('=')
+                serialized = '; '.join(cookies[:i] + [f"{name}={SLOT_MARKER}"] + cookies[i + 1:])
+                self._add_slot(f"cookie:{name}", 'cookie', name, original, serialized, SLOT_MARKER,
+                               encode_segment_value, cookie_header)
+        
+        wanted = {name.strip().lower() for name in os.getenv("INJECTION_HEADERS", DEFAULT_INJECTION_HEADERS).split(',')}
+        for header, original in self.send_headers.items():
+            if header.lower() in wanted:
+                self._add_slot(f"header:{header}", 'header', header, original, SLOT_MARKER, SLOT_MARKER,
+                               encode_header_value, header)
+        
+        segments = self.path.split('/')
+        query = f"?{self.query_string}" if self.query_string else ''
+        for i, segment in enumerate(segments):
+            # Solo segmentos que parecen valores (no scripts como artists.php)
+            if segment and '.' not in segment:
+                serialized = self.origin + '/'.join(segments[:i] + [SLOT_MARKER] + segments[i + 1:]) + query
+                self._add_slot(f"path:{i}", 'path', str(i), segment, serialized, SLOT_MARKER, encode_segment_value)
+    
+    def _form_variants(self, pairs: List[Tuple[str, str]]):
+        """Serializa los pares form/query con el marcador en cada aparición de cada nombre
+
+        Las apariciones repetidas (a=1&a=2) son slots propios: 'a', 'a#2', 'a#3'...
+        """
+        seen = {}
+        for i, (name, original) in enumerate(pairs):
+            seen[name] = seen.get(name, 0) + 1
+            marked = pairs[:i] + [(name, SLOT_MARKER)] + pairs[i + 1:]
+            yield name if seen[name] == 1 else f"{name}#{seen[name]}", name, original, urlencode(marked)
+    
+    def _json_variants(self, document, path: str = ''):
+        """Recorre las hojas string/número del JSON y lo serializa con el marcador en cada una"""
+        root = document
+        pending = [(document, path)]
+        while pending:
+            node, prefix = pending.pop(0)
+            items = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, list) else ()
+            for key, value in list(items):
+                child = f"{prefix}.{key}" if isinstance(node, dict) and prefix else \
+                    (str(key) if isinstance(node, dict) else f"{prefix}[{key}]")
+                if isinstance(value, (dict, list)):
+                    pending.append((value, child))
+                elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                    node[key] = SLOT_MARKER
+                    serialized = json.dumps(root, ensure_ascii=False)
+                    node[key] = value
+                    yield child, str(value), serialized
+    
+    def _add_slot(self, name: str, location: str, key: str, original: str, serialized, marker, encode,
+                  header: str = None):
+        if name not in self.slots:
+            self.slots[name] = InjectionSlot(name, location, key, original, serialized, marker, encode, header)
+    
+    def injection_points(self, locations: List[str] = None) -> List[str]:
+        """Nombres de los slots de las ubicaciones indicadas (por defecto INJECTION_POINTS)"""
+        locations = locations or injection_points_from_env()
+        return [name for name, slot in self.slots.items() if slot.location in locations]
+    
+    def build_baseline(self) -> PreparedTest:
+        """Request original sin modificar"""
+        return PreparedTest(self.method, self.baseline_url, self.send_headers, self.body_bytes, 'baseline')
+    
+    def build_test(self, param_name: str, payload: str) -> PreparedTest:
+        """Inserta el payload codificado en el slot del parámetro"""
+        slot = self.slots[param_name]
+        value = slot.encode(payload)
+        url, headers, body = self.baseline_url, self.send_headers, self.body_bytes
+        if slot.location in ('query', 'path'):
+            url = slot.prefix + value + slot.suffix
+        elif slot.location in ('form', 'json'):
+            body = slot.prefix + value.encode('utf-8') + slot.suffix
+        else:
+            headers = dict(self.send_headers)
+            headers[slot.header] = slot.prefix + value + slot.suffix
+        return PreparedTest(self.method, url, headers, body, slot.location)
 
 class PayloadManager:
     """Maneja los payloads para SQL injection desde archivo externo"""
@@ -86,44 +300,130 @@ class PayloadManager:
         except Exception as e:
             return []
 
+class ResponseBodyReader:
+    """Lee el body por chunks con límite de bytes y corte temprano al detectar una firma SQL"""
+    
+    def __init__(self, encoding: str = None, max_bytes: int = None, matcher=None):
+        self.decoder = codecs.getincrementaldecoder(self._codec(encoding))(errors='replace')
+        self.max_bytes = max_bytes
+        self.matcher = matcher
+        self.parts = []
+        self.bytes_read = 0
+        self.stop_reason = None
+        self.match = None
+    
+    def _codec(self, encoding: str) -> str:
+        """Devuelve un codec válido (utf-8 si el declarado no existe)"""
+        try:
+            return codecs.lookup(encoding or 'utf-8').name
+        except LookupError:
+            return 'utf-8'
+    
+    def feed(self, chunk: bytes) -> bool:
+        """Procesa un chunk; devuelve True si hay que cortar la descarga"""
+        if self.max_bytes and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.stop_reason = 'size_cap'
+        self.bytes_read += len(chunk)
+        
+        text = self.decoder.decode(chunk)
+        self.parts.append(text)
+        
+        if self.matcher is not None and self.match is None and text:
+            self.match = self.matcher.feed(text)
+            if self.match is not None:
+                self.stop_reason = 'signature'
+        
+        return self.stop_reason is not None
+    
+    def result(self, test_url: str, payload: str, status_code: int) -> Dict:
+        """Construye el resultado del test con la información del streaming"""
+        self.parts.append(self.decoder.decode(b'', final=True))
+        response_text = ''.join(self.parts)
+        
+        return {
+            'url': test_url,
+            'payload': payload,
+            'status_code': status_code,
+            'response_text': response_text,
+            'response_size': len(response_text),
+            'bytes_read': self.bytes_read,
+            'truncated': self.stop_reason is not None,
+            'stream_stop': self.stop_reason,
+            'stream_match': self.match,
+            # Sin coincidencia, el streaming solo es un verdict definitivo si el matcher es exhaustivo
+            'stream_exhaustive': self.matcher is not None and self.matcher.exhaustive
+        }
+
 class RequestHandler:
     """Maneja las requests HTTP y responses"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+    def __init__(self, pool_size: int = 10, stream: bool = False, max_bytes: int = None, signature_engine=None,
+                 host_control=None, transport: Transport = None):
+        # Control adaptativo por host (AIMD, Retry-After, circuit breaker); None = sin control
+        self.host_control = host_control
+        # Modo streaming: lectura por chunks con límite de bytes y corte por firma SQL
+        self.stream = stream
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))
+        self.chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+        self.signature_engine = signature_engine
+        # Pool por host dimensionado para compartir la sesión entre threads, TLS compartido y caché DNS
+        self.transport = transport or Transport(pool_size)
+        self.session = self.transport.create_session()
     
     def test_parameter(self, request: HttpRequest, param_name: str, payload: str) -> Dict:
         """Prueba un parámetro específico con un payload"""
-        test_params = request.params.copy()
-        
-        # Aplicar payload al parámetro
-        if isinstance(test_params[param_name], list):
-            test_params[param_name] = [payload]
-        else:
-            test_params[param_name] = payload
-        
-        # Reconstruir URL con parámetros
-        query_string = urlencode({k: v[0] if isinstance(v, list) else v for k, v in test_params.items()})
-        test_url = f"{request.url.split('?')[0]}?{query_string}"
-        
+        return self._send(request.build_test(param_name, payload), payload)
+    
+    def fetch_baseline(self, request: HttpRequest) -> Dict:
+        """Envía la request sin modificar para obtener la respuesta baseline"""
+        return self._send(request.build_baseline(), '')
+    
+    def _send(self, prepared: PreparedTest, payload: str) -> Dict:
+        """Envía la request respetando el control del host y añade la duración HTTP en ms (reloj monótono)"""
+        host = urlparse(prepared.url).netloc
+        attempt = 0
+        while True:
+            if self.host_control is not None and not self.host_control.acquire(host):
+                return circuit_open_result(prepared.url, payload, host)
+            start = time.perf_counter()
+            result = self._send_request(prepared, payload)
+            result['injection_point'] = prepared.location
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            if self.host_control is None:
+                return result
+            self.host_control.release(host, result, result.get('retry_after'))
+            if not self.host_control.should_retry(result, attempt):
+                result['retries'] = attempt
+                return result
+            attempt += 1
+    
+    def _send_request(self, prepared: PreparedTest, payload: str) -> Dict:
+        """Envía la request preparada y normaliza el resultado"""
+        test_url = prepared.url
         try:
+            if self.stream:
+                return self._send_streaming(prepared, payload)
+            
             response = self.session.request(
-                method=request.method,
+                method=prepared.method,
                 url=test_url,
-                headers=request.headers,
-                data=request.body,
+                headers=prepared.headers,
+                data=prepared.body,
                 timeout=int(os.getenv("REQUEST_TIMEOUT", "10"))
             )
+            self.transport.stats.record_request(HTTP_VERSIONS.get(response.raw.version, 'HTTP/1.1'))
+            # response.text decodifica en cada acceso: decodificar una sola vez
+            response_text = response.text
             
             return {
                 'url': test_url,
                 'payload': payload,
                 'status_code': response.status_code,
-                'response_text': response.text,
-                'response_size': len(response.text)
+                'response_text': response_text,
+                'response_size': len(response_text),
+                'retry_after': response.headers.get('Retry-After'),
+                'server_headers': server_headers(response.headers)
             }
         except requests.exceptions.ConnectionError as e:
             return {
@@ -145,4 +445,145 @@ class RequestHandler:
                 'payload': payload,
                 'error': 'general_error',
                 'error_details': f"Error general: {str(e)}"
-            } 
\ No newline at end of file
+            } 
+
+    def _send_streaming(self, prepared: PreparedTest, payload: str) -> Dict:
+        """Descarga el body por chunks y corta al llegar al límite o al detectar una firma"""
+        test_url = prepared.url
+        with self.session.request(
+            method=prepared.method,
+            url=test_url,
+            headers=prepared.headers,
+            data=prepared.body,
+            timeout=int(os.getenv("REQUEST_TIMEOUT", "10")),
+            stream=True
+        ) as response:
+            self.transport.stats.record_request(HTTP_VERSIONS.get(response.raw.version, 'HTTP/1.1'))
+            reader = self._new_reader(response.encoding)
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if reader.feed(chunk):
+                    break
+            result = reader.result(test_url, payload, response.status_code)
+            result['retry_after'] = response.headers.get('Retry-After')
+            result['server_headers'] = server_headers(response.headers)
+            return result
+    
+    def _new_reader(self, encoding: str) -> ResponseBodyReader:
+        """Crea un lector de body con el matcher incremental de firmas"""
+        matcher = StreamMatcher(self.signature_engine) if self.signature_engine is not None else None
+        return ResponseBodyReader(encoding, self.max_bytes, matcher)
+
+class AsyncRequestHandler:
+    """Maneja las requests HTTP de forma asíncrona usando httpx"""
+    
+    def __init__(self, max_connections: int = 10, stream: bool = False, max_bytes: int = None, signature_engine=None,
+                 host_control=None, transport: Transport = None):
+        self.host_control = host_control
+        self.stream = stream
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))
+        self.chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+        self.signature_engine = signature_engine
+        # HTTP/2 multiplexado si el servidor lo negocia; las conexiones se registran con el trace de httpcore
+        self.transport = transport or Transport(max_connections)
+        self.client = self.transport.create_async_client(max_connections)
+    
+    async def test_parameter(self, request: HttpRequest, param_name: str, payload: str) -> Dict:
+        """Prueba un parámetro específico con un payload (versión asíncrona)"""
+        prepared = request.build_test(param_name, payload)
+        test_url = prepared.url
+        host = urlparse(test_url).netloc
+        attempt = 0
+        while True:
+            if self.host_control is not None and not await self.host_control.acquire_async(host):
+                return circuit_open_result(test_url, payload, host)
+            start = time.perf_counter()
+            try:
+                result = await self._send(prepared, payload)
+            except asyncio.CancelledError:
+                # Test cancelado por la parada temprana: liberar el slot del host
+                if self.host_control is not None:
+                    self.host_control.get(host).release('cancelled')
+                raise
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            result['injection_point'] = prepared.location
+            if self.host_control is None:
+                return result
+            self.host_control.release(host, result, result.get('retry_after'))
+            if not self.host_control.should_retry(result, attempt):
+                result['retries'] = attempt
+                return result
+            attempt += 1
+    
+    async def _send(self, prepared: PreparedTest, payload: str) -> Dict:
+        """Envía la request preparada y normaliza el resultado"""
+        import httpx  # Ya cargado por Transport.create_async_client
+        test_url = prepared.url
+        try:
+            if self.stream:
+                return await self._send_streaming(prepared, payload)
+            
+            response = await self.client.request(
+                method=prepared.method,
+                url=test_url,
+                headers=prepared.headers,
+                content=prepared.body or None,
+                extensions={'trace': self.transport.async_trace(test_url)}
+            )
+            self.transport.stats.record_request(response.http_version)
+            response_text = response.text
+            
+            return {
+                'url': test_url,
+                'payload': payload,
+                'status_code': response.status_code,
+                'response_text': response_text,
+                'response_size': len(response_text),
+                'retry_after': response.headers.get('Retry-After'),
+                'server_headers': server_headers(response.headers)
+            }
+        except httpx.TimeoutException as e:
+            return {
+                'url': test_url,
+                'payload': payload,
+                'error': 'timeout_error',
+                'error_details': f"Timeout: {str(e)}"
+            }
+        except httpx.NetworkError as e:
+            return {
+                'url': test_url,
+                'payload': payload,
+                'error': 'connection_error',
+                'error_details': f"Servidor no responde: {str(e)}"
+            }
+        except Exception as e:
+            return {
+                'url': test_url,
+                'payload': payload,
+                'error': 'general_error',
+                'error_details': f"Error general: {str(e)}"
+            }
+    
+    async def _send_streaming(self, prepared: PreparedTest, payload: str) -> Dict:
+        """Descarga el body por chunks y corta al llegar al límite o al detectar una firma"""
+        test_url = prepared.url
+        async with self.client.stream(
+            method=prepared.method,
+            url=test_url,
+            headers=prepared.headers,
+            content=prepared.body or None,
+            extensions={'trace': self.transport.async_trace(test_url)}
+        ) as response:
+            self.transport.stats.record_request(response.http_version)
+            matcher = StreamMatcher(self.signature_engine) if self.signature_engine is not None else None
+            reader = ResponseBodyReader(response.encoding, self.max_bytes, matcher)
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                if reader.feed(chunk):
+                    break
+            result = reader.result(test_url, payload, response.status_code)
+            result['retry_after'] = response.headers.get('Retry-After')
+            result['server_headers'] = server_headers(response.headers)
+            return result
+    
+    async def close(self):
+        """Cierra el cliente HTTP asíncrono"""
+        await self.client.aclose()
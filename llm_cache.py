@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Caché persistente (SQLite) de verdicts del LLM direccionada por contenido
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+class LLMCache:
+    """Guarda verdicts de OpenAI indexados por hash del contenido normalizado, modelo y versión del prompt"""
+
+    def __init__(self, cache_dir: str = None, ttl: int = None, max_entries: int = None):
+        self.cache_dir = cache_dir or os.getenv("LLM_CACHE_DIR", ".sqli_cache")
+        self.ttl = ttl if ttl is not None else int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, 'llm_verdicts.sqlite3'), check_same_thread=False,
+                                    timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, kind TEXT, result TEXT, created REAL, accessed REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_accessed ON verdicts(accessed)")
+        self.conn.commit()
+        self._expire()
+
+    def make_key(self, kind: str, content: str, model: str, prompt_version: str, context: str = None) -> str:
+        """Genera la clave a partir del contenido normalizado, el modelo y la versión del prompt
+
+        context distingue verdicts que dependen de algo más que el contenido (p.ej. la comilla del payload).
+        """
+        normalized = re.sub(r"\s+", " ", content).strip()
+        digest = hashlib.sha256()
+        parts = (kind, model, prompt_version, normalized) if context is None else \
+            (kind, model, prompt_version, normalized, context)
+        for part in parts:
+            digest.update(part.encode('utf-8', errors='replace'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve el verdict guardado o None si no existe o expiró"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT result, created FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE verdicts SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, kind: str, result: Dict):
+        """Guarda un verdict y aplica la política de tamaño máximo (LRU)"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, kind, result, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            self._evict_over_size()
+            self.conn.commit()
+
+    def _expire(self):
+        """Elimina las entradas que superaron el TTL"""
+        if not self.ttl:
+            return
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM verdicts WHERE created < ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+            self.conn.commit()
+
+    def _evict_over_size(self):
+        """Elimina las entradas menos usadas recientemente si se supera max_entries"""
+        if not self.max_entries:
+            return
+        count = self.conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self.conn.execute(
+                "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY accessed ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += cursor.rowcount
+
+    def stats(self) -> Dict:
+        """Contadores de hits/misses para el reporte"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'evictions': self.evictions
+        }
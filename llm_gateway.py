@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Gateway asíncrono compartido hacia la API de OpenAI: límites RPM/TPM, reintentos y deduplicación
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List
+
+import openai
+
+from host_control import parse_retry_after
+from scan_metrics import add_token_usage, token_usage
+
+# Errores transitorios que se reintentan (429, 5xx, conexión y timeouts)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+# Formatos de salida: json_schema (structured outputs), json_object (JSON mode) o none (solo el prompt)
+RESPONSE_FORMATS = ('json_schema', 'json_object', 'none')
+# Frases de la API cuando un parámetro no está soportado (OpenAI y proveedores compatibles)
+UNSUPPORTED_MARKERS = ('not supported', 'unsupported', 'does not support', 'unknown parameter', 'unrecognized',
+                       'not allowed', 'extra inputs')
+# Mensaje del reintento tras una respuesta que no cumple el esquema (el prefijo del prompt no cambia)
+PARSE_RETRY_MESSAGE = "La respuesta anterior no es un JSON válido con los campos del esquema. Responde solo con el JSON."
+
+def unsupported_response_format(error: Exception) -> bool:
+    """Indica si un 400 de la API se debe a que el modelo no admite response_format/json_schema
+
+    Un esquema inválido, un prompt demasiado largo u otro 400 no cuentan: esos errores se propagan.
+    """
+    message = (getattr(error, 'message', None) or str(error)).lower()
+    param = (getattr(error, 'param', None) or '').lower()
+    about_format = param.startswith('response_format') or 'response_format' in message or 'json_schema' in message
+    return about_format and any(marker in message for marker in UNSUPPORTED_MARKERS)
+
+def parse_json_response(raw_response: str, required: List[str]) -> Dict:
+    """Parsea la respuesta del modelo; ValueError si no es un objeto JSON con los campos requeridos"""
+    text = (raw_response or '').strip()
+    if text.startswith("```"):
+        # Solo con LLM_RESPONSE_FORMAT=none: con salida estructurada el modelo no añade bloques markdown
+        text = text.strip('`').removeprefix('json').strip()
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("La respuesta no es un objeto JSON")
+    missing = [key for key in required if key not in data]
+    if missing:
+        raise ValueError(f"Faltan campos en la respuesta: {', '.join(missing)}")
+    return data
+
+class TokenBucket:
+    """Token bucket con capacidad por minuto (para requests o tokens)"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Espera hasta poder consumir amount; devuelve los segundos esperados"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return waited
+            delay = (amount - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+    def adjust(self, delta: float):
+        """Corrige el consumo estimado con el real (delta positivo = se consumió más)"""
+        self._refill()
+        self.tokens = max(self.tokens - delta, -self.capacity)
+
+class LLMGateway:
+    """Cliente AsyncOpenAI único con su propio event loop, usable desde código síncrono y threads
+
+    - LLM_RPM / LLM_TPM: token buckets de requests y tokens por minuto (0 = sin límite)
+    - LLM_MAX_CONCURRENCY: llamadas simultáneas a la API
+    - LLM_MAX_RETRIES: reintentos de errores transitorios con backoff y jitter (respeta Retry-After)
+    - Los prompts idénticos en vuelo se envían una sola vez y comparten la respuesta
+    - LLM_RESPONSE_FORMAT: salida estructurada de complete_json (json_schema, json_object o none)
+    - LLM_PARSE_RETRIES: reintentos cuando la respuesta no cumple el esquema (por defecto 1)
+    """
+
+    def __init__(self):
+        self.rpm = int(os.getenv("LLM_RPM", "500"))
+        self.tpm = int(os.getenv("LLM_TPM", "200000"))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.output_estimate = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "300"))
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "60"))
+        self.response_format = os.getenv("LLM_RESPONSE_FORMAT", "json_schema")
+        if self.response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"LLM_RESPONSE_FORMAT inválido: {self.response_format} (usa {', '.join(RESPONSE_FORMATS)})")
+        self.parse_retries = int(os.getenv("LLM_PARSE_RETRIES", "1"))
+        self.stats_counters = {'requests': 0, 'retries': 0, 'deduplicated': 0, 'errors': 0, 'throttle_wait_s': 0.0,
+                               'parse_retries': 0, 'parse_failures': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._request_bucket = None
+        self._token_bucket = None
+        self._semaphore = None
+        self._in_flight = {}  # Hash del prompt -> task en curso
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Arranca el event loop del gateway en un thread dedicado (una sola vez)"""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-gateway', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _setup(self):
+        """Crea el cliente y los límites dentro del event loop del gateway"""
+        # Los reintentos los gestiona el gateway, no el SDK
+        self._client = openai.AsyncOpenAI(max_retries=0, timeout=self.timeout)
+        self._request_bucket = TokenBucket(self.rpm) if self.rpm > 0 else None
+        self._token_bucket = TokenBucket(self.tpm) if self.tpm > 0 else None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def complete(self, model: str, messages: List[Dict], temperature: float = 0.1, response_format: Dict = None):
+        """Llamada síncrona de chat completions a través del gateway (bloquea el thread que llama)"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.acomplete(model, messages, temperature, response_format),
+                                                loop).result()
+
+    def complete_json(self, model: str, messages: List[Dict], schema_name: str, schema: Dict,
+                      temperature: float = 0.1) -> Dict:
+        """Llamada con salida estructurada que reintenta las respuestas que no cumplen el esquema
+
+        Devuelve data (None si no se obtuvo un JSON válido), raw_response, usage (suma de los intentos),
+        parse_retries y error. Los errores de la API se propagan como en complete.
+        """
+        required = schema.get('required', [])
+        attempt_messages = list(messages)
+        usage = None
+        retries = 0
+        while True:
+            response = self._complete_structured(model, attempt_messages, schema_name, schema, temperature)
+            usage = add_token_usage(usage, token_usage(response))
+            raw_response = response.choices[0].message.content or ''
+            try:
+                data = parse_json_response(raw_response, required)
+                return {'data': data, 'raw_response': raw_response, 'usage': usage, 'parse_retries': retries,
+                        'error': None}
+            except ValueError as e:  # json.JSONDecodeError es un ValueError
+                if retries >= self.parse_retries:
+                    self.stats_counters['parse_failures'] += 1
+                    return {'data': None, 'raw_response': raw_response, 'usage': usage, 'parse_retries': retries,
+                            'error': str(e)}
+                retries += 1
+                self.stats_counters['parse_retries'] += 1
+                print(f"[LLM] Respuesta no válida ({e}), reintento de parseo {retries}/{self.parse_retries}")
+                attempt_messages = list(messages) + [{"role": "assistant", "content": raw_response},
+                                                     {"role": "user", "content": PARSE_RETRY_MESSAGE}]
+
+    def _complete_structured(self, model: str, messages: List[Dict], schema_name: str, schema: Dict,
+                             temperature: float):
+        """complete con el response_format configurado; si el modelo no admite json_schema pasa a json_object"""
+        if self.response_format == 'json_schema':
+            response_format = {'type': 'json_schema', 'json_schema': {'name': schema_name, 'strict': True, 'schema': schema}}
+        elif self.response_format == 'json_object':
+            response_format = {'type': 'json_object'}
+        else:
+            response_format = None
+        try:
+            return self.complete(model, messages, temperature, response_format)
+        except openai.BadRequestError as e:
+            # Solo el rechazo de json_schema cambia el formato (para todo el proceso); el resto de 400 se propaga
+            if self.response_format != 'json_schema' or not unsupported_response_format(e):
+                raise
+            print(f"[LLM] El modelo no admite json_schema ({e.message}), se usa json_object")
+            self.response_format = 'json_object'
+            return self.complete(model, messages, temperature, {'type': 'json_object'})
+
+    async def acomplete(self, model: str, messages: List[Dict], temperature: float = 0.1, response_format: Dict = None):
+        """Llamada asíncrona con deduplicación de prompts idénticos en vuelo"""
+        key = hashlib.sha256(
+            json.dumps([model, messages, temperature, response_format], sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats_counters['deduplicated'] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._send(model, messages, temperature, response_format))
+        self._in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _send(self, model: str, messages: List[Dict], temperature: float, response_format: Dict = None):
+        """Envía la llamada respetando los límites y reintenta los errores transitorios"""
+        estimate = sum(len(message.get('content', '')) for message in messages) // 4 + self.output_estimate
+        attempt = 0
+        while True:
+            if self._request_bucket is not None:
+                self.stats_counters['throttle_wait_s'] += await self._request_bucket.acquire(1)
+            if self._token_bucket is not None:
+                self.stats_counters['throttle_wait_s'] += await self._token_bucket.acquire(estimate)
+
+            try:
+                async with self._semaphore:
+                    self.stats_counters['requests'] += 1
+                    # Sin response_format no se envía el campo (proveedores compatibles que no lo admiten)
+                    extra = {'response_format': response_format} if response_format else {}
+                    response = await self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        **extra
+                    )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    self.stats_counters['errors'] += 1
+                    raise
+                attempt += 1
+                self.stats_counters['retries'] += 1
+                delay = self._retry_delay(e, attempt)
+                print(f"[LLM] {type(e).__name__}, reintento {attempt}/{self.max_retries} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                self.stats_counters['errors'] += 1
+                raise
+
+            # Ajustar el bucket de tokens con el consumo real
+            usage = getattr(response, 'usage', None)
+            counted = token_usage(response)
+            if counted is not None:
+                self.stats_counters['prompt_tokens'] += counted['prompt_tokens']
+                self.stats_counters['cached_tokens'] += counted['cached_tokens']
+            if self._token_bucket is not None and usage is not None and usage.total_tokens:
+                self._token_bucket.adjust(usage.total_tokens - estimate)
+            return response
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Retry-After del error si existe; si no, backoff exponencial con jitter completo"""
+        response = getattr(error, 'response', None)
+        retry_after = parse_retry_after(response.headers.get('retry-after')) if response is not None else None
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.5)
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    def stats(self) -> Dict:
+        """Contadores del gateway para el reporte"""
+        stats = dict(self.stats_counters)
+        stats['throttle_wait_s'] = round(stats['throttle_wait_s'], 2)
+        stats['response_format'] = self.response_format
+        # Fracción del prompt servida desde la caché de prefijos del proveedor
+        stats['cached_token_ratio'] = round(stats['cached_tokens'] / stats['prompt_tokens'], 3) if stats['prompt_tokens'] else 0.0
+        return stats
@@ -7,14 +7,31 @@ import json
 import time
 import os
 import sys
-from typing import Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Importar módulos
-from http_parser import HttpRequest, PayloadManager, RequestHandler
-from manual_detector import ManualDetector
-from openai_detector import OpenAIDetector
-from recheck_detector import RecheckDetector
+from http_parser import HttpRequest, PayloadManager, RequestHandler, injection_points_from_env
+from detection_pipeline import DEFAULT_STAGES, DetectionPipeline
+from detector_registry import detectors_from_env, enabled_stages, load_detector, resolve_detectors
+from excerpt_extractor import ExcerptExtractor
+from llm_cache import LLMCache
+from response_fingerprint import fingerprint_result
+from response_clusters import ResponseClusterIndex
+from async_engine import AsyncScanEngine
+from batch_scanner import BatchScanner
+from traffic_import import RequestFilter
+from scan_metrics import ScanMetrics, StageTimer
+from scan_journal import ScanJournal
+from host_control import HostControl
+from transport import Transport
+from report_sink import EvidenceStore, ReportSink
+from payload_scheduler import PayloadScheduler
+from context_probe import MAX_PROBES, ContextProber, payloads_for_context
+from coordinator import Coordinator, run_worker
 
 # Cargar variables de entorno
 load_dotenv()
@@ -22,112 +39,314 @@ load_dotenv()
 class SQLInjectionScanner:
     """Agente principal para detectar SQL injection"""
     
-    def __init__(self, enable_recheck=False):
-        self.request_handler = RequestHandler()
-        self.manual_detector = ManualDetector()
-        self.openai_detector = OpenAIDetector()
+    def __init__(self, enable_recheck=False, concurrency=1, pool_size=10, detection_mode=None, enable_cache=True,
+                 enable_baseline=True, stream_responses=False, trace_file=None, journal_file=None, resume=False,
+                 rate_control=True, ml_model=None, sample_file=None, enable_clusters=True, injection_points=None,
+                 scheme=None, http2=None, evidence_dir=None, report_file=None, adaptive_payloads=True,
+                 context_probe=True, detectors=None):
+        # Hueco del pipeline -> detector; los módulos de los detectores deshabilitados no se importan
+        self.detectors = resolve_detectors(detectors)
+        self.manual_detector = load_detector(self.detectors['regex'])
+        # Ubicaciones de los slots que se prueban: query, form, json, cookie, header, path
+        self.injection_points = injection_points or injection_points_from_env()
+        # Concurrencia adaptativa por host con Retry-After y circuit breaker (compartida entre targets)
+        self.host_control = HostControl(max_limit=max(concurrency, pool_size)) if rate_control else None
+        # En modo streaming el body se lee por chunks y se corta al detectar una firma SQL
+        self.stream_responses = stream_responses
+        # Esquema de los targets (None = TARGET_SCHEME / detección automática)
+        self.scheme = scheme
+        # Transporte compartido por el motor secuencial y el asíncrono: pools, TLS, HTTP/2, DNS y estadísticas
+        self.transport = Transport(max(concurrency, pool_size), http2=http2)
+        self.request_handler = RequestHandler(
+            pool_size=pool_size,
+            stream=stream_responses,
+            signature_engine=self.manual_detector.engine,
+            host_control=self.host_control,
+            transport=self.transport
+        )
+        self.llm_cache = None
+        self.llm_gateway = None
+        self.openai_detector = None
+        if 'openai' in self.detectors:
+            # Import diferido: sin el detector openai no se carga el SDK de OpenAI
+            from llm_gateway import LLMGateway
+            # Caché persistente de verdicts del LLM compartida por ambos detectores
+            self.llm_cache = LLMCache() if enable_cache else None
+            # Un único gateway hacia OpenAI para ambos detectores: los límites RPM/TPM son por cuenta
+            self.llm_gateway = LLMGateway()
+            self.openai_detector = load_detector(self.detectors['openai'], cache=self.llm_cache,
+                                                 gateway=self.llm_gateway)
+        # Clasificador local (etapa 'ml'): decide los casos claros sin llamar a OpenAI
+        self.ml_detector = load_detector(self.detectors['ml'], ml_model) if 'ml' in self.detectors else None
+        detection_mode = detection_mode or os.getenv("DETECTION_MODE", "tiered")
+        if detection_mode == 'full' and self.openai_detector is None:
+            print("[PIPELINE] El modo full necesita el detector openai: se usa tiered")
+            detection_mode = 'tiered'
+        stages = [stage.strip() for stage in os.getenv("DETECTION_STAGES", DEFAULT_STAGES).split(',') if stage.strip()]
+        self.detection_pipeline = DetectionPipeline(self.manual_detector, self.openai_detector, mode=detection_mode,
+                                                    stages=enabled_stages(stages, self.detectors),
+                                                    ml_detector=self.ml_detector)
+        # Respuestas casi idénticas (entre payloads y entre targets del batch) reutilizan el verdict del cluster
+        self.response_clusters = ResponseClusterIndex() if enable_clusters else None
+        # Extractos etiquetados por el pipeline para entrenar el clasificador (train_classifier.py)
+        self.samples = None
+        if sample_file:
+            from ml_detector import SampleLog
+            self.samples = SampleLog(sample_file)
+            # El mismo extracto que ve el clasificador (aunque el detector local esté deshabilitado)
+            self.sample_extractor = ExcerptExtractor()
         self.enable_recheck = enable_recheck
+        self.concurrency = concurrency
+        # Motor asyncio de larga vida: loop y cliente httpx compartidos por todos los targets (en batch, pool_size a la vez)
+        self.async_engine = AsyncScanEngine(self, max_in_flight=concurrency, max_connections=concurrency * pool_size) \
+            if concurrency > 1 else None
+        self.enable_baseline = enable_baseline
+        # Archivo JSONL opcional con un evento por test (tiempos, tokens, etapa que decidió)
+        self.trace_file = trace_file
+        # Journal de tests completados: permite reanudar con --resume sin repetir HTTP ni LLM
+        self.journal = ScanJournal(journal_file, resume=resume) if journal_file else None
+        # Evidencia acotada (extracto + hash) en lugar de bodies completos; los bodies van opcionalmente a disco
+        self.evidence = EvidenceStore(evidence_dir)
+        # Reporte JSONL en streaming: un registro por hallazgo en cuanto se detecta y uno por target
+        self.report_sink = ReportSink(report_file) if report_file else None
+        # Orden de payloads aprendido del historial: primero los que más aciertan en servidores parecidos
+        self.payload_scheduler = PayloadScheduler() if adaptive_payloads else None
+        # Sondas diferenciales antes del loop de payloads: contexto de cada parámetro y poda de payloads
+        self.context_prober = ContextProber(self.request_handler, self.manual_detector.engine) if context_probe else None
         if enable_recheck:
-            self.recheck_detector = RecheckDetector()
+            from recheck_detector import RecheckDetector
+            # Sin el detector openai solo se confirma con la biblioteca de payloads por motor
+            self.recheck_detector = RecheckDetector(cache=self.llm_cache, gateway=self.llm_gateway,
+                                                    use_llm=self.openai_detector is not None)
+            # Cola propia del recheck: el scan sigue (o pasa al siguiente target) mientras se confirma el hallazgo
+            self.recheck_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RECHECK_WORKERS", "2")),
+                                                       thread_name_prefix='recheck')
+        # En modo batch los targets no esperan a sus rechecks: las confirmaciones llegan al reporte JSONL
+        self.wait_for_rechecks = True
     
-    def analyze_sql_error(self, response_text: str, payload: str, parameter: str, request=None) -> Dict:
-        """Analiza la respuesta usando detección manual y OpenAI"""
+    def analyze_sql_error(self, response_text: str, payload: str, parameter: str, request=None,
+                          manual_result: Dict = None, baseline=None) -> Dict:
+        """Analiza la respuesta con el pipeline de detección (regex primero, OpenAI si es ambiguo)"""
         print(f"[ANALIZANDO] {parameter} | {payload} | {len(response_text)} chars")
         
-        # Análisis manual y OpenAI
-        manual_detection_result = self.manual_detector.detect(response_text)
-        openai_detection_result = self.openai_detector.detect(response_text, parameter, payload)
+        # Pipeline por etapas: la etapa que decide queda registrada en 'decided_by'
+        baseline_lines = baseline.lines if baseline is not None else None
+        combined_result = self.detection_pipeline.run(response_text, parameter, payload, manual_result, baseline_lines)
+        print(f"[ETAPA] Decidido por: {combined_result['decided_by']}")
+        if combined_result['openai_detection'].get('error_type') in ('openai_error', 'json_decode_error'):
+            # Reintentos agotados (API o parseo): no es un verdict negativo, queda sin confirmar por el LLM
+            print(f"[LLM] Sin verdict de OpenAI: {combined_result['openai_detection']['details']}")
+        if self.samples is not None:
+            self.samples.record(self.sample_extractor.extract(response_text, baseline_lines), combined_result,
+                                parameter, payload)
         
-        # Lógica de decisión mejorada
-        manual_found = manual_detection_result['contains_sql_error']
-        openai_found = openai_detection_result['contains_sql_error']
+        return combined_result
+    
+    def analyze_test(self, state: Dict, param_name: str, test_result: Dict, request=None, baseline=None) -> Dict:
+        """Analiza la respuesta de un test, o reutiliza el verdict de su cluster si ya se analizó una casi idéntica"""
+        payload = test_result['payload']
+        if self.response_clusters is None:
+            return self.analyze_sql_error(test_result['response_text'], payload, param_name, request,
+                                          self.stream_manual_result(test_result), baseline)
         
-        # Crear resultado combinado
-        combined_result = {
-            'contains_sql_error': manual_found or openai_found,  # Si al menos una detecta
-            'error_type': 'Combined Detection',
-            'confidence': max(manual_detection_result['confidence'], openai_detection_result['confidence']),
-            'details': f"Manual: {manual_detection_result['details']} | OpenAI: {openai_detection_result['details']}",
-            'manual_detection': manual_detection_result,
-            'openai_detection': openai_detection_result,
-            'both_detected': manual_found and openai_found
-        }
+        timings = {}
+        member = {'url': test_result['url'], 'parameter': param_name, 'payload': payload}
+        with StageTimer(timings, 'cluster'):
+            fingerprint = test_result.get('fingerprint') or fingerprint_result(test_result, payload)
+            cluster, verdict = self.response_clusters.claim(fingerprint, member)
         
-        # Lógica de decisión mejorada
+        if verdict is not None:
+            print(f"[CLUSTER] Respuesta casi idéntica al cluster {cluster.id}, se reutiliza su verdict")
+            analysis = dict(verdict)
+            analysis.update({
+                'decided_by': 'cluster',
+                'timings': timings,
+                'cluster': {'id': cluster.id, 'representative': cluster.representative,
+                            'decided_by': verdict['decided_by']}
+            })
+            self.record_cluster_member(state, cluster, verdict, member)
+            return analysis
         
-        # Si recheck está habilitado y se detectó vulnerabilidad, hacer recheck
-        if self.enable_recheck and combined_result.get('contains_sql_error', False) and combined_result.get('confidence', 0) > 0.7:
-            print(f"[RECHECK] Verificando...")
-            recheck_result = self.recheck_detector.analyze_with_openai(response_text, payload)
-            
-            if recheck_result['success'] and recheck_result['is_sql_injection'] and recheck_result['recheck_payload']:
-                suggested_payload = recheck_result['recheck_payload']
-                database_engine = recheck_result.get('database_engine', 'Unknown')
-                print(f"[RECHECK] {suggested_payload} | {database_engine}")
-                
-                # Paso 2: Hacer un nuevo test con el payload sugerido
-                
-                # Necesitamos el request para hacer el nuevo test
-                if request is not None:
-                    recheck_test_result = self.request_handler.test_parameter(
-                        request,  # Usar el request pasado como parámetro
-                        parameter, 
-                        suggested_payload
-                    )
-                else:
-                    print(f"[ERROR RECHECK] No se puede hacer recheck sin request")
-                    combined_result['openai_recheck'] = recheck_result
-                    combined_result['confirmed_vulnerability'] = False
-                    return combined_result
-                
-                if 'error' not in recheck_test_result:
-                    # Paso 3: Analizar la nueva respuesta
-                    recheck_analysis = self.manual_detector.detect(recheck_test_result['response_text'])
-                    
-                    if recheck_analysis['contains_sql_error']:
-                        print(f"[CONFIRMADO] Payload sugerido también da error SQL")
-                        
-                        # Actualizar análisis con confirmación
-                        combined_result['openai_recheck'] = recheck_result
-                        combined_result['recheck_test'] = {
-                            'suggested_payload': suggested_payload,
-                            'database_engine': database_engine,
-                            'test_result': recheck_test_result,
-                            'analysis': recheck_analysis
-                        }
-                        combined_result['confirmed_vulnerability'] = True
-                        
-                    else:
-                        print(f"[FALSO POSITIVO] Payload sugerido NO da error SQL")
-                        
-                        # Marcar como posible falso positivo
-                        combined_result['openai_recheck'] = recheck_result
-                        combined_result['recheck_test'] = {
-                            'suggested_payload': suggested_payload,
-                            'database_engine': database_engine,
-                            'test_result': recheck_test_result,
-                            'analysis': recheck_analysis
-                        }
-                        combined_result['confirmed_vulnerability'] = False
-                else:
-                    print(f"[ERROR RECHECK] Error al probar payload sugerido: {recheck_test_result['error']}")
-                    combined_result['openai_recheck'] = recheck_result
-                    combined_result['confirmed_vulnerability'] = False
-                    
-            elif recheck_result['success'] and not recheck_result['is_sql_injection']:
+        analysis = None
+        try:
+            analysis = self.analyze_sql_error(test_result['response_text'], payload, param_name, request,
+                                              self.stream_manual_result(test_result), baseline)
+        finally:
+            self.response_clusters.resolve(cluster, analysis)
+        return analysis
+    
+    def record_cluster_member(self, state: Dict, cluster, verdict: Dict, member: Dict):
+        """Anota en el estado del scan un test que reutilizó el verdict de un cluster (para auditar)"""
+        with state['lock']:
+            entry = state['clusters'].setdefault(cluster.id, {
+                'cluster': cluster.id,
+                'representative': cluster.representative,
+                'contains_sql_error': verdict['contains_sql_error'],
+                'confidence': verdict['confidence'],
+                'decided_by': verdict['decided_by'],
+                'members': []
+            })
+            entry['members'].append(member)
+    
+    def add_vulnerability(self, state: Dict, vulnerability: Dict, request=None, test_result: Dict = None,
+                          analysis: Dict = None, baseline=None):
+        """Añade una vulnerabilidad al estado, la escribe en el reporte en streaming y encola su recheck"""
+        recheck = self.enable_recheck and request is not None and test_result is not None
+        if recheck:
+            # Las claves existen desde el principio: el worker solo sustituye sus valores
+            vulnerability['recheck'] = {'status': 'pending'}
+            vulnerability['confirmed_vulnerability'] = None
+        state['vulnerabilities'].append(vulnerability)
+        if state['first_finding_requests'] is None:
+            # Requests enviadas en esta ejecución hasta el primer hallazgo (métrica del orden de payloads)
+            state['first_finding_requests'] = state['total_tests'] - state['resumed_tests']
+        if self.report_sink is not None:
+            self.report_sink.finding(state['target_url'], vulnerability)
+        if recheck:
+            future = self.recheck_executor.submit(self.recheck_finding, state, vulnerability, request,
+                                                  test_result['response_text'], analysis, baseline)
+            with state['lock']:
+                state['rechecks'].append(future)
+    
+    def recheck_finding(self, state: Dict, vulnerability: Dict, request: HttpRequest, response_text: str,
+                        analysis: Dict, baseline=None) -> Dict:
+        """Confirma un hallazgo con un payload específico del motor (worker de la cola de recheck)
+
+        Si ManualDetector identificó el motor se usan los payloads de la biblioteca, sin llamar al LLM.
+        Solo con motor desconocido se pide al LLM un payload sugerido.
+        """
+        parameter, payload = vulnerability['parameter'], vulnerability['payload']
+        start = time.perf_counter()
+        engine = (analysis.get('manual_detection') or {}).get('engine')
+        candidates = self.recheck_detector.library_payloads(engine, payload)
+        recheck = {'status': 'not_confirmed', 'source': 'library', 'database_engine': engine or 'Unknown'}
+        
+        if candidates:
+            print(f"[RECHECK] {parameter} | {engine}: {len(candidates)} payloads de la biblioteca")
+        elif self.recheck_detector.gateway is None:
+            print(f"[RECHECK] {parameter} | Motor desconocido y LLM deshabilitado: sin payloads de confirmación")
+        else:
+            recheck['source'] = 'llm'
+            baseline_lines = baseline.lines if baseline is not None else None
+            llm_result = self.recheck_detector.analyze_with_openai(response_text, payload, baseline_lines)
+            state['metrics'].add_usage('recheck', llm_result)
+            recheck['openai_recheck'] = llm_result
+            if not llm_result['success']:
+                print(f"[ERROR RECHECK] {llm_result.get('error', 'Error desconocido')}")
+                recheck['status'] = 'error'
+            elif not llm_result['is_sql_injection']:
                 print(f"[FALSO POSITIVO] OpenAI detecta posible falso positivo")
-                print(f"   Confianza: {recheck_result['confidence']}")
-                print(f"   Razón: {recheck_result['reasoning']}")
-                
-                # Marcar como posible falso positivo
-                combined_result['openai_recheck'] = recheck_result
-                combined_result['confirmed_vulnerability'] = False
-            else:
-                print(f"[ERROR RECHECK] {recheck_result.get('error', 'Error desconocido')}")
-                combined_result['openai_recheck'] = recheck_result
-                combined_result['confirmed_vulnerability'] = False
+                print(f"   Confianza: {llm_result['confidence']}")
+                print(f"   Razón: {llm_result['reasoning']}")
+                recheck['status'] = 'false_positive'
+            elif llm_result['recheck_payload']:
+                candidates = [llm_result['recheck_payload']]
+                recheck['database_engine'] = llm_result.get('database_engine', 'Unknown')
+                print(f"[RECHECK] {llm_result['recheck_payload']} | {recheck['database_engine']}")
         
-        return combined_result
+        # Nuevo test con cada payload sugerido hasta que uno reproduzca el error SQL
+        tested = 0
+        for suggested_payload in candidates:
+            test_result = self.request_handler.test_parameter(request, parameter, suggested_payload)
+            state['metrics'].count_host(urlparse(test_result['url']).netloc)
+            if 'error' in test_result:
+                print(f"[ERROR RECHECK] Error al probar payload sugerido: {test_result['error']}")
+                continue
+            tested += 1
+            test_analysis = self.manual_detector.detect(test_result['response_text'])
+            recheck['suggested_payload'] = suggested_payload
+            recheck['recheck_test'] = {
+                'suggested_payload': suggested_payload,
+                'database_engine': recheck['database_engine'],
+                'test_result': self.evidence.compact(test_result, test_analysis.get('evidence')),
+                'analysis': test_analysis
+            }
+            if test_analysis['contains_sql_error']:
+                recheck['status'] = 'confirmed'
+                break
+            recheck['status'] = 'not_confirmed'
+        
+        if candidates and not tested:
+            # Ningún payload obtuvo respuesta: el hallazgo queda sin verificar, no es un falso positivo
+            recheck['status'] = 'error'
+        
+        confirmed = recheck['status'] == 'confirmed'
+        if confirmed:
+            print(f"[CONFIRMADO] {parameter} | Payload sugerido también da error SQL ({recheck['source']})")
+        elif recheck['status'] == 'error' and candidates:
+            print(f"[ERROR RECHECK] {parameter} | Ningún payload sugerido obtuvo respuesta ({len(candidates)})")
+        elif candidates:
+            print(f"[FALSO POSITIVO] {parameter} | Payload sugerido NO da error SQL")
+        recheck['confirmed_vulnerability'] = confirmed
+        recheck['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        state['metrics'].add_duration('recheck', recheck['elapsed_ms'])
+        
+        vulnerability['recheck'] = recheck
+        vulnerability['confirmed_vulnerability'] = confirmed
+        if self.report_sink is not None:
+            self.report_sink.write('confirmation', {
+                'target_url': state['target_url'],
+                'parameter': parameter,
+                'payload': payload,
+                'confirmed_vulnerability': confirmed,
+                'recheck': recheck
+            })
+        return recheck
+    
+    def close(self):
+        """Libera los recursos de larga vida: motor asíncrono (loop y cliente httpx) y reporte JSONL"""
+        if self.async_engine is not None:
+            self.async_engine.close()
+        if self.report_sink is not None:
+            self.report_sink.close()
+    
+    def wait_rechecks(self, state: Dict = None):
+        """Espera a los rechecks pendientes de un scan (o a todos si no se indica)"""
+        if not self.enable_recheck:
+            return
+        if state is None:
+            self.recheck_executor.shutdown(wait=True)
+        else:
+            wait(state['rechecks'])
+    
+    def is_finding(self, analysis: Dict) -> bool:
+        """Indica si un análisis supera el umbral de confianza configurado"""
+        confidence_threshold = float(os.getenv("CONFIDENCE_THRESHOLD", "0.7"))
+        return analysis.get('contains_sql_error', False) and analysis.get('confidence', 0) > confidence_threshold
+    
+    def log_test_error(self, test_result: Dict, payload: str):
+        """Muestra el error de un test que no obtuvo respuesta"""
+        error_type = test_result['error']
+        error_details = test_result.get('error_details', 'Error desconocido')
+        
+        if error_type == 'connection_error':
+            print(f"[ERROR] Servidor no responde: {error_details}")
+        elif error_type == 'timeout_error':
+            print(f"[TIMEOUT] {error_details}")
+        else:
+            print(f"[ERROR] General: {error_details}")
+        print(f"   URL: {test_result['url']}")
+        print(f"   Payload: {payload}")
+    
+    def build_vulnerability(self, test_result: Dict, analysis: Dict, payload: str) -> Dict:
+        """Crea el objeto de vulnerabilidad (add_vulnerability encola su recheck y recheck_finding lo completa)"""
+        vuln_data = {
+            'payload': payload,
+            'url': test_result['url'],
+            'confidence': analysis.get('confidence', 0),
+            'details': analysis.get('details', ''),
+            'status_code': test_result['status_code'],
+            'manual_detection': analysis.get('manual_detection', {}),
+            'openai_detection': analysis.get('openai_detection', {}),
+            'ml_detection': analysis.get('ml_detection'),
+            'decided_by': analysis.get('decided_by', ''),
+            'injection_point': test_result.get('injection_point'),
+            'evidence': self.evidence.describe(
+                test_result['response_text'], (analysis.get('manual_detection') or {}).get('evidence')
+            )
+        }
+        
+        return vuln_data
     
     def scan_for_sql_injection(self, request_file: str, payload_file: str) -> Dict:
         """Escanea una request en busca de vulnerabilidades SQL injection"""
@@ -137,144 +356,539 @@ class SQLInjectionScanner:
         with open(request_file, 'r', encoding='utf-8') as f:
             raw_request = f.read()
 
-        request = HttpRequest(raw_request)
-        print(f"[TARGET] URL: {request.url}")
-        print(f"[PARÁMETROS] {list(request.params.keys())}")
+        request = HttpRequest(raw_request, scheme=self.scheme)
 
         # Cargar payloads
         payload_manager = PayloadManager(payload_file)
         print(f"[PAYLOADS] Cargados: {len(payload_manager.payloads)}")
 
-        vulnerabilities = []
+        return self.scan_request(request, payload_manager.payloads)
+    
+    def scan_request(self, request: HttpRequest, payloads: List[str], parameters: List[str] = None,
+                     rechecks: List = None) -> Dict:
+        """Escanea un HttpRequest ya parseado con la lista de payloads dada
+
+        parameters restringe el scan a esos puntos de inyección (unidades del modo coordinador/workers).
+        Si el scan no espera a sus rechecks (modo batch), rechecks recibe sus futures: los hallazgos del
+        reporte se completan cuando terminan.
+        """
+        print(f"[TARGET] URL: {request.url}")
+        print(f"[PARÁMETROS] {request.injection_points(self.injection_points)}")
+
+        # Target ya terminado en una ejecución anterior: el reporte se reconstruye desde el journal
+        if self.journal is not None:
+            report = self.journal.finished_report(ScanJournal.target_key(request))
+            if report is not None:
+                print(f"[RESUME] Target ya completado, se reutiliza el reporte del journal")
+                return report
+
         start_time = time.time()
-        vulnerability_found = False  # Flag para parada temprana
-        connection_errors = 0  # Contador de errores de conexión
-        total_tests = 0  # Contador total de tests
 
-        for param_name in request.params.keys():
+        # Baseline: respuesta sin modificar contra la que se comparan los tests
+        baseline_result, baseline = self.fetch_baseline(request) if self.enable_baseline else (None, None)
+
+        fingerprint = None
+        if self.payload_scheduler is not None:
+            headers = baseline_result.get('server_headers') if baseline_result else None
+            fingerprint = self.payload_scheduler.fingerprint(urlparse(request.url).netloc, headers)
+            payloads = self.payload_scheduler.order(payloads, fingerprint)
+            print(f"[PAYLOADS] Orden adaptativo ({fingerprint}): {payloads[:3]}")
+
+        # Plan del scan: payloads de cada parámetro (podados por contexto si se sondea)
+        plan = {param_name: payloads for param_name in request.injection_points(self.injection_points)
+                if parameters is None or param_name in parameters}
+        parameters_tested = list(plan)
+        # Las sondas cuentan como tests del scan: el estado (y el journal) existe antes de enviarlas
+        state = self.new_scan_state(request)
+        context_probes = None
+        if self.context_prober is not None and baseline is not None and len(payloads) > MAX_PROBES and \
+                not state['vulnerabilities']:
+            plan, context_probes = self.probe_contexts(state, request, plan, baseline)
+
+        if self.concurrency > 1:
+            # Motor asyncio: tests concurrentes con cancelación al encontrar vulnerabilidad
+            print(f"[CONCURRENCIA] Máximo en vuelo: {self.concurrency}")
+            state = self.async_engine.run(request, plan, baseline, state)
+        else:
+            state = self._scan_sequential(request, plan, baseline, state)
+
+        if self.wait_for_rechecks:
+            self.wait_rechecks(state)
+        elif rechecks is not None:
+            rechecks.extend(state['rechecks'])
+        payload_schedule = self.record_payload_schedule(state, request, payloads, fingerprint)
+        
+        metrics = state['metrics']
+        if baseline_result is not None:
+            metrics.count_host(urlparse(baseline_result['url']).netloc)
+            metrics.add_duration('baseline_fetch', baseline_result['elapsed_ms'])
+        metrics.close()
+
+        vulnerabilities = state['vulnerabilities']
+        connection_errors = state['connection_errors']
+        total_tests = state['total_tests']
+
+        execution_time = time.time() - start_time
+
+        # Detectar si el servidor no responde
+        server_unreachable = state['circuit_open']
+        if total_tests > 0:
+            server_unreachable = server_unreachable or connection_errors >= total_tests * 0.8  # Si 80% o más fallan por conexión
+        if server_unreachable and not vulnerabilities:
+            print(f"[INALCANZABLE] El servidor no responde: {request.url}")
+        
+        report = {
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'target_url': request.url,
+            'method': request.method,
+            'parameters_tested': parameters_tested,
+            'vulnerabilities_found': len(vulnerabilities),
+            'vulnerabilities': vulnerabilities,
+            'execution_time': round(execution_time, 2),
+            'baseline': baseline.to_dict() if baseline else None,
+            'detectors': sorted(self.detectors.values()),
+            'detection_stages': state['detection_stages'],
+            'streaming': state['streaming'] if self.stream_responses else None,
+            'llm_cache': self.llm_cache.stats() if self.llm_cache else None,
+            'llm_gateway': self.llm_gateway.stats() if self.llm_gateway else None,
+            'response_clusters': list(state['clusters'].values()),
+            'cluster_index': self.response_clusters.stats() if self.response_clusters else None,
+            'metrics': metrics.summary(),
+            'resumed_tests': state['resumed_tests'],
+            'server_unreachable': server_unreachable,
+            'host_control': self.host_control.snapshot(urlparse(request.url).netloc) if self.host_control else None,
+            'connections': self.transport.stats_snapshot(),
+            'evidence_store': self.evidence.stats() if self.evidence.directory else None,
+            'payload_schedule': payload_schedule,
+            'context_probes': context_probes,
+            'status': 'vulnerable' if vulnerabilities else ('unreachable' if server_unreachable else 'secure')
+        }
+        if self.journal is not None:
+            self.journal.record_report(state['target'], report)
+        return report
+    
+    def probe_contexts(self, state: Dict, request: HttpRequest, plan: Dict[str, List[str]], baseline):
+        """Sondea cada parámetro del plan y deja solo los payloads válidos para su contexto
+
+        Cada sonda se cuenta como un test (contadores, requests por host y trace) y el contexto de
+        cada parámetro se guarda en el journal: al reanudar no se vuelven a enviar sus sondas.
+        """
+        pruned, probes = {}, {}
+        for param_name, payloads in plan.items():
+            probe = state['probes'].get(param_name)
+            if probe is not None:
+                print(f"[RESUME] {param_name}: contexto recuperado del journal")
+            else:
+                probe = self.context_prober.probe(request, param_name, baseline,
+                                                  lambda result, name=param_name: self.record_probe(state, name, result))
+                if self.journal is not None and state['target'] is not None:
+                    self.journal.record_probe(state['target'], param_name, probe)
+            probes[param_name] = probe
+            if probe['context'] == 'none':
+                print(f"[CONTEXTO] {param_name}: sin reacción ({len(probe['probes'])} sondas), se descarta")
+                probe['payloads'] = 0
+                continue
+            pruned[param_name] = payloads_for_context(payloads, probe['context'])
+            probe['payloads'] = len(pruned[param_name])
+            print(f"[CONTEXTO] {param_name}: {probe['context']} ({probe['reason']}) | "
+                  f"{probe['payloads']}/{len(payloads)} payloads")
+        return pruned, probes
+    
+    def record_payload_schedule(self, state: Dict, request: HttpRequest, payloads: List[str],
+                                fingerprint: str = None) -> Dict:
+        """Guarda en el historial los tests y el primer hallazgo del scan y resume el orden usado"""
+        first_finding = state['vulnerabilities'][0] if state['first_finding_requests'] is not None else None
+        hit_payload = first_finding['payload'] if first_finding else None
+        position = payloads.index(hit_payload) + 1 if hit_payload in payloads else None
+        if self.payload_scheduler is not None and state['payload_tries']:
+            engine = (first_finding.get('manual_detection') or {}).get('engine') if first_finding else None
+            self.payload_scheduler.record(fingerprint, state['payload_tries'], hit_payload, position,
+                                          urlparse(request.url).netloc, engine)
+        # Incluye las sondas de contexto: se cuentan en total_tests como el resto de requests
+        requests_to_first_finding = state['first_finding_requests']
+        if requests_to_first_finding is not None:
+            print(f"[PAYLOADS] Primer hallazgo tras {requests_to_first_finding} requests "
+                  f"(payload en posición {position})")
+        return {
+            'adaptive': self.payload_scheduler is not None,
+            'fingerprint': fingerprint,
+            'order': payloads[:10],
+            'requests_to_first_finding': requests_to_first_finding,
+            'first_finding_position': position
+        }
+    
+    def fetch_baseline(self, request: HttpRequest):
+        """Obtiene la respuesta sin modificar y su fingerprint (None si falla)"""
+        baseline_result = self.request_handler.fetch_baseline(request)
+        baseline = fingerprint_result(baseline_result, keep_lines=True)
+        if baseline is None:
+            print(f"[BASELINE] No disponible: {baseline_result.get('error_details', '')}")
+        else:
+            print(f"[BASELINE] Status: {baseline.status_code} | {baseline.length} chars | simhash {baseline.simhash:016x}")
+        return baseline_result, baseline
+    
+    def matches_baseline(self, baseline, test_result: Dict, payload: str) -> bool:
+        """Indica si la respuesta es equivalente al baseline y puede saltarse el análisis"""
+        if baseline is None:
+            return False
+        with StageTimer(test_result.setdefault('timings', {}), 'baseline'):
+            # El fingerprint se guarda en el test para reutilizarlo al buscar su cluster
+            test_result['fingerprint'] = fingerprint_result(test_result, payload)
+            comparison = baseline.compare(test_result['fingerprint'])
+        if comparison['equivalent']:
+            print(f"[BASELINE] Sin cambios, se omite el análisis: {comparison['reason']}")
+        return comparison['equivalent']
+    
+    def stream_manual_result(self, test_result: Dict):
+        """Reutiliza el resultado negativo del matcher de streaming para no repetir el regex
+
+        Solo si ninguna firma puede ser más larga que el solapamiento entre chunks: con firmas no
+        acotadas (p.ej. '.*') una coincidencia partida se pierde y el regex se aplica al texto completo.
+        """
+        if test_result.get('stream_exhaustive') and 'stream_match' in test_result and test_result['stream_match'] is None:
+            return self.manual_detector.build_result([])
+        return None
+    
+    def new_scan_state(self, request: HttpRequest = None) -> Dict:
+        """Estado acumulado de un scan (compartido por el motor secuencial y el asíncrono)
+
+        Si hay journal, el estado parte de los tests ya completados para este target.
+        """
+        state = {
+            'vulnerabilities': [],
+            'connection_errors': 0,
+            'total_tests': 0,
+            'detection_stages': {},
+            'streaming': {'bytes_read': 0, 'size_cap': 0, 'signature': 0},
+            'metrics': ScanMetrics(self.trace_file),
+            'target': None,
+            'target_url': request.url if request is not None else None,
+            'completed': set(),  # Pares (parámetro, payload) ya completados en el journal
+            'probes': {},  # Parámetro -> sondas de contexto recuperadas del journal
+            'resumed_tests': 0,
+            'circuit_open': False,  # El circuit breaker cortó el scan del target
+            'clusters': {},  # Cluster -> tests de este target que reutilizaron su verdict
+            'rechecks': [],  # Rechecks encolados de los hallazgos de este target
+            'payload_tries': {},  # Payload -> tests con respuesta en esta ejecución (historial del orden adaptativo)
+            'first_finding_requests': None,
+            'lock': threading.Lock()
+        }
+        if self.journal is not None and request is not None:
+            state['target'] = ScanJournal.target_key(request)
+            self.restore_state(state)
+        return state
+    
+    def restore_state(self, state: Dict):
+        """Carga en el estado los tests del journal: contadores, etapas y vulnerabilidades"""
+        for (param_name, payload), entry in self.journal.completed_tests(state['target']).items():
+            state['completed'].add((param_name, payload))
+            state['total_tests'] += 1
+            if entry.get('error') == 'connection_error':
+                state['connection_errors'] += 1
+            if entry.get('decided_by'):
+                self.record_stage(state, entry['decided_by'])
+            # Con parada temprana el scan se queda con la primera vulnerabilidad registrada
+            if entry.get('vulnerability') and not state['vulnerabilities']:
+                state['vulnerabilities'].append(entry['vulnerability'])
+        # Las sondas de contexto ya enviadas cuentan como tests recuperados
+        state['probes'] = dict(self.journal.completed_probes(state['target']))
+        probe_requests = sum(len(probe['probes']) for probe in state['probes'].values())
+        state['total_tests'] += probe_requests
+        state['resumed_tests'] = len(state['completed']) + probe_requests
+        if state['resumed_tests']:
+            print(f"[RESUME] {state['resumed_tests']} tests recuperados del journal, "
+                  f"{len(state['vulnerabilities'])} vulnerabilidades")
+    
+    def finish_test(self, state: Dict, param_name: str, test_result: Dict, analysis: Dict = None):
+        """Cierra un test completado: métricas, trace y registro en el journal"""
+        self.record_metrics(state, param_name, test_result, analysis)
+        if self.journal is None or state['target'] is None:
+            return
+        
+        payload = test_result.get('payload', '')
+        vulnerability = None
+        if analysis is not None and self.is_finding(analysis):
+            vulnerability = self.build_vulnerability(test_result, analysis, payload)
+            vulnerability['parameter'] = param_name
+        
+        self.journal.record_test(state['target'], param_name, payload, {
+            'error': test_result.get('error'),
+            'status_code': test_result.get('status_code'),
+            'decided_by': analysis.get('decided_by') if analysis else ('baseline' if 'error' not in test_result else None),
+            'confidence': analysis.get('confidence', 0) if analysis else 0,
+            'vulnerability': vulnerability
+        })
+    
+    def record_test(self, state: Dict, test_result: Dict, probe: bool = False):
+        """Actualiza los contadores del scan con el resultado de un test (o de una sonda de contexto)"""
+        state['total_tests'] += 1
+        if test_result.get('error') == 'connection_error':
+            state['connection_errors'] += 1
+        # Las sondas no son payloads: no entran en el historial del orden adaptativo
+        if 'error' not in test_result and not probe:
+            payload = test_result.get('payload', '')
+            state['payload_tries'][payload] = state['payload_tries'].get(payload, 0) + 1
+        if 'bytes_read' in test_result:
+            state['streaming']['bytes_read'] += test_result['bytes_read']
+            if test_result['stream_stop']:
+                state['streaming'][test_result['stream_stop']] += 1
+    
+    def record_probe(self, state: Dict, param_name: str, test_result: Dict):
+        """Cuenta una sonda de contexto como un test más: contadores, requests por host, métricas y trace"""
+        if test_result.get('error') == 'circuit_open':
+            return  # No se envió
+        self.record_test(state, test_result, probe=True)
+        self.record_metrics(state, param_name, test_result, event='probe')
+    
+    def record_metrics(self, state: Dict, param_name: str, test_result: Dict, analysis: Dict = None,
+                       event: str = 'test'):
+        """Registra tiempos por etapa, tokens del LLM y host de un test, y escribe su evento de trace"""
+        metrics = state['metrics']
+        host = urlparse(test_result['url']).netloc
+        metrics.count_host(host)
+        if 'elapsed_ms' in test_result:
+            metrics.add_duration('http', test_result['elapsed_ms'])
+        
+        timings = dict(test_result.get('timings', {}))
+        tokens = {}
+        if analysis is not None and analysis.get('decided_by') == 'cluster':
+            timings.update(analysis['timings'])  # Verdict reutilizado: sin llamadas al LLM
+        elif analysis is not None:
+            timings.update(analysis.get('timings', {}))
+            llm_result = analysis.get('openai_detection')
+            metrics.add_usage('openai', llm_result)
+            if llm_result and llm_result.get('usage') and not llm_result.get('cached'):
+                tokens['openai'] = llm_result['usage']
+        metrics.add_timings(timings)
+        
+        metrics.trace({
+            'event': event,
+            'timestamp': round(time.time(), 3),
+            'host': host,
+            'url': test_result['url'],
+            'parameter': param_name,
+            'payload': test_result.get('payload', ''),
+            'status_code': test_result.get('status_code'),
+            'error': test_result.get('error'),
+            'response_size': test_result.get('response_size'),
+            'http_ms': test_result.get('elapsed_ms'),
+            'timings': timings,
+            'decided_by': analysis.get('decided_by') if analysis else ('baseline' if 'baseline' in timings else None),
+            'tokens': tokens,
+            'finding': self.is_finding(analysis) if analysis else False
+        })
+    
+    def record_stage(self, state: Dict, stage: str):
+        """Cuenta la etapa que decidió un análisis"""
+        state['detection_stages'][stage] = state['detection_stages'].get(stage, 0) + 1
+    
+    def _scan_sequential(self, request: HttpRequest, plan: Dict[str, List[str]], baseline=None,
+                         state: Dict = None) -> Dict:
+        """Ejecuta los tests del plan (parámetro -> payloads) uno por uno con parada temprana"""
+        if state is None:
+            state = self.new_scan_state(request)
+        vulnerability_found = bool(state['vulnerabilities'])  # Flag para parada temprana (puede venir del journal)
+
+        for param_name, payloads in plan.items():
             if vulnerability_found:
                 print(f"[SALTANDO] Vulnerabilidad ya encontrada, parámetro: {param_name}")
                 break
-                
-            param_vulnerabilities = []
 
-            for i, payload in enumerate(payload_manager.payloads):
+
+            for i, payload in enumerate(payloads):
                 if vulnerability_found:
                     print(f"[SALTANDO] Vulnerabilidad ya encontrada, payload: {payload}")
                     break
+                if (param_name, payload) in state['completed']:
+                    continue  # Ya completado en una ejecución anterior
                     
-                print(f"\n--- Test {i+1}/{len(payload_manager.payloads)} ---")
+                print(f"\n--- Test {i+1}/{len(payloads)} ---")
 
                 # Test con payload
                 test_result = self.request_handler.test_parameter(request, param_name, payload)
-                total_tests += 1
+                if test_result.get('error') == 'circuit_open':
+                    # El host está caído: no tiene sentido esperar el timeout de cada payload restante
+                    print(f"[CIRCUIT] {test_result['error_details']}. Deteniendo el scan del target")
+                    state['circuit_open'] = True
+                    break
+                self.record_test(state, test_result)
                 
                 if 'error' in test_result:
-                    error_type = test_result['error']
-                    error_details = test_result.get('error_details', 'Error desconocido')
-                    
-                    if error_type == 'connection_error':
-                        connection_errors += 1
-                        print(f"[ERROR] Servidor no responde: {error_details}")
-                        print(f"   URL: {test_result['url']}")
-                        print(f"   Payload: {payload}")
-                        # Si el servidor no responde, continuar con el siguiente payload
-                        continue
-                    elif error_type == 'timeout_error':
-                        print(f"[TIMEOUT] {error_details}")
-                        print(f"   URL: {test_result['url']}")
-                        print(f"   Payload: {payload}")
-                        # Si hay timeout, continuar con el siguiente payload
-                        continue
-                    else:
-                        print(f"[ERROR] General: {error_details}")
-                        print(f"   URL: {test_result['url']}")
-                        print(f"   Payload: {payload}")
-                        # Si hay error general, continuar con el siguiente payload
-                        continue
+                    # Si hay error, continuar con el siguiente payload
+                    self.log_test_error(test_result, payload)
+                    self.finish_test(state, param_name, test_result)
+                    continue
+                elif self.matches_baseline(baseline, test_result, payload):
+                    self.record_stage(state, 'baseline')
+                    self.finish_test(state, param_name, test_result)
+                    continue
                 else:
-                    # Analizar respuesta con ambas detecciones
-                    analysis = self.analyze_sql_error(
-                        test_result['response_text'], 
-                        payload, 
-                        param_name,
-                        request  # Pasar el request para el recheck
-                    )
-
-                    confidence_threshold = float(os.getenv("CONFIDENCE_THRESHOLD", "0.7"))
-                    if analysis.get('contains_sql_error', False) and analysis.get('confidence', 0) > confidence_threshold:
+                    # Analizar respuesta con ambas detecciones (o reutilizar el verdict de su cluster)
+                    analysis = self.analyze_test(state, param_name, test_result, request, baseline)
+                    self.record_stage(state, analysis.get('decided_by', 'unknown'))
+                    self.finish_test(state, param_name, test_result, analysis)
+
+                    if self.is_finding(analysis):
                         print(f"[VULNERABILIDAD] ¡DETECTADA! Parando scan...")
                         print(f"   Parámetro: {param_name}")
                         print(f"   Payload: {payload}")
                         print(f"   Confianza: {analysis.get('confidence', 0)}")
 
-                        # Crear objeto de vulnerabilidad con información del recheck
-                        vuln_data = {
-                            'payload': payload,
-                            'url': test_result['url'],
-                            'confidence': analysis.get('confidence', 0),
-                            'details': analysis.get('details', ''),
-                            'status_code': test_result['status_code'],
-                            'manual_detection': analysis.get('manual_detection', {}),
-                            'openai_detection': analysis.get('openai_detection', {})
-                        }
-                        
-                        # Agregar información del recheck si está disponible
-                        if analysis.get('openai_recheck'):
-                            vuln_data['recheck'] = {
-                                'suggested_payload': analysis['openai_recheck'].get('recheck_payload', ''),
-                                'database_engine': analysis['openai_recheck'].get('database_engine', ''),
-                                'confirmed_vulnerability': analysis.get('confirmed_vulnerability', False),
-                                'recheck_test': analysis.get('recheck_test', {})
-                            }
-                        
-                        param_vulnerabilities.append(vuln_data)
+                        vuln = self.build_vulnerability(test_result, analysis, payload)
+                        vuln['parameter'] = param_name
+                        # El recheck se encola: el hallazgo se reporta sin esperar la confirmación
+                        self.add_vulnerability(state, vuln, request, test_result, analysis, baseline)
 
                         vulnerability_found = True  # Activar parada temprana
                         break  # Salir del loop de payloads
 
-            if param_vulnerabilities:
-                # Simplificar: agregar directamente las vulnerabilidades sin anidación extra
-                for vuln in param_vulnerabilities:
-                    vuln['parameter'] = param_name
-                    vulnerabilities.append(vuln)
+            if state['circuit_open'] or vulnerability_found:
                 break  # Salir del loop de parámetros
 
-        execution_time = time.time() - start_time
+        return state
 
-        # Detectar si el servidor no responde
-        server_unreachable = False
-        if total_tests > 0:
-            server_unreachable = connection_errors >= total_tests * 0.8  # Si 80% o más fallan por conexión
-        
-        return {
-            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
-            'target_url': request.url,
-            'method': request.method,
-            'parameters_tested': list(request.params.keys()),
-            'vulnerabilities_found': len(vulnerabilities),
-            'vulnerabilities': vulnerabilities,
-            'execution_time': round(execution_time, 2),
-            'status': 'vulnerable' if vulnerabilities else 'secure'
-        }
+def get_option(name: str, default: str = None) -> str:
+    """Obtiene el valor de una opción de línea de comandos (--opcion valor)"""
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+def request_filter_from_options() -> RequestFilter:
+    """Filtro del origen del batch por host, método y content-type (--filter-* o IMPORT_FILTER_*)"""
+    return RequestFilter.from_options(
+        hosts=get_option('--filter-host', os.getenv("IMPORT_FILTER_HOSTS")),
+        methods=get_option('--filter-method', os.getenv("IMPORT_FILTER_METHODS")),
+        content_types=get_option('--filter-content-type', os.getenv("IMPORT_FILTER_CONTENT_TYPES"))
+    )
+
+def run_batch(batch_source: str, payload_file: str, scanner_options: Dict):
+    """Ejecuta el modo batch sobre un JSONL, un directorio de requests o una exportación HAR/Burp"""
+    workers = int(get_option('--workers', os.getenv("BATCH_WORKERS", "4")))
+    per_host = int(get_option('--per-host', os.getenv("BATCH_PER_HOST", "2")))
+    # El reporte batch es el JSONL en streaming: hallazgos y un registro por target
+    output_file = scanner_options.get('report_file') or 'sql_injection_batch_report.jsonl'
+    request_filter = request_filter_from_options()
+    if request_filter.is_empty():
+        request_filter = None
+
+    print(f"[BATCH] Origen: {batch_source}")
+    if request_filter is not None:
+        print(f"[BATCH] Filtro: hosts {request_filter.hosts or '*'} | métodos {sorted(request_filter.methods) or '*'} "
+              f"| content-type {request_filter.content_types or '*'}")
+    processes = get_option('--processes', os.getenv("BATCH_PROCESSES"))
+    if processes is not None:
+        run_distributed(batch_source, payload_file, scanner_options, int(processes), output_file, request_filter)
+        return
+    print(f"[BATCH] Workers: {workers} | Máximo por host: {per_host}")
+
+    # Un único scanner compartido: sesión HTTP y clientes de detección reutilizados
+    scanner = SQLInjectionScanner(pool_size=workers, **dict(scanner_options, report_file=output_file))
+    payload_manager = PayloadManager(payload_file)
+    print(f"[PAYLOADS] Cargados: {len(payload_manager.payloads)}")
+
+    # Los workers del batch pasan al siguiente target sin esperar las confirmaciones del recheck
+    scanner.wait_for_rechecks = False
+    try:
+        summary = BatchScanner(scanner, workers=workers, per_host=per_host,
+                               request_filter=request_filter).run(batch_source, payload_manager.payloads)
+        scanner.wait_rechecks()
+    finally:
+        scanner.close()
+
+    print(f"\n[BATCH] Targets escaneados: {summary['targets_scanned']}")
+    print(f"   Vulnerables: {summary['vulnerable']} | Seguros: {summary['secure']} | Errores: {summary['errors']}")
+    if 'filtered' in summary:
+        print(f"   Descartadas por el filtro: {summary['filtered']}")
+    print(f"Tiempo de ejecución: {summary['execution_time']} segundos")
+    print(f"Reporte guardado en: {output_file} ({scanner.report_sink.records['finding']} hallazgos)")
+
+def run_distributed(batch_source: str, payload_file: str, scanner_options: Dict, processes: int, output_file: str,
+                    request_filter: RequestFilter = None):
+    """Modo coordinador: unidades (target, parámetro) en una cola SQLite para procesos locales y remotos"""
+    queue_file = get_option('--queue', os.getenv("WORK_QUEUE_FILE", "sql_injection_queue.sqlite3"))
+    payload_manager = PayloadManager(payload_file)
+    print(f"[PAYLOADS] Cargados: {len(payload_manager.payloads)}")
+
+    report_sink = ReportSink(output_file)
+    try:
+        summary = Coordinator(queue_file, scanner_options, report_sink, processes,
+                              request_filter).run(batch_source, payload_manager.payloads)
+    finally:
+        report_sink.close()
+
+    print(f"\n[BATCH] Targets escaneados: {summary['targets_scanned']}")
+    print(f"   Vulnerables: {summary['vulnerable']} | Seguros: {summary['secure']} | Errores: {summary['errors']}")
+    if 'filtered' in summary:
+        print(f"   Descartadas por el filtro: {summary['filtered']}")
+    print(f"   Unidades: {summary['units']}")
+    print(f"Tiempo de ejecución: {summary['execution_time']} segundos")
+    print(f"Reporte guardado en: {output_file} ({report_sink.records['finding']} hallazgos)")
 
 def main():
     """Función principal"""
+    batch_source = get_option('--batch')
+    worker_queue = get_option('--worker')
+
     # Verificar argumentos de línea de comandos
-    if len(sys.argv) < 2:
+    if len(sys.argv) < 2 or (sys.argv[1].startswith('--') and not batch_source and not worker_queue):
         print("[ERROR] Debes especificar el archivo de request")
-        print("Uso: python3 main.py <archivo_request.txt> [--recheck]")
+        print("Uso: python3 main.py <archivo_request.txt> [--recheck] [--concurrency N] [--pipeline tiered|full] [--no-cache] [--no-baseline] [--stream] [--trace trace.jsonl] [--resume] [--journal journal.jsonl] [--no-rate-control] [--ml-model modelo.npz] [--samples muestras.jsonl] [--no-clusters] [--injection-points query,form,json,cookie,header,path] [--scheme auto|http|https] [--no-http2] [--report-jsonl reporte.jsonl] [--evidence-dir evidencias/] [--no-adaptive-payloads] [--no-context-probe] [--detectors regex,local,openai]")
+        print("Uso: python3 main.py --batch <requests.jsonl|directorio|export.har|burp.xml> [--workers N] [--per-host N] [--report-jsonl reporte.jsonl] [--filter-host '*.ejemplo.com'] [--filter-method GET,POST] [--filter-content-type json,form]")
+        print("Uso: python3 main.py --batch <requests.jsonl|directorio> --processes N [--queue cola.sqlite3]")
+        print("Uso: python3 main.py --worker <cola.sqlite3>")
         print("Ejemplo: python3 main.py example_request.txt")
         print("Ejemplo: python3 main.py example_request.txt --recheck")
+        print("Ejemplo: python3 main.py example_request.txt --concurrency 20")
+        print("Ejemplo: python3 main.py example_request.txt --detectors regex")
+        print("Ejemplo: python3 main.py --batch requests.jsonl --workers 8 --per-host 2")
+        print("Ejemplo: python3 main.py --batch requests.jsonl --processes 8")
+        print("Ejemplo: python3 main.py --batch historial.har --filter-host '*.ejemplo.com' --filter-method GET,POST")
         return
     
     # Obtener archivo de request desde argumentos
-    request_file = sys.argv[1]
+    request_file = batch_source or worker_queue or sys.argv[1]
     payload_file = 'payloads.txt'  # Siempre usar payloads.txt por defecto
     
     # Verificar si se habilitó recheck
     enable_recheck = '--recheck' in sys.argv
     
+    # Número máximo de tests en vuelo (1 = modo secuencial)
+    concurrency = int(get_option('--concurrency', os.getenv("MAX_IN_FLIGHT", "1")))
+    
+    # Modo del pipeline de detección: tiered (por etapas) o full (siempre regex + OpenAI)
+    detection_mode = get_option('--pipeline', os.getenv("DETECTION_MODE", "tiered"))
+    
+    scanner_options = {
+        'enable_recheck': enable_recheck,
+        'concurrency': concurrency,
+        'detection_mode': detection_mode,
+        'enable_cache': '--no-cache' not in sys.argv and os.getenv("LLM_CACHE", "1") != "0",
+        'enable_baseline': '--no-baseline' not in sys.argv and os.getenv("BASELINE_GATING", "1") != "0",
+        'stream_responses': '--stream' in sys.argv or os.getenv("STREAM_RESPONSES", "0") == "1",
+        'trace_file': get_option('--trace', os.getenv("SCAN_TRACE")),
+        'journal_file': get_option('--journal', os.getenv("SCAN_JOURNAL", "sql_injection_journal.jsonl")),
+        'resume': '--resume' in sys.argv,
+        'rate_control': '--no-rate-control' not in sys.argv and os.getenv("RATE_CONTROL", "1") != "0",
+        'ml_model': get_option('--ml-model', os.getenv("ML_MODEL_PATH")),
+        'sample_file': get_option('--samples', os.getenv("SCAN_SAMPLES")),
+        'enable_clusters': '--no-clusters' not in sys.argv and os.getenv("RESPONSE_CLUSTERS", "1") != "0",
+        'injection_points': [point.strip() for point in get_option('--injection-points', ','.join(injection_points_from_env())).split(',')],
+        'scheme': get_option('--scheme', os.getenv("TARGET_SCHEME")),
+        'http2': False if '--no-http2' in sys.argv else None,
+        'evidence_dir': get_option('--evidence-dir', os.getenv("EVIDENCE_DIR")),
+        'report_file': get_option('--report-jsonl', os.getenv("SCAN_REPORT_JSONL")),
+        'adaptive_payloads': '--no-adaptive-payloads' not in sys.argv and os.getenv("ADAPTIVE_PAYLOADS", "1") != "0",
+        'context_probe': '--no-context-probe' not in sys.argv and os.getenv("CONTEXT_PROBE", "1") != "0",
+        'detectors': [name.strip() for name in get_option('--detectors', ','.join(detectors_from_env())).split(',')]
+    }
+    try:
+        detector_slots = resolve_detectors(scanner_options['detectors'])
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    
     # Verificar que el archivo de request existe
     if not os.path.exists(request_file):
         print(f"[ERROR] El archivo '{request_file}' no existe")
@@ -285,25 +899,43 @@ def main():
         print(f"[ERROR] El archivo '{payload_file}' no existe")
         return
     
-    # Verificar API key
-    if not os.getenv("OPENAI_API_KEY"):
+    # Verificar API key (no hace falta si ninguna etapa llama a OpenAI, p.ej. --detectors regex o
+    # DETECTION_STAGES=benign,regex,triage,ml)
+    uses_openai = 'openai' in detector_slots and (enable_recheck or detection_mode == 'full' or
+                                                  'openai' in os.getenv("DETECTION_STAGES", DEFAULT_STAGES).split(','))
+    if uses_openai and not os.getenv("OPENAI_API_KEY"):
         print("[ERROR] OPENAI_API_KEY no encontrada en variables de entorno")
         print("Crea un archivo .env con: OPENAI_API_KEY=tu_api_key")
         return
 
+    if worker_queue:
+        # Worker de otra máquina (o proceso extra): los payloads los publica el coordinador en la cola
+        run_worker(worker_queue, scanner_options)
+        return
+
+    if batch_source:
+        run_batch(batch_source, payload_file, scanner_options)
+        return
+
     print(f"[REQUEST] Archivo: {request_file}")
     print(f"[PAYLOADS] Archivo: {payload_file}")
+    print(f"[PIPELINE] Modo: {detection_mode} | Detectores: {', '.join(sorted(detector_slots.values()))}")
     if enable_recheck:
         print(f"[RECHECK] Habilitado")
 
     # Crear scanner
-    scanner = SQLInjectionScanner(enable_recheck=enable_recheck)
+    scanner = SQLInjectionScanner(**scanner_options)
 
     # Ejecutar scan
-    result = scanner.scan_for_sql_injection(
-        request_file=request_file,
-        payload_file=payload_file
-    )
+    try:
+        result = scanner.scan_for_sql_injection(
+            request_file=request_file,
+            payload_file=payload_file
+        )
+        if scanner.report_sink is not None:
+            scanner.report_sink.target(result)
+    finally:
+        scanner.close()
 
     # Guardar resultado
     with open('sql_injection_report.json', 'w', encoding='utf-8') as f:
@@ -317,11 +949,26 @@ def main():
             print(f"    Payload: {vuln['payload']}")
             print(f"    Confianza: {vuln['confidence']}")
             print(f"    URL: {vuln['url']}")
+    elif result['status'] == 'unreachable':
+        print(f"\n[INALCANZABLE] El servidor no respondió, scan incompleto")
+        print(f"   Estado: {result['status']}")
     else:
         print(f"\n[SEGURO] No se detectaron vulnerabilidades SQL injection")
         print(f"   Estado: {result['status']}")
 
     print(f"Tiempo de ejecución: {result['execution_time']} segundos")
+    for stage, timing in result['metrics']['stages'].items():
+        print(f"   [TIEMPOS] {stage}: n={timing['count']} p50={timing['p50_ms']} ms p95={timing['p95_ms']} ms max={timing['max_ms']} ms")
+    for stage, tokens in result['metrics']['llm_tokens'].items():
+        # .get: reportes recuperados de journals anteriores no tienen los contadores de caché ni de reintentos
+        print(f"   [TOKENS] {stage}: {tokens['calls']} llamadas | prompt {tokens['prompt_tokens']} "
+              f"(caché {tokens.get('cached_tokens', 0)}) | respuesta {tokens['completion_tokens']} | "
+              f"reintentos de parseo {tokens.get('parse_retries', 0)}")
+    connections = result.get('connections')  # Ausente en reportes recuperados de journals anteriores
+    if connections:
+        print(f"   [CONEXIONES] {connections['new_connections']} nuevas | reutilización {connections['reuse_ratio']:.0%} | "
+              f"TLS p50 {connections['tls_handshake_ms']['p50']} ms ({connections['tls_sessions_reused']} reanudadas) | "
+              f"{connections['http_versions']}")
     print(f"Reporte guardado en: sql_injection_report.json")
 
 if __name__ == "__main__":
@@ -3,43 +3,61 @@
 Módulo para detección manual de SQL injection usando patrones regex
 """
 
-import re
 from typing import Dict
 
+from signature_engine import SignatureEngine
+
 class ManualDetector:
     """Detección manual de patrones de error SQL"""
-    
-    def __init__(self):
-        # Patrones específicos de errores SQL
-        self.error_patterns = [
-            (r"You have an error in your SQL syntax", "MySQL Syntax Error"),
-            (r"check the manual that corresponds to your MySQL server version", "MySQL Version Error"),
-            (r"MySQL server version for the right syntax to use near", "MySQL Near Syntax Error"),
-            (r"Warning.*mysql_fetch", "MySQL Fetch Warning"),
-            (r"MySQL result index", "MySQL Result Error"),
-            (r"PostgreSQL query failed", "PostgreSQL Query Error"),
-            (r"pg_query\(\) expects", "PostgreSQL Function Error"),
-            (r"ORA-\d{5}", "Oracle Error Code"),
-            (r"Microsoft.*ODBC.*SQL Server", "SQL Server ODBC Error"),
-            (r"SQLite.*error", "SQLite Error"),
-            (r"sqlite3\.OperationalError", "SQLite Operational Error")
+
+    def __init__(self, signature_file: str = None):
+        # Patrones específicos de errores SQL (se usan si no existe el archivo de firmas)
+        self.default_patterns = [
+            ("MySQL", r"You have an error in your SQL syntax", "MySQL Syntax Error"),
+            ("MySQL", r"check the manual that corresponds to your MySQL server version", "MySQL Version Error"),
+            ("MySQL", r"MySQL server version for the right syntax to use near", "MySQL Near Syntax Error"),
+            ("MySQL", r"Warning.*mysql_fetch", "MySQL Fetch Warning"),
+            ("MySQL", r"MySQL result index", "MySQL Result Error"),
+            ("PostgreSQL", r"PostgreSQL query failed", "PostgreSQL Query Error"),
+            ("PostgreSQL", r"pg_query\(\) expects", "PostgreSQL Function Error"),
+            ("Oracle", r"ORA-\d{5}", "Oracle Error Code"),
+            ("SQL Server", r"Microsoft.*ODBC.*SQL Server", "SQL Server ODBC Error"),
+            ("SQLite", r"SQLite.*error", "SQLite Error"),
+            ("SQLite", r"sqlite3\.OperationalError", "SQLite Operational Error")
         ]
-    
+
+        # Motor compilado: prefiltro de literales + regex por firma aplicadas solo a candidatas
+        self.engine = SignatureEngine.from_file(signature_file)
+        if not self.engine.signatures:
+            self.engine = SignatureEngine(
+                [(engine, description, pattern) for engine, pattern, description in self.default_patterns]
+            )
+        self.error_patterns = [(s.pattern, s.description) for s in self.engine.signatures]
+
     def detect(self, content: str) -> Dict:
         """Detección manual de patrones de error SQL"""
-        indicators = []
-        
-        for pattern, description in self.error_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                indicators.append(description)
-        
+        return self.build_result(self.engine.scan(content))
+
+    def build_result(self, matches: list) -> Dict:
+        """Construye el resultado de detección a partir de las coincidencias del motor"""
+        indicators = [match['description'] for match in matches]
+
+        # La evidencia es la coincidencia que aparece primero en la respuesta
+        first_match = min(matches, key=lambda match: match['start']) if matches else None
+
         return {
             "contains_sql_error": len(indicators) > 0,
             "error_type": "Manual Detection",
             "confidence": 0.9 if indicators else 0.0,
-            "details": f"Detectado manualmente: {', '.join(indicators)}" if indicators else "No se detectaron errores SQL manualmente"
+            "details": f"Detectado manualmente: {', '.join(indicators)}" if indicators else "No se detectaron errores SQL manualmente",
+            "engine": first_match['engine'] if first_match else None,
+            "evidence": {
+                'start': first_match['start'],
+                'end': first_match['end'],
+                'text': first_match['evidence']
+            } if first_match else None
         }
-    
+
     def get_patterns(self) -> list:
         """Retorna la lista de patrones para debugging"""
-        return self.error_patterns 
\ No newline at end of file
+        return self.error_patterns
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Clasificador local de errores SQL: n-gramas hasheados con un modelo lineal en NumPy
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Dependencia opcional: sin NumPy la etapa 'ml' se omite
+    np = None
+
+from excerpt_extractor import ExcerptExtractor
+
+DEFAULT_MODEL_FILE = 'sqli_classifier.npz'
+DEFAULT_DIMENSIONS = 2 ** 18
+
+TOKEN_PATTERN = re.compile(r"[a-z_]+|0+|[^\sa-z_0]")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+@lru_cache(maxsize=65536)
+def _token_hashes(token: str, char_min: int, char_max: int) -> Tuple[int, ...]:
+    """Hashes de la palabra y de sus n-gramas de caracteres (con marcas de inicio y fin)"""
+    hashes = [zlib.crc32(b'w:' + token.encode('utf-8'))]
+    padded = f"<{token}>"
+    for n in range(char_min, char_max + 1):
+        for i in range(len(padded) - n + 1):
+            hashes.append(zlib.crc32(b'c:' + padded[i:i + n].encode('utf-8')))
+    return tuple(hashes)
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, números normalizados a 0 y separación en palabras y símbolos"""
+    return TOKEN_PATTERN.findall(DIGITS_PATTERN.sub('0', text.lower()))
+
+def hashed_features(text: str, dimensions: int = DEFAULT_DIMENSIONS, char_ngrams: Tuple[int, int] = (3, 5)):
+    """Vector disperso (índices, valores) con palabras, bigramas de palabras y n-gramas de caracteres
+
+    Los conteos se suavizan con log1p y el vector se normaliza a norma L2 = 1.
+    """
+    counts = {}
+    mask = dimensions - 1
+    tokens = tokenize(text)
+    for token in tokens:
+        for value in _token_hashes(token, char_ngrams[0], char_ngrams[1]):
+            index = value & mask
+            counts[index] = counts.get(index, 0) + 1
+    for first, second in zip(tokens, tokens[1:]):
+        index = zlib.crc32(f"b:{first} {second}".encode('utf-8')) & mask
+        counts[index] = counts.get(index, 0) + 1
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = float(np.linalg.norm(values))
+    if norm > 0:
+        values /= norm
+    return indices, values
+
+class LinearModel:
+    """Regresión logística sobre features hasheadas, entrenada con SGD"""
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS, char_ngrams: Tuple[int, int] = (3, 5)):
+        if dimensions & (dimensions - 1):
+            raise ValueError("dimensions debe ser potencia de 2")
+        self.dimensions = dimensions
+        self.char_ngrams = tuple(char_ngrams)
+        self.weights = np.zeros(dimensions, dtype=np.float32)
+        self.bias = 0.0
+
+    def features(self, text: str):
+        return hashed_features(text, self.dimensions, self.char_ngrams)
+
+    def predict_proba(self, text: str) -> float:
+        """Probabilidad de que el texto contenga un error SQL"""
+        indices, values = self.features(text)
+        score = float(self.weights[indices] @ values) + self.bias
+        return float(1.0 / (1.0 + np.exp(-np.clip(score, -30, 30))))
+
+    def fit(self, texts: List[str], labels: List[int], epochs: int = 20, learning_rate: float = 1.0,
+            l2: float = 1e-6, seed: int = 0):
+        """Entrena con SGD; las clases se ponderan para compensar el desbalance"""
+        samples = [self.features(text) for text in texts]
+        targets = np.asarray(labels, dtype=np.float32)
+        positives = float(targets.sum())
+        negatives = len(targets) - positives
+        class_weight = {
+            1.0: len(targets) / (2 * positives) if positives else 1.0,
+            0.0: len(targets) / (2 * negatives) if negatives else 1.0
+        }
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            rate = learning_rate / np.sqrt(1 + epoch)
+            for i in rng.permutation(len(samples)):
+                indices, values = samples[i]
+                score = float(self.weights[indices] @ values) + self.bias
+                probability = 1.0 / (1.0 + np.exp(-np.clip(score, -30, 30)))
+                gradient = (probability - targets[i]) * class_weight[float(targets[i])]
+                # Regularización L2 perezosa: solo sobre los pesos que aparecen en la muestra
+                self.weights[indices] -= rate * (gradient * values + l2 * self.weights[indices])
+                self.bias -= rate * gradient
+        return self
+
+    def save(self, path: str):
+        config = json.dumps({'dimensions': self.dimensions, 'char_ngrams': list(self.char_ngrams)})
+        # np.savez añade .npz si falta: se escribe con un handle para respetar la ruta exacta
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, weights=self.weights, bias=np.float32(self.bias), config=np.array(config))
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearModel':
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data['config']))
+            model = cls(config['dimensions'], tuple(config['char_ngrams']))
+            model.weights = data['weights'].astype(np.float32)
+            model.bias = float(data['bias'])
+        return model
+
+class MLDetector:
+    """Segunda opinión local entre la triage y OpenAI, con el mismo formato de resultado
+
+    Solo decide cuando la probabilidad es concluyente (>= ML_POSITIVE_THRESHOLD o <= ML_NEGATIVE_THRESHOLD);
+    los casos con margen bajo siguen a OpenAI. Se activa si existe el modelo (ML_MODEL_PATH).
+    """
+
+    def __init__(self, model_path: str = None):
+        self.model_path = model_path or os.getenv("ML_MODEL_PATH", DEFAULT_MODEL_FILE)
+        self.positive_threshold = float(os.getenv("ML_POSITIVE_THRESHOLD", "0.9"))
+        self.negative_threshold = float(os.getenv("ML_NEGATIVE_THRESHOLD", "0.1"))
+        # El clasificador ve el mismo extracto que el LLM
+        self.extractor = ExcerptExtractor()
+        self.model = None
+        if os.path.exists(self.model_path):
+            if np is None:
+                print(f"[ML] NumPy no está instalado: se ignora el modelo {self.model_path}")
+            else:
+                self.model = LinearModel.load(self.model_path)
+                print(f"[ML] Modelo cargado: {self.model_path}")
+
+    def is_available(self) -> bool:
+        return self.model is not None
+
+    def prepare(self, content: str, baseline_lines: Optional[Set[str]] = None) -> str:
+        """Texto que se clasifica (y que se guarda como muestra de entrenamiento)"""
+        return self.extractor.extract(content, baseline_lines)
+
+    def detect(self, content: str, baseline_lines: Optional[Set[str]] = None) -> Dict:
+        """Clasifica la respuesta; 'decisive' indica si el margen permite decidir sin OpenAI"""
+        probability = self.model.predict_proba(self.prepare(content, baseline_lines))
+        decisive = probability >= self.positive_threshold or probability <= self.negative_threshold
+        return {
+            "contains_sql_error": probability >= 0.5,
+            "error_type": "ML Classifier",
+            "confidence": round(probability, 4),
+            "details": f"Clasificador local: p={probability:.3f}" + ("" if decisive else " (margen bajo)"),
+            "decisive": decisive
+        }
+
+class SampleLog:
+    """Guarda extractos etiquetados por el scan (JSONL) para entrenar el clasificador"""
+
+    # Etapas cuyo verdict no sirve como etiqueta
+    UNLABELLED_STAGES = ('ml', 'cluster', 'none')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def record(self, text: str, analysis: Dict, parameter: str, payload: str):
+        """Añade una muestra con la etiqueta del pipeline (se omiten fallos de la API y verdicts del propio modelo)"""
+        if analysis['decided_by'] in self.UNLABELLED_STAGES or \
+                analysis['openai_detection'].get('error_type') in ('openai_error', 'json_decode_error'):
+            return
+        line = json.dumps({
+            'text': text,
+            'label': int(analysis['contains_sql_error']),
+            'decided_by': analysis['decided_by'],
+            'parameter': parameter,
+            'payload': payload
+        }, ensure_ascii=False)
+        with self.lock:
+            self.handle.write(line + '\n')
+
+    def close(self):
+        with self.lock:
+            self.handle.close()
@@ -3,94 +3,122 @@
 Módulo para detección de SQL injection usando OpenAI
 """
 
-import json
 import os
-import openai
-from typing import Dict
+from typing import Dict, List
 from dotenv import load_dotenv
 
+from excerpt_extractor import ExcerptExtractor
+from llm_gateway import LLMGateway
+
 # Cargar variables de entorno
 load_dotenv()
 
 class OpenAIDetector:
     """Detección usando OpenAI"""
     
-    def __init__(self):
-        self.client = openai.OpenAI()
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # Cambiar al modificar el prompt para invalidar la caché de verdicts
+    PROMPT_VERSION = "3"
     
-    def detect(self, content: str, parameter: str = "unknown", payload: str = "unknown") -> Dict:
-        """Detección usando OpenAI"""
-        prompt = f"""
-        Analiza esta respuesta HTTP para detectar errores de SQL injection.
-
-        Parámetro probado: {parameter}
-        Payload usado: {payload}
-        Contenido de respuesta: {content[:4000]}
+    # Prefijo estático: idéntico en todas las llamadas, lo variable va en el mensaje del usuario
+    SYSTEM_PROMPT = """Analizas respuestas HTTP para detectar errores de SQL injection.
 
-        Busca específicamente:
-        1. "You have an error in your SQL syntax"
-        2. "MySQL server version"
-        3. "syntax to use near"
-        4. Errores de PostgreSQL, Oracle, SQL Server, SQLite
-        5. Mensajes que mencionen SQL, database, query
+El usuario envía el parámetro probado, el payload usado y un extracto de la respuesta (texto visible alrededor de indicios de error).
 
-        IMPORTANTE: Responde ÚNICAMENTE en formato JSON válido, sin texto adicional.
-        Ejemplo de respuesta válida:
-        {{
-            "contains_sql_error": true,
-            "error_type": "MySQL syntax error",
-            "confidence": 0.9,
-            "details": "Error de sintaxis SQL detectado"
-        }}
-
-        Responde SOLO el JSON:
-        """
+Busca específicamente:
+1. "You have an error in your SQL syntax"
+2. "MySQL server version"
+3. "syntax to use near"
+4. Errores de PostgreSQL, Oracle, SQL Server, SQLite
+5. Mensajes que mencionen SQL, database, query
 
+Responde con un objeto JSON:
+- contains_sql_error: true si el extracto muestra un error SQL provocado por el payload
+- error_type: tipo de error (p. ej. "MySQL syntax error") o null
+- confidence: de 0.0 a 1.0
+- details: explicación breve"""
+    
+    # Esquema de la salida estructurada (strict: todos los campos requeridos, sin campos extra)
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "contains_sql_error": {"type": "boolean"},
+            "error_type": {"type": ["string", "null"]},
+            "confidence": {"type": "number"},
+            "details": {"type": "string"}
+        },
+        "required": ["contains_sql_error", "error_type", "confidence", "details"],
+        "additionalProperties": False
+    }
+    
+    def __init__(self, cache=None, gateway=None):
+        # Gateway compartido (límites RPM/TPM, reintentos y deduplicación); uno propio si no se indica
+        self.gateway = gateway or LLMGateway()
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.cache = cache
+        self.extractor = ExcerptExtractor()
+    
+    def detect(self, content: str, parameter: str = "unknown", payload: str = "unknown", baseline_lines=None) -> Dict:
+        """Detección usando OpenAI (con caché persistente si está configurada)"""
+        # Solo se envían las ventanas alrededor de indicios SQL/DB y de los cambios respecto al baseline
+        excerpt = self.extractor.extract(content, baseline_lines)
+        
+        if self.cache is None:
+            return self._detect(excerpt, parameter, payload)
+        
+        cache_key = self.cache.make_key('detect', excerpt, self.model, self.PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached['cached'] = True
+            return cached
+        
+        result = self._detect(excerpt, parameter, payload)
+        # No guardar fallos de la API ni de parseo
+        if result.get('error_type') not in ('openai_error', 'json_decode_error'):
+            self.cache.set(cache_key, 'detect', result)
+        return result
+    
+    def _detect(self, excerpt: str, parameter: str, payload: str) -> Dict:
+        """Llamada a OpenAI sin caché"""
         try:
-            # Hacer llamada a OpenAI
-            response = self.client.chat.completions.create(
+            response = self.gateway.complete_json(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=self.build_messages(excerpt, parameter, payload),
+                schema_name='sql_error_detection',
+                schema=self.RESPONSE_SCHEMA,
                 temperature=0.1
             )
-
-            # Obtener respuesta raw
-            raw_response = response.choices[0].message.content
-
-            # Limpiar markdown code blocks
-            if raw_response.startswith("```json"):
-                raw_response = raw_response.replace("```json", "").replace("```", "").strip()
-            elif raw_response.startswith("```"):
-                raw_response = raw_response.replace("```", "").strip()
-
-            # Parsear JSON
-            result = json.loads(raw_response)
-            
-            # Verificar que tenga la estructura esperada
-            if 'confidence' not in result:
-                result['confidence'] = 0.0
-            if 'error_type' not in result:
-                result['error_type'] = None
-            if 'details' not in result:
-                result['details'] = "Respuesta incompleta de OpenAI"
-                
-            return result
-
-        except json.JSONDecodeError as e:
+        except Exception as e:
             return {
                 "contains_sql_error": False,
-                "error_type": "json_decode_error",
+                "error_type": "openai_error",
                 "confidence": 0.0,
-                "details": f"Error parseando JSON de OpenAI: {str(e)}"
+                "details": f"Error en OpenAI: {str(e)}"
             }
-        except Exception as e:
+
+        if response['data'] is None:
+            # Sin verdict tras el reintento: no cuenta como negativo (ver DetectionPipeline y la caché)
             return {
                 "contains_sql_error": False,
-                "error_type": "openai_error",
+                "error_type": "json_decode_error",
                 "confidence": 0.0,
-                "details": f"Error en OpenAI: {str(e)}"
+                "details": f"Error parseando JSON de OpenAI: {response['error']}",
+                "usage": response['usage'],
+                "parse_retries": response['parse_retries']
             }
+
+        result = response['data']
+        result['details'] = result.get('details') or "Respuesta incompleta de OpenAI"
+        result['usage'] = response['usage']
+        result['parse_retries'] = response['parse_retries']
+        return result
+    
+    def build_messages(self, excerpt: str, parameter: str, payload: str) -> List[Dict]:
+        """Prefijo fijo (system) y sufijo variable (user): el proveedor puede cachear el prefijo entre llamadas"""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": f"Parámetro probado: {parameter}\nPayload usado: {payload}\n"
+                                        f"Extracto de la respuesta:\n{excerpt}"}
+        ]
     
     def is_available(self) -> bool:
         """Verifica si OpenAI está disponible"""
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Orden adaptativo de payloads aprendido del historial de scans (estadísticas persistentes en SQLite)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Fingerprint bajo el que se acumulan las estadísticas de todos los targets
+GLOBAL_FINGERPRINT = '*'
+
+def product_name(value: Optional[str]) -> str:
+    """Producto sin versión: 'Apache/2.4.41 (Ubuntu)' -> 'apache'"""
+    if not value:
+        return 'none'
+    return value.split()[0].split('/')[0].lower()
+
+class PayloadScheduler:
+    """Ordena los payloads por rendimiento esperado según el fingerprint del servidor
+
+    Por payload y fingerprint (producto de Server y X-Powered-By y motor detectado antes en el host)
+    se guardan tests, hallazgos y la posición media del primer hallazgo. La tasa de acierto se suaviza
+    hacia la global del payload (PAYLOAD_PRIOR_WEIGHT tests ficticios), así que un fingerprint nuevo
+    hereda el orden global y los payloads sin historial no quedan relegados detrás de los que fallan.
+    """
+
+    def __init__(self, path: str = None, prior_weight: float = None):
+        self.path = path or os.getenv("PAYLOAD_STATS_FILE") or \
+            os.path.join(os.getenv("LLM_CACHE_DIR", ".sqli_cache"), 'payload_stats.sqlite3')
+        self.prior_weight = prior_weight if prior_weight is not None else float(os.getenv("PAYLOAD_PRIOR_WEIGHT", "5"))
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS payload_stats ("
+            "fingerprint TEXT, payload TEXT, tries INTEGER, hits INTEGER, position_sum REAL, "
+            "PRIMARY KEY (fingerprint, payload))"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS host_engines (host TEXT PRIMARY KEY, engine TEXT, updated REAL)")
+        self.conn.commit()
+
+    def fingerprint(self, host: str, headers: Optional[Dict[str, str]]) -> str:
+        """Fingerprint del target a partir de los headers del baseline y del motor visto antes en el host"""
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        with self._lock:
+            row = self.conn.execute("SELECT engine FROM host_engines WHERE host = ?", (host,)).fetchone()
+        engine = row[0] if row else 'unknown'
+        return (f"server={product_name(headers.get('server'))};powered={product_name(headers.get('x-powered-by'))};"
+                f"engine={engine}")
+
+    def _stats(self, fingerprint: str) -> Dict[str, tuple]:
+        rows = self.conn.execute(
+            "SELECT payload, tries, hits, position_sum FROM payload_stats WHERE fingerprint = ?", (fingerprint,)
+        ).fetchall()
+        return {payload: (tries, hits, position_sum) for payload, tries, hits, position_sum in rows}
+
+    def order(self, payloads: List[str], fingerprint: str) -> List[str]:
+        """Payloads ordenados por tasa de acierto esperada (desempate: posición media y orden del archivo)"""
+        with self._lock:
+            specific = self._stats(fingerprint)
+            overall = self._stats(GLOBAL_FINGERPRINT)
+        if not specific and not overall:
+            return list(payloads)
+
+        total_tries = sum(stats[0] for stats in overall.values())
+        total_hits = sum(stats[1] for stats in overall.values())
+        base_rate = (total_hits + 1) / (total_tries + len(payloads))
+        weight = self.prior_weight
+
+        def expected_yield(indexed):
+            index, payload = indexed
+            tries, hits, position_sum = overall.get(payload, (0, 0, 0.0))
+            global_rate = (hits + weight * base_rate) / (tries + weight)
+            tries, hits, position_sum = specific.get(payload, (0, 0, 0.0))
+            rate = (hits + weight * global_rate) / (tries + weight)
+            mean_position = position_sum / hits if hits else float(index)
+            return (-rate, mean_position, index)
+
+        return [payload for _, payload in sorted(enumerate(payloads), key=expected_yield)]
+
+    def record(self, fingerprint: str, tries: Dict[str, int], hit_payload: str = None, position: int = None,
+               host: str = None, engine: str = None):
+        """Acumula los tests de un scan y su primer hallazgo (global y para el fingerprint)"""
+        rows = []
+        for payload, count in tries.items():
+            hit = int(payload == hit_payload)
+            position_sum = float(position) if hit and position is not None else 0.0
+            for key in (fingerprint, GLOBAL_FINGERPRINT):
+                rows.append((key, payload, count, hit, position_sum))
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO payload_stats (fingerprint, payload, tries, hits, position_sum) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (fingerprint, payload) DO UPDATE SET tries = tries + excluded.tries, "
+                "hits = hits + excluded.hits, position_sum = position_sum + excluded.position_sum",
+                rows
+            )
+            if host and engine:
+                # Los próximos scans del host usan el fingerprint con el motor ya conocido
+                self.conn.execute("INSERT OR REPLACE INTO host_engines (host, engine, updated) VALUES (?, ?, ?)",
+                                  (host, engine, time.time()))
+            self.conn.commit()
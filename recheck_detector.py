@@ -3,108 +3,179 @@
 Módulo para recheck de vulnerabilidades SQL injection usando OpenAI
 """
 
-import json
 import os
-import openai
-from typing import Dict
+from typing import Dict, List
 from dotenv import load_dotenv
 
+from excerpt_extractor import ExcerptExtractor
+
 # Cargar variables de entorno
 load_dotenv()
 
+DEFAULT_CONFIRMATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'confirmation_payloads.txt')
+
+def load_confirmation_payloads(filename: str) -> Dict[str, List[str]]:
+    """Carga los payloads de confirmación por motor ([Motor] seguido de un payload por línea)"""
+    library = {}
+    engine = None
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('[') and line.endswith(']'):
+                    engine = line[1:-1].strip()
+                    continue
+                if engine is not None:
+                    library.setdefault(engine.lower(), []).append(line)
+    except FileNotFoundError:
+        return {}
+    return library
+
+def quote_context(payload: str) -> str:
+    """Comilla con la que el payload original rompió la consulta (vacía si el contexto es numérico)"""
+    for quote in ("'", '"'):
+        if quote in payload:
+            return quote
+    return ''
+
 class RecheckDetector:
     """Detección de recheck usando OpenAI para confirmar vulnerabilidades"""
     
-    def __init__(self):
-        self.client = openai.OpenAI()
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # Cambiar al modificar el prompt para invalidar la caché de verdicts
+    PROMPT_VERSION = "3"
     
-    def generate_recheck_prompt(self, error_response: str, original_payload: str) -> str:
-        """Genera prompt para OpenAI para analizar si es Error-Based SQL Injection real y sugerir payload específico"""
-        return f"""
-        Según esta respuesta de error SQL, ¿qué payload de SQLi error-based puedo usar para obtener información no sensible (como nombre de base de datos o versión) que me permita confirmar que hay una inyección? El payload debe ser específico para el motor de base de datos que se deduce de la respuesta.
-
-        ERROR COMPLETO:
-        {error_response}
+    # Prefijo estático: idéntico en todas las llamadas, el error y el payload van en el mensaje del usuario
+    SYSTEM_PROMPT = """Según la respuesta de error SQL que envía el usuario, ¿qué payload de SQLi error-based puedo usar para obtener información no sensible (como nombre de base de datos o versión) que me permita confirmar que hay una inyección? El payload debe ser específico para el motor de base de datos que se deduce de la respuesta.
 
-        PAYLOAD ORIGINAL: {original_payload}
+El usuario envía un extracto del texto visible alrededor del error y el payload original.
 
-        ANÁLISIS REQUERIDO:
-        1. Determina si es Error-Based SQL Injection real
-        2. Identifica el motor de base de datos (MySQL, PostgreSQL, Oracle, SQL Server, etc.)
-        3. Sugiere un payload específico para ese motor que obtenga información útil
-        4. El payload debe ser diferente al original y aprovechar las características del motor detectado
+ANÁLISIS REQUERIDO:
+1. Determina si es Error-Based SQL Injection real
+2. Identifica el motor de base de datos (MySQL, PostgreSQL, Oracle, SQL Server, etc.)
+3. Sugiere un payload específico para ese motor que obtenga información útil
+4. El payload debe ser diferente al original y aprovechar las características del motor detectado
 
-        EJEMPLOS DE PAYLOADS ESPECÍFICOS POR MOTOR:
-        - MySQL: "SELECT database()", "SELECT version()", "SELECT user()"
-        - PostgreSQL: "SELECT current_database()", "SELECT version()"
-        - Oracle: "SELECT banner FROM v$version", "SELECT user FROM dual"
-        - SQL Server: "SELECT @@version", "SELECT DB_NAME()"
+EJEMPLOS DE PAYLOADS ESPECÍFICOS POR MOTOR:
+- MySQL: "SELECT database()", "SELECT version()", "SELECT user()"
+- PostgreSQL: "SELECT current_database()", "SELECT version()"
+- Oracle: "SELECT banner FROM v$version", "SELECT user FROM dual"
+- SQL Server: "SELECT @@version", "SELECT DB_NAME()"
 
-        CRITERIOS PARA CONFIRMAR SQL INJECTION:
-        - DEBE contener errores de sintaxis SQL específicos
-        - DEBE mostrar información del motor de base de datos
-        - NO debe ser un error HTTP genérico (500, 404, etc.)
-        - NO debe ser un error de conexión o timeout
+CRITERIOS PARA CONFIRMAR SQL INJECTION:
+- DEBE contener errores de sintaxis SQL específicos
+- DEBE mostrar información del motor de base de datos
+- NO debe ser un error HTTP genérico (500, 404, etc.)
+- NO debe ser un error de conexión o timeout
 
-        Responde ÚNICAMENTE en formato JSON:
-        {{
-            "is_sql_injection": true/false,
-            "confidence": 0.0-1.0,
-            "recheck_payload": "payload_específico_para_el_motor",
-            "database_engine": "MySQL/PostgreSQL/Oracle/SQLServer/etc",
-            "reasoning": "explicación del motor detectado y por qué ese payload es apropiado"
-        }}
-        """
+Responde con un objeto JSON:
+- is_sql_injection: true/false
+- confidence: de 0.0 a 1.0
+- recheck_payload: payload específico para el motor
+- database_engine: MySQL/PostgreSQL/Oracle/SQLServer/etc
+- reasoning: explicación del motor detectado y por qué ese payload es apropiado"""
+    
+    # Esquema de la salida estructurada (strict: todos los campos requeridos, sin campos extra)
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "is_sql_injection": {"type": "boolean"},
+            "confidence": {"type": "number"},
+            "recheck_payload": {"type": "string"},
+            "database_engine": {"type": "string"},
+            "reasoning": {"type": "string"}
+        },
+        "required": ["is_sql_injection", "confidence", "recheck_payload", "database_engine", "reasoning"],
+        "additionalProperties": False
+    }
+    
+    def __init__(self, cache=None, gateway=None, use_llm=True):
+        # Gateway compartido (límites RPM/TPM, reintentos y deduplicación); uno propio si no se indica.
+        # Sin LLM (use_llm=False) solo se usa la biblioteca y no se importa el SDK de OpenAI
+        self.gateway = None
+        if use_llm:
+            from llm_gateway import LLMGateway
+            self.gateway = gateway or LLMGateway()
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.cache = cache
+        self.extractor = ExcerptExtractor()
+        # Payloads de confirmación por motor: si ManualDetector identificó el motor no se llama al LLM
+        self.library = load_confirmation_payloads(os.getenv("CONFIRMATION_PAYLOAD_FILE", DEFAULT_CONFIRMATION_FILE))
+    
+    def library_payloads(self, engine: str, original_payload: str) -> List[str]:
+        """Payloads de la biblioteca para el motor detectado, adaptados a la comilla del payload original"""
+        quote = quote_context(original_payload)
+        return [payload.replace('{quote}', quote) for payload in self.library.get((engine or '').lower(), [])]
+    
+    def build_messages(self, error_response: str, original_payload: str) -> List[Dict]:
+        """Prefijo fijo (system) y sufijo variable (user): el proveedor puede cachear el prefijo entre llamadas"""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": f"ERROR (extracto del texto visible alrededor del error):\n{error_response}\n\n"
+                                        f"PAYLOAD ORIGINAL: {original_payload}"}
+        ]
     
-    def analyze_with_openai(self, error_response: str, original_payload: str) -> Dict:
-        """Analiza el error con OpenAI para determinar si es SQL injection real"""
+    def analyze_with_openai(self, error_response: str, original_payload: str, baseline_lines=None) -> Dict:
+        """Analiza el error con OpenAI para determinar si es SQL injection real (con caché si está configurada)"""
+        # Extracto acotado por presupuesto de tokens en lugar de la respuesta completa
+        excerpt = self.extractor.extract(error_response, baseline_lines)
         
-        prompt = self.generate_recheck_prompt(error_response, original_payload)
+        if self.cache is None:
+            return self._analyze_with_openai(excerpt, original_payload)
         
+        # El payload sugerido depende del contexto de comillas del original: "'" y '"' no comparten entrada
+        cache_key = self.cache.make_key('recheck', excerpt, self.model, self.PROMPT_VERSION,
+                                        context=f"quote={quote_context(original_payload) or 'numeric'}")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached['cached'] = True
+            return cached
+        
+        result = self._analyze_with_openai(excerpt, original_payload)
+        if result['success']:
+            self.cache.set(cache_key, 'recheck', result)
+        return result
+    
+    def _analyze_with_openai(self, error_response: str, original_payload: str) -> Dict:
+        """Llamada a OpenAI sin caché"""
         try:
-            # Llamar a OpenAI
-            response = self.client.chat.completions.create(
+            response = self.gateway.complete_json(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=self.build_messages(error_response, original_payload),
+                schema_name='sql_injection_recheck',
+                schema=self.RESPONSE_SCHEMA,
                 temperature=0.1
             )
-            
-            # Obtener respuesta raw
-            raw_response = response.choices[0].message.content
-            
-            # Limpiar markdown code blocks
-            if raw_response.startswith("```json"):
-                raw_response = raw_response.replace("```json", "").replace("```", "").strip()
-            elif raw_response.startswith("```"):
-                raw_response = raw_response.replace("```", "").strip()
-            
-            # Parsear JSON
-            result = json.loads(raw_response)
-            
-            return {
-                'success': True,
-                'is_sql_injection': result.get('is_sql_injection', False),
-                'confidence': result.get('confidence', 0.0),
-                'recheck_payload': result.get('recheck_payload', ''),
-                'database_engine': result.get('database_engine', 'Unknown'),
-                'reasoning': result.get('reasoning', ''),
-                'raw_response': raw_response
-            }
-            
-        except json.JSONDecodeError as e:
+        except Exception as e:
             return {
                 'success': False,
-                'error': f'Error parseando JSON de OpenAI: {str(e)}',
-                'raw_response': raw_response if 'raw_response' in locals() else 'No response'
+                'error': f'Error en OpenAI recheck: {str(e)}',
+                'raw_response': 'No response'
             }
-        except Exception as e:
+        
+        if response['data'] is None:
             return {
                 'success': False,
-                'error': f'Error en OpenAI recheck: {str(e)}',
-                'raw_response': raw_response if 'raw_response' in locals() else 'No response'
+                'error': f"Error parseando JSON de OpenAI: {response['error']}",
+                'raw_response': response['raw_response'],
+                'usage': response['usage'],
+                'parse_retries': response['parse_retries']
             }
+        
+        result = response['data']
+        return {
+            'success': True,
+            'is_sql_injection': result.get('is_sql_injection', False),
+            'confidence': result.get('confidence', 0.0),
+            'recheck_payload': result.get('recheck_payload', ''),
+            'database_engine': result.get('database_engine', 'Unknown'),
+            'reasoning': result.get('reasoning', ''),
+            'raw_response': response['raw_response'],
+            'usage': response['usage'],
+            'parse_retries': response['parse_retries']
+        }
     
     def is_available(self) -> bool:
         """Verifica si OpenAI está disponible"""
-        return bool(os.getenv("OPENAI_API_KEY")) 
\ No newline at end of file
+        return self.gateway is not None and bool(os.getenv("OPENAI_API_KEY")) 
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Reporte en streaming (JSONL) y evidencia acotada: extracto + hash, con los bodies completos opcionalmente en disco
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+class EvidenceStore:
+    """Sustituye los bodies de las respuestas por un extracto acotado y su hash
+
+    - REPORT_EXCERPT_CHARS: tamaño del extracto (centrado en la firma SQL si se conoce su posición)
+    - directory (EVIDENCE_DIR): si se indica, cada body completo se guarda una vez en
+      <directorio>/<sha256[:2]>/<sha256>.gz, así que el reporte no crece con el tamaño de las páginas
+    """
+
+    def __init__(self, directory: str = None, excerpt_chars: int = None):
+        self.directory = directory
+        self.excerpt_chars = excerpt_chars or int(os.getenv("REPORT_EXCERPT_CHARS", "2000"))
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.stored_bytes = 0
+
+    def describe(self, text: str, evidence: Optional[Dict] = None) -> Dict:
+        """Extracto, hash y (si hay side store) ruta del body completo"""
+        data = text.encode('utf-8', errors='replace')
+        digest = hashlib.sha256(data).hexdigest()
+        position = evidence.get('start', 0) if evidence else 0
+        start = max(min(position - self.excerpt_chars // 2, len(text) - self.excerpt_chars), 0)
+        return {
+            'sha256': digest,
+            'length': len(text),
+            'excerpt_start': start,
+            'excerpt': text[start:start + self.excerpt_chars],
+            'body_file': self._store(digest, data) if self.directory else None
+        }
+
+    def compact(self, test_result: Dict, evidence: Optional[Dict] = None) -> Dict:
+        """Copia del resultado de un test con 'evidence' en lugar de 'response_text'"""
+        compacted = {key: value for key, value in test_result.items() if key not in ('response_text', 'fingerprint')}
+        if 'response_text' in test_result:
+            compacted['evidence'] = self.describe(test_result['response_text'], evidence)
+        return compacted
+
+    def _store(self, digest: str, data: bytes) -> str:
+        """Guarda el body comprimido si aún no existe (los bodies repetidos se guardan una vez)"""
+        path = os.path.join(self.directory, digest[:2], f"{digest}.gz")
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: otro thread o una interrupción nunca dejan un archivo a medias
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self.lock:
+            self.stored += 1
+            self.stored_bytes += len(data)
+        return path
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {'directory': self.directory, 'bodies_stored': self.stored, 'bytes_stored': self.stored_bytes}
+
+class ReportSink:
+    """Escribe un registro JSONL por hallazgo y por target en cuanto se producen
+
+    Cada línea lleva 'type' ('finding' o 'target') y se escribe con buffer de línea: la memoria no
+    crece con el número de targets y un proceso interrumpido conserva todo lo ya reportado.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = open(path, 'w', encoding='utf-8', buffering=1)
+        self.records = {'finding': 0, 'target': 0}
+
+    def write(self, record_type: str, record: Dict):
+        line = json.dumps({'type': record_type, 'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"), **record},
+                          ensure_ascii=False)
+        with self.lock:
+            self.handle.write(line + '\n')
+            self.records[record_type] = self.records.get(record_type, 0) + 1
+
+    def finding(self, target_url: str, vulnerability: Dict):
+        self.write('finding', {'target_url': target_url, **vulnerability})
+
+    def target(self, report: Dict):
+        self.write('target', report)
+
+    def close(self):
+        with self.lock:
+            self.handle.close()
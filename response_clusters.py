@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Clusters de respuestas casi idénticas: el primer miembro se analiza y su verdict se reutiliza
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from response_fingerprint import ResponseFingerprint, hamming_distance
+
+class ResponseCluster:
+    """Grupo de respuestas con el mismo status y simhash cercano al del representante"""
+
+    def __init__(self, cluster_id: int, fingerprint: ResponseFingerprint, representative: Dict):
+        self.id = cluster_id
+        self.status_code = fingerprint.status_code
+        self.simhash = fingerprint.simhash
+        self.token_hash = fingerprint.token_hash
+        # Solo se guardan las líneas con indicios SQL/DB: un miembro debe tener exactamente las mismas
+        self.sql_lines = fingerprint.sql_lines
+        self.representative = representative
+        self.verdict = None
+        self.analyzing = True
+        self.ready = threading.Event()
+        self.reused = 0
+
+class ResponseClusterIndex:
+    """Índice de clusters compartido por todos los scans del proceso (también en modo batch)
+
+    Una respuesta pertenece a un cluster si tiene el mismo status y sus tokens (con el eco del
+    payload enmascarado) son idénticos, o si su simhash está a CLUSTER_SIMHASH_DISTANCE bits o
+    menos y sus líneas con indicios SQL/DB son las mismas (una página limpia casi idéntica a una de
+    error no hereda su verdict). El simhash se divide en bandas (LSH): dos simhash a distancia d
+    comparten al menos una banda si hay d + 1 bandas, así que solo se comparan los candidatos.
+    Con más de CLUSTER_MAX_ENTRIES clusters se descartan los más antiguos.
+    """
+
+    def __init__(self, max_distance: int = None, max_entries: int = None):
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv("CLUSTER_SIMHASH_DISTANCE", "3"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("CLUSTER_MAX_ENTRIES", "10000"))
+        self.band_count = self.max_distance + 1
+        self.band_bits = 64 // self.band_count
+        self.wait_timeout = float(os.getenv("CLUSTER_WAIT_TIMEOUT", "120"))
+        self.lock = threading.Lock()
+        self.clusters = OrderedDict()  # id -> cluster, del más antiguo al más reciente
+        self.exact = {}  # (status, hash de tokens) -> cluster
+        self.bands = {}  # (banda, valor) -> clusters
+        self.created = 0
+        self.evicted = 0
+        self.reused = 0
+
+    def _band_keys(self, simhash: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [(band, simhash >> (band * self.band_bits) & mask) for band in range(self.band_count)]
+
+    def _find(self, fingerprint: ResponseFingerprint) -> Optional[ResponseCluster]:
+        """Busca el cluster de una respuesta (llamar con el lock tomado)"""
+        cluster = self.exact.get((fingerprint.status_code, fingerprint.token_hash))
+        if cluster is not None:
+            return cluster
+        for key in self._band_keys(fingerprint.simhash):
+            for candidate in self.bands.get(key, ()):
+                if candidate.status_code == fingerprint.status_code and candidate.sql_lines == fingerprint.sql_lines \
+                        and hamming_distance(candidate.simhash, fingerprint.simhash) <= self.max_distance:
+                    return candidate
+        return None
+
+    def _add(self, fingerprint: ResponseFingerprint, representative: Dict) -> ResponseCluster:
+        self.created += 1
+        cluster = ResponseCluster(self.created, fingerprint, representative)
+        self.clusters[cluster.id] = cluster
+        self.exact[(cluster.status_code, cluster.token_hash)] = cluster
+        for key in self._band_keys(cluster.simhash):
+            self.bands.setdefault(key, []).append(cluster)
+        while self.max_entries and len(self.clusters) > self.max_entries:
+            self._evict(self.clusters.popitem(last=False)[1])
+        return cluster
+
+    def _evict(self, cluster: ResponseCluster):
+        """Quita un cluster de los índices; los miembros que esperan su verdict siguen con su referencia"""
+        self.evicted += 1
+        if self.exact.get((cluster.status_code, cluster.token_hash)) is cluster:
+            del self.exact[(cluster.status_code, cluster.token_hash)]
+        for key in self._band_keys(cluster.simhash):
+            members = self.bands[key]
+            members.remove(cluster)
+            if not members:
+                del self.bands[key]
+
+    def claim(self, fingerprint: ResponseFingerprint, member: Dict) -> Tuple[ResponseCluster, Optional[Dict]]:
+        """Devuelve el cluster de la respuesta y su verdict (None si este miembro debe analizarla)
+
+        Si el representante aún se está analizando se espera a su verdict en lugar de repetir el análisis.
+        """
+        while True:
+            with self.lock:
+                cluster = self._find(fingerprint)
+                if cluster is None:
+                    return self._add(fingerprint, member), None
+                if cluster.verdict is not None:
+                    cluster.reused += 1
+                    self.reused += 1
+                    return cluster, cluster.verdict
+                if not cluster.analyzing:
+                    # El representante no dejó un verdict reutilizable (fallo de la API): este miembro lo reemplaza
+                    cluster.analyzing = True
+                    cluster.representative = member
+                    cluster.ready.clear()
+                    return cluster, None
+                ready = cluster.ready
+            if not ready.wait(self.wait_timeout):
+                return cluster, None  # Representante atascado: se analiza sin esperar más
+
+    def resolve(self, cluster: ResponseCluster, analysis: Optional[Dict]):
+        """Guarda el verdict del representante y despierta a los miembros en espera"""
+        with self.lock:
+            reusable = analysis is not None and \
+                analysis['openai_detection'].get('error_type') not in ('openai_error', 'json_decode_error')
+            if reusable and cluster.verdict is None:
+                cluster.verdict = analysis
+            cluster.analyzing = False
+            cluster.ready.set()
+
+    def stats(self) -> Dict:
+        """Contadores globales para el reporte"""
+        with self.lock:
+            return {'clusters': self.created, 'evicted': self.evicted, 'reused_verdicts': self.reused}
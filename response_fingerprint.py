@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Fingerprint estructural de respuestas HTTP y comparación contra el baseline
+"""
+
+import hashlib
+import html
+import os
+import re
+from collections import Counter
+from typing import Dict, Optional
+
+from excerpt_extractor import LOWERCASE_KEYWORDS, SCRIPT_STYLE_PATTERN, TAG_PATTERN, visible_lines
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+PAYLOAD_MASK = " __payload__ "
+# Primera palabra de cada palabra clave ("ora-" -> "ora", "quoted string" -> "quoted"): si ningún token
+# la contiene, ninguna línea visible tiene indicios SQL/DB y no hace falta separar las líneas
+TOKEN_KEYWORDS = re.compile('|'.join(re.match(r"\w+", keyword).group()
+                                     for keyword in LOWERCASE_KEYWORDS.pattern.split('|')))
+
+def mask_payload(text: str, payload: str) -> str:
+    """Reemplaza el eco del payload (literal y HTML-escapado) por un marcador fijo"""
+    if not payload:
+        return text
+    for variant in {payload, html.escape(payload), html.escape(payload, quote=False)}:
+        if variant:
+            text = text.replace(variant, PAYLOAD_MASK)
+    return text
+
+def tokenize(text: str) -> list:
+    """Quita scripts, estilos y tags y devuelve los tokens en minúsculas"""
+    text = SCRIPT_STYLE_PATTERN.sub(" ", text)
+    text = TAG_PATTERN.sub(" ", text)
+    return TOKEN_PATTERN.findall(html.unescape(text).lower())
+
+def sql_lines(text: str) -> frozenset:
+    """Líneas visibles (en minúsculas) con indicios SQL/DB
+
+    Se buscan las palabras clave en las líneas y no en tokens sueltos: "ora-", "quoted string" o
+    "fatal error" no caben en un solo token.
+    """
+    return frozenset(line for line in visible_lines(text.lower()) if LOWERCASE_KEYWORDS.search(line))
+
+def simhash(tokens: Counter) -> int:
+    """Simhash de 64 bits ponderado por la frecuencia de cada token"""
+    weights = [0] * 64
+    for token, count in tokens.items():
+        value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    result = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            result |= 1 << bit
+    return result
+
+def hamming_distance(a: int, b: int) -> int:
+    """Número de bits distintos entre dos simhash"""
+    return bin(a ^ b).count('1')
+
+class ResponseFingerprint:
+    """Fingerprint barato de una respuesta: longitud, status, hash de tokens y simhash"""
+
+    def __init__(self, response_text: str, status_code: int, payload: str = None, keep_lines: bool = False):
+        text = mask_payload(response_text, payload)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+
+        self.status_code = status_code
+        self.length = len(response_text)
+        self.token_hash = hashlib.sha256(' '.join(tokens).encode('utf-8')).hexdigest()
+        self.simhash = simhash(counts)
+        self.token_set = frozenset(counts)
+        # Líneas con indicios SQL/DB (eco del payload enmascarado): una línea nueva impide la equivalencia
+        self.sql_lines = sql_lines(text) if any(TOKEN_KEYWORDS.search(token) for token in counts) else frozenset()
+        # Líneas visibles del baseline, para detectar zonas anómalas en los extractos del LLM
+        self.lines = frozenset(visible_lines(response_text)) if keep_lines else None
+
+    def compare(self, other: 'ResponseFingerprint') -> Dict:
+        """Compara otra respuesta contra este fingerprint (baseline)
+
+        Es equivalente si el status coincide y los tokens son idénticos, o si el simhash
+        está a distancia <= BASELINE_SIMHASH_DISTANCE y no hay líneas nuevas con indicios SQL/DB.
+        """
+        max_distance = int(os.getenv("BASELINE_SIMHASH_DISTANCE", "3"))
+        distance = hamming_distance(self.simhash, other.simhash)
+        comparison = {
+            'equivalent': False,
+            'reason': '',
+            'status_changed': self.status_code != other.status_code,
+            'length_delta': other.length - self.length,
+            'simhash_distance': distance
+        }
+
+        if comparison['status_changed']:
+            comparison['reason'] = f"Status distinto ({self.status_code} → {other.status_code})"
+        elif self.token_hash == other.token_hash:
+            comparison['equivalent'] = True
+            comparison['reason'] = "Contenido idéntico al baseline"
+        elif distance <= max_distance:
+            if other.sql_lines - self.sql_lines:
+                comparison['reason'] = "Líneas nuevas con indicios SQL/DB"
+            else:
+                comparison['equivalent'] = True
+                comparison['reason'] = f"Casi idéntico al baseline (simhash a {distance} bits)"
+        else:
+            comparison['reason'] = f"Contenido distinto (simhash a {distance} bits)"
+
+        return comparison
+
+    def to_dict(self) -> Dict:
+        """Resumen serializable para el reporte"""
+        return {
+            'status_code': self.status_code,
+            'length': self.length,
+            'token_hash': self.token_hash[:16],
+            'simhash': f"{self.simhash:016x}"
+        }
+
+def fingerprint_result(test_result: Dict, payload: str = None, keep_lines: bool = False) -> Optional[ResponseFingerprint]:
+    """Crea el fingerprint de un resultado de test, o None si el test falló"""
+    if 'error' in test_result:
+        return None
+    return ResponseFingerprint(test_result['response_text'], test_result['status_code'], payload, keep_lines)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Journal append-only de tests completados para reanudar scans interrumpidos
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_JOURNAL_FILE = 'sql_injection_journal.jsonl'
+
+def is_interrupted(path: str) -> bool:
+    """Indica si un journal tiene tests o sondas de algún target sin su reporte final"""
+    started, finished = set(), set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                return True  # Última línea cortada por una interrupción
+            (finished if entry.get('type') == 'report' else started).add(entry.get('target'))
+    return bool(started - finished)
+
+class ScanJournal:
+    """Registra cada test (target, parámetro, payload) con su verdict, el contexto sondeado de cada
+    parámetro y el reporte final de cada target
+
+    Cada evento es una línea JSON escrita con buffer de línea, así que un proceso interrumpido
+    deja como mucho una última línea incompleta (que se ignora al reanudar).
+    """
+
+    def __init__(self, path: str = None, resume: bool = False):
+        self.path = path or DEFAULT_JOURNAL_FILE
+        self.lock = threading.Lock()
+        self.tests = {}  # Target -> {(parámetro, payload): registro}
+        self.probes = {}  # Target -> {parámetro: resultado de las sondas de contexto}
+        self.reports = {}  # Target -> reporte final
+        if resume:
+            self._load()
+        else:
+            # Sin --resume se empieza un journal nuevo, pero el de un scan interrumpido no se pisa
+            self._rotate_interrupted()
+        self.handle = open(self.path, 'a' if resume else 'w', encoding='utf-8', buffering=1)
+
+    @staticmethod
+    def target_key(request) -> str:
+        """Identificador estable de un target: hash de la request raw"""
+        return hashlib.sha256(request.raw_request.strip().encode('utf-8')).hexdigest()[:16]
+
+    def _load(self):
+        """Lee el journal existente y reconstruye los tests y reportes ya completados"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Línea cortada por una interrupción
+                if entry.get('type') == 'test':
+                    self.tests.setdefault(entry['target'], {})[(entry['parameter'], entry['payload'])] = entry
+                elif entry.get('type') == 'probe':
+                    self.probes.setdefault(entry['target'], {})[entry['parameter']] = entry['probe']
+                elif entry.get('type') == 'report':
+                    self.reports[entry['target']] = entry['report']
+        completed = sum(len(tests) for tests in self.tests.values())
+        print(f"[RESUME] Journal {self.path}: {completed} tests y {len(self.reports)} targets completados")
+
+    def _rotate_interrupted(self):
+        """Renombra el journal existente si tiene targets sin reporte final (scan interrumpido)"""
+        if not os.path.exists(self.path) or not is_interrupted(self.path):
+            return
+        root, ext = os.path.splitext(self.path)
+        rotated = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        os.replace(self.path, rotated)
+        print(f"[JOURNAL] {self.path} es de un scan interrumpido: se conserva como {rotated} "
+              f"(reanudar con --resume --journal {rotated})")
+
+    def completed_tests(self, target: str) -> Dict[Tuple[str, str], Dict]:
+        """Tests ya registrados para un target"""
+        return self.tests.get(target, {})
+
+    def completed_probes(self, target: str) -> Dict[str, Dict]:
+        """Sondas de contexto ya registradas para un target (parámetro -> resultado)"""
+        return self.probes.get(target, {})
+
+    def finished_report(self, target: str) -> Optional[Dict]:
+        """Reporte final de un target ya completado (None si no terminó)"""
+        return self.reports.get(target)
+
+    def record_test(self, target: str, parameter: str, payload: str, verdict: Dict):
+        """Añade un test completado al journal"""
+        entry = {'type': 'test', 'target': target, 'parameter': parameter, 'payload': payload}
+        entry.update(verdict)
+        self._write(entry)
+
+    def record_probe(self, target: str, parameter: str, probe: Dict):
+        """Añade al journal el contexto sondeado de un parámetro (al reanudar no se repiten sus sondas)"""
+        self._write({'type': 'probe', 'target': target, 'parameter': parameter, 'probe': probe})
+
+    def record_report(self, target: str, report: Dict):
+        """Añade el reporte final de un target al journal"""
+        self._write({'type': 'report', 'target': target, 'report': report})
+
+    def _write(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            self.handle.write(line + '\n')
+
+    def close(self):
+        """Cierra el archivo del journal"""
+        with self.lock:
+            self.handle.close()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Métricas de un scan: tiempos por etapa, tokens del LLM, requests por host y trace de eventos
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista de valores"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+def token_usage(response) -> Optional[Dict]:
+    """Extrae los tokens de prompt (y los servidos desde la caché de prefijos) y de respuesta de OpenAI"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    # prompt_tokens_details puede llegar como objeto o como dict según la versión del SDK
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = details.get('cached_tokens') if isinstance(details, dict) else getattr(details, 'cached_tokens', 0)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_tokens': cached or 0
+    }
+
+def add_token_usage(total: Optional[Dict], usage: Optional[Dict]) -> Optional[Dict]:
+    """Suma dos usos de tokens (p. ej. la llamada original y su reintento)"""
+    if usage is None:
+        return total
+    if total is None:
+        return dict(usage)
+    return {key: total.get(key, 0) + usage.get(key, 0) for key in set(total) | set(usage)}
+
+class ScanMetrics:
+    """Acumula métricas de un scan de forma thread-safe (motor secuencial, asyncio y batch)
+
+    Si se indica trace_file, cada test se escribe como un evento JSON por línea (modo append).
+    """
+
+    def __init__(self, trace_file: str = None):
+        self.lock = threading.Lock()
+        self.durations = {}  # Etapa -> lista de duraciones en ms
+        self.tokens = {}  # Etapa del LLM -> llamadas, tokens de prompt y de respuesta
+        self.hosts = {}  # Host -> número de requests
+        self.trace_file = trace_file
+        self.trace_handle = None
+
+    def add_duration(self, stage: str, milliseconds: float):
+        """Registra la duración de una etapa"""
+        with self.lock:
+            self.durations.setdefault(stage, []).append(milliseconds)
+
+    def add_timings(self, timings: Dict[str, float]):
+        """Registra varias etapas medidas por el pipeline ({etapa: ms})"""
+        for stage, milliseconds in timings.items():
+            self.add_duration(stage, milliseconds)
+
+    def add_usage(self, stage: str, result: Optional[Dict]):
+        """Suma los tokens de una respuesta del LLM (las respuestas desde caché no consumen tokens)"""
+        if not result or result.get('error_type') == 'skipped':
+            return
+        usage = result.get('usage')
+        with self.lock:
+            counters = self.tokens.setdefault(stage, {'calls': 0, 'cached': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                      'cached_tokens': 0, 'parse_retries': 0})
+            if result.get('cached'):
+                counters['cached'] += 1
+                return
+            if usage is None:
+                return
+            counters['calls'] += 1
+            counters['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            counters['completion_tokens'] += usage.get('completion_tokens', 0)
+            counters['cached_tokens'] += usage.get('cached_tokens', 0)
+            counters['parse_retries'] += result.get('parse_retries', 0)
+
+    def count_host(self, host: str):
+        """Cuenta una request enviada a un host"""
+        with self.lock:
+            self.hosts[host] = self.hosts.get(host, 0) + 1
+
+    def trace(self, event: Dict):
+        """Escribe un evento en el archivo de trace (si está configurado)"""
+        if not self.trace_file:
+            return
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            if self.trace_handle is None:
+                # Con buffer de línea cada evento se escribe entero (en batch varios scans comparten el archivo)
+                self.trace_handle = open(self.trace_file, 'a', encoding='utf-8', buffering=1)
+            self.trace_handle.write(line + '\n')
+
+    def close(self):
+        """Cierra el archivo de trace"""
+        with self.lock:
+            if self.trace_handle is not None:
+                self.trace_handle.close()
+                self.trace_handle = None
+
+    def summary(self) -> Dict:
+        """Resumen para el reporte: p50/p95/max por etapa, tokens y requests por host"""
+        with self.lock:
+            stages = {
+                stage: {
+                    'count': len(values),
+                    'total_ms': round(sum(values), 2),
+                    'p50_ms': round(percentile(values, 50), 2),
+                    'p95_ms': round(percentile(values, 95), 2),
+                    'max_ms': round(max(values), 2)
+                }
+                for stage, values in self.durations.items()
+            }
+            return {
+                'stages': stages,
+                'llm_tokens': {stage: dict(counters) for stage, counters in self.tokens.items()},
+                'requests_per_host': dict(self.hosts)
+            }
+
+class StageTimer:
+    """Context manager que mide una etapa con reloj monótono y la guarda en un dict de tiempos"""
+
+    def __init__(self, timings: Dict[str, float], stage: str):
+        self.timings = timings
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.timings[self.stage] = round((time.perf_counter() - self.start) * 1000, 3)
+        return False
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Motor compilado de firmas de errores SQL con prefiltro de literales
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+DEFAULT_SIGNATURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql_signatures.txt')
+
+# Longitud mínima del literal para usarlo como prefiltro
+MIN_LITERAL_LENGTH = 3
+
+# Escapes que representan un carácter literal
+LITERAL_ESCAPES = set(".()[]{}\\/-_ :*+?|^$\"'=<>#&%@!,;~`")
+
+class Signature:
+    """Firma de error SQL: motor, descripción, regex compilada y literales obligatorios"""
+
+    __slots__ = ('engine', 'description', 'pattern', 'regex', 'clauses', 'max_width')
+
+    def __init__(self, engine: str, description: str, pattern: str):
+        self.engine = engine
+        self.description = description
+        self.pattern = pattern
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.clauses = required_clauses(pattern)
+        self.max_width = max_match_width(pattern)
+
+def max_match_width(pattern: str) -> Optional[int]:
+    """Longitud máxima de una coincidencia de la regex, o None si no está acotada (.*, +, {n,})
+
+    Los lookaheads no cuentan en el ancho pero miran más allá de la coincidencia: se tratan como no acotados.
+    """
+    if '(?=' in pattern or '(?!' in pattern:
+        return None
+    width = sre_parse.parse(pattern).getwidth()[1]
+    return width if width < sre_parse.MAXREPEAT else None
+
+def _group_end(pattern: str, start: int) -> int:
+    """Devuelve el índice del ')' que cierra el grupo abierto en start"""
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            i = _class_end(pattern, i)
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(pattern) - 1
+
+def _class_end(pattern: str, start: int) -> int:
+    """Devuelve el índice siguiente al ']' que cierra la clase abierta en start"""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == '^':
+        i += 1
+    if i < len(pattern) and pattern[i] == ']':
+        i += 1
+    while i < len(pattern) and pattern[i] != ']':
+        i += 2 if pattern[i] == '\\' else 1
+    return i + 1
+
+def _plain_literal(fragment: str) -> Optional[str]:
+    """Convierte un fragmento de regex en texto literal, o None si tiene metacaracteres"""
+    chars = []
+    i = 0
+    while i < len(fragment):
+        char = fragment[i]
+        if char == '\\' and i + 1 < len(fragment):
+            if fragment[i + 1] not in LITERAL_ESCAPES:
+                return None
+            chars.append(fragment[i + 1])
+            i += 2
+            continue
+        if char in '.^$*+?{}[]()|':
+            return None
+        chars.append(char)
+        i += 1
+    return ''.join(chars)
+
+def required_clauses(pattern: str) -> List[frozenset]:
+    """Extrae los literales que toda coincidencia de la regex debe contener
+
+    Devuelve una lista de cláusulas (AND); cada cláusula es un conjunto de literales
+    alternativos (OR). Solo se analiza el nivel superior: cada tramo literal de 3+
+    caracteres es una cláusula, y un grupo obligatorio formado solo por alternativas
+    literales aporta una cláusula con todas ellas. Los comodines, clases y escapes como
+    \\d cortan los tramos, y un cuantificador opcional descarta el carácter anterior.
+    Una alternativa '|' de nivel superior deja la firma sin prefiltro.
+    """
+    clauses = []
+    current = []
+
+    def close_run():
+        run = ''.join(current).lower()
+        if len(run) >= MIN_LITERAL_LENGTH:
+            clauses.append(frozenset([run]))
+        current.clear()
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            if escaped in LITERAL_ESCAPES:
+                current.append(escaped)
+            else:
+                close_run()
+            i += 2
+            continue
+
+        if char == '[':
+            close_run()
+            i = _class_end(pattern, i)
+            continue
+
+        if char == '(':
+            close_run()
+            end = _group_end(pattern, i)
+            following = pattern[end + 1:end + 2]
+            optional = following in ('?', '*') or pattern[end + 1:end + 3] == '{0'
+            body = pattern[i + 1:end]
+            if body.startswith('?:'):
+                body = body[2:]
+            elif body.startswith('?'):
+                optional = True  # Lookarounds y flags: no aportan literales
+            if not optional:
+                alternatives = [_plain_literal(part) for part in body.split('|')]
+                if all(alt is not None and len(alt) >= MIN_LITERAL_LENGTH for alt in alternatives):
+                    clauses.append(frozenset(alt.lower() for alt in alternatives))
+            i = end + 1
+            continue
+
+        if char == '|':
+            return []
+        if char in '*?{':
+            # El carácter anterior es opcional
+            if current:
+                current.pop()
+            close_run()
+            if char == '{':
+                while i < len(pattern) and pattern[i] != '}':
+                    i += 1
+        elif char in '+.^$)':
+            close_run()
+        else:
+            current.append(char)
+        i += 1
+
+    close_run()
+    return clauses
+
+def build_trie_pattern(literals: List[str]) -> str:
+    """Construye una alternativa con prefijos factorizados (trie) para todos los literales"""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        is_end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if is_end else group
+
+    return build(trie)
+
+def load_signatures(filename: str) -> List[Tuple[str, str, str]]:
+    """Carga las firmas (motor, descripción, regex) desde un archivo externo"""
+    signatures = []
+    engine = 'Unknown'
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('[') and line.endswith(']'):
+                    engine = line[1:-1].strip()
+                    continue
+                if ' :: ' in line:
+                    description, pattern = line.split(' :: ', 1)
+                    signatures.append((engine, description.strip(), pattern.strip()))
+    except FileNotFoundError:
+        return []
+    return signatures
+
+class SignatureEngine:
+    """Evalúa cientos de firmas con un único prefiltro de literales y regex perezosas"""
+
+    def __init__(self, signatures: List[Tuple[str, str, str]]):
+        self.signatures = []
+        for engine, description, pattern in signatures:
+            try:
+                self.signatures.append(Signature(engine, description, pattern))
+            except re.error as e:
+                print(f"[FIRMAS] Regex inválida '{pattern}': {str(e)}")
+
+        # Firmas sin literal obligatorio: se evalúan siempre
+        self.unfiltered = [s for s in self.signatures if not s.clauses]
+        self.filtered = [s for s in self.signatures if s.clauses]
+        # Coincidencia más larga posible entre todas las firmas (None si alguna no está acotada)
+        widths = [s.max_width for s in self.signatures]
+        self.max_width = None if None in widths else max(widths, default=0)
+
+        self.literals = set()
+        for signature in self.filtered:
+            for clause in signature.clauses:
+                self.literals.update(clause)
+
+        # El prefiltro con lookahead reporta en cada posición el literal más largo que empieza
+        # ahí; los literales que son prefijo de otro se recuperan con este cierre
+        self.prefix_closure = {
+            literal: [other for other in self.literals if literal.startswith(other)]
+            for literal in self.literals
+        }
+        self.prefilter = None
+        if self.literals:
+            self.prefilter = re.compile('(?=(' + build_trie_pattern(sorted(self.literals)) + '))')
+
+    @classmethod
+    def from_file(cls, filename: str = None) -> 'SignatureEngine':
+        """Crea el motor a partir del archivo de firmas (SIGNATURE_FILE o sql_signatures.txt)"""
+        return cls(load_signatures(filename or os.getenv("SIGNATURE_FILE", DEFAULT_SIGNATURE_FILE)))
+
+    def candidates(self, content: str) -> List[Signature]:
+        """Devuelve las firmas cuyos literales obligatorios aparecen en el contenido (en orden de carga)"""
+        if self.prefilter is None:
+            return list(self.signatures)
+
+        found = set()
+        for match in self.prefilter.finditer(content.lower()):
+            found.add(match.group(1))
+
+        present = set()
+        for literal in found:
+            present.update(self.prefix_closure[literal])
+
+        return [
+            s for s in self.signatures
+            if all(clause & present for clause in s.clauses)
+        ]
+
+    def scan(self, content: str, first_only: bool = False) -> List[Dict]:
+        """Aplica las regex de las firmas candidatas y devuelve motor, descripción y evidencia"""
+        matches = []
+        for signature in self.candidates(content):
+            match = signature.regex.search(content)
+            if match is None:
+                continue
+            matches.append({
+                'engine': signature.engine,
+                'description': signature.description,
+                'start': match.start(),
+                'end': match.end(),
+                'evidence': match.group(0)[:200]
+            })
+            if first_only:
+                break
+        return matches
+
+class StreamMatcher:
+    """Aplica el motor de firmas de forma incremental sobre chunks de texto
+
+    Una firma partida entre chunks solo se encuentra si su coincidencia cabe en el solapamiento.
+    exhaustive indica si eso vale para todas las firmas; si no, un resultado negativo del streaming
+    no es definitivo y hay que aplicar el motor al texto completo.
+    """
+
+    def __init__(self, engine: SignatureEngine, overlap: int = 512):
+        self.engine = engine
+        self.overlap = overlap  # Caracteres del chunk anterior para no perder firmas partidas
+        self.exhaustive = engine.max_width is not None and engine.max_width <= overlap
+        self.tail = ''
+        self.offset = 0  # Posición absoluta del inicio de self.tail
+
+    def feed(self, text: str) -> Optional[Dict]:
+        """Procesa un nuevo trozo de texto y devuelve la primera firma encontrada, si hay"""
+        window = self.tail + text
+        matches = self.engine.scan(window, first_only=True)
+
+        match = None
+        if matches:
+            match = dict(matches[0])
+            match['start'] += self.offset
+            match['end'] += self.offset
+
+        keep = min(self.overlap, len(window))
+        self.offset += len(window) - keep
+        self.tail = window[len(window) - keep:]
+        return match
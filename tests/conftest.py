@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Módulos del scanner (planos en la raíz) y la aplicación de pruebas de benchmarks/
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
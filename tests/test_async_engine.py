@@ -0,0 +1,47 @@
+import pytest
+
+from http_parser import HttpRequest
+from main import SQLInjectionScanner
+from mock_app import MockApp
+
+PAYLOADS = ["'", '"', "1 OR 1=1", "1 AND 1=2", "')--", "1)--", "1'--", '1"--']
+
+@pytest.fixture
+def app():
+    app = MockApp().start()
+    yield app
+    app.stop()
+
+def scanner(**options):
+    return SQLInjectionScanner(detectors=['regex'], concurrency=4, enable_cache=False, adaptive_payloads=False,
+                               enable_clusters=False, context_probe=False, **options)
+
+def test_targets_share_loop_and_connections(app):
+    scan = scanner()
+    first = scan.scan_request(HttpRequest(app.raw_request({'cat': '1'})), PAYLOADS)
+    handler, thread = scan.async_engine.handler, scan.async_engine.thread
+    second = scan.scan_request(HttpRequest(app.raw_request({'cat': '2'})), PAYLOADS)
+
+    assert scan.async_engine.handler is handler and scan.async_engine.thread is thread
+    # El segundo target no abre conexiones: reutiliza el keep-alive del cliente compartido
+    assert second['connections']['new_connections'] == first['connections']['new_connections']
+    assert second['connections']['requests'] == 2 * first['connections']['requests']
+
+    scan.close()
+    assert scan.async_engine.loop is None and not thread.is_alive()
+
+def test_finding_cancels_pending_tests():
+    app = MockApp(latency_ms=20).start()
+    try:
+        scan = scanner()
+        payloads = ["'"] + [str(value) for value in range(2, 42)]
+        requests_before = app.requests
+        report = scan.scan_request(HttpRequest(app.raw_request({'artist': '1'})), payloads)
+        scan.close()
+    finally:
+        app.stop()
+
+    assert report['vulnerabilities_found'] == 1
+    # Solo llegan al host el baseline, el test vulnerable y los que ya estaban en vuelo
+    assert app.requests - requests_before <= 1 + scan.concurrency * 2
+    assert sum(report['metrics']['requests_per_host'].values()) < len(payloads)
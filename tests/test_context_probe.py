@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from context_probe import ContextProber, payload_context, payloads_for_context
+from main import SQLInjectionScanner
+from http_parser import HttpRequest
+from manual_detector import ManualDetector
+from response_fingerprint import fingerprint_result
+from mock_app import MockApp
+
+PAYLOADS = ["'", '"', "' OR '1'='1", '" OR "1"="1', "1 OR 1=1", "1 AND 1=2", "')--"]
+
+def test_payloads_for_context():
+    assert payload_context("' OR 1=1") == 'single'
+    assert payload_context("1 OR 1=1") == 'numeric'
+    assert payloads_for_context(PAYLOADS, 'numeric') == ["'", '"', "1 OR 1=1", "1 AND 1=2"]
+    assert payloads_for_context(PAYLOADS, 'unknown') == PAYLOADS
+
+@pytest.fixture
+def app():
+    app = MockApp().start()
+    yield app
+    app.stop()
+
+def scanner(tmp_path, resume=False):
+    return SQLInjectionScanner(detectors=['regex'], enable_cache=False, adaptive_payloads=False, enable_clusters=False,
+                               journal_file=str(tmp_path / 'journal.jsonl'), resume=resume,
+                               trace_file=str(tmp_path / 'trace.jsonl'))
+
+def test_probes_are_counted_traced_and_journaled(tmp_path, app):
+    request = HttpRequest(app.raw_request({'cat': '1'}))
+    report = scanner(tmp_path).scan_request(request, PAYLOADS)
+
+    probe = report['context_probes']['cat']
+    assert probe['context'] == 'none'  # Parámetro parametrizado: las sondas no provocan reacción
+    host = request.url.split('/')[2]
+    # Baseline + sondas, como todas las requests enviadas al host
+    assert report['metrics']['requests_per_host'][host] == 1 + len(probe['probes'])
+    events = [json.loads(line) for line in (tmp_path / 'trace.jsonl').read_text().splitlines()]
+    assert [event['payload'] for event in events if event['event'] == 'probe'] == probe['probes']
+
+    # Scan interrumpido antes del reporte: al reanudar el contexto sale del journal sin reenviar sondas
+    journal = tmp_path / 'journal.jsonl'
+    entries = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert [entry['type'] for entry in entries] == ['probe', 'report']
+    journal.write_text(json.dumps(entries[0]) + '\n')
+    sent = app.requests
+    resumed = scanner(tmp_path, resume=True).scan_request(request, PAYLOADS)
+    assert app.requests == sent + 1  # Solo el baseline
+    assert resumed['context_probes']['cat']['context'] == 'none'
+    assert resumed['resumed_tests'] == len(probe['probes'])
+
+class QuoteSensitiveHandler:
+    """Cualquier valor con comilla simple devuelve otra página (sin error SQL), balanceada o no"""
+
+    def __init__(self, request):
+        self.url = request.url
+
+    def test_parameter(self, request, parameter, value):
+        body = "<p>Sin resultados</p>" if "'" in value else "<p>Listado de artistas</p>"
+        return {'url': self.url, 'status_code': 200, 'response_text': body, 'payload': value}
+
+def test_reacting_parameter_is_not_dropped(app):
+    request = HttpRequest(app.raw_request({'cat': 'rock'}))
+    handler = QuoteSensitiveHandler(request)
+    baseline = fingerprint_result(handler.test_parameter(request, 'cat', 'rock'))
+    result = ContextProber(handler, ManualDetector().engine).probe(request, 'cat', baseline)
+    assert result['context'] == 'unknown'
+    assert result['probes'] == ["rock'", "rock''", 'rock"']
+    assert payloads_for_context(PAYLOADS, result['context']) == PAYLOADS
@@ -0,0 +1,36 @@
+import json
+
+from coordinator import Coordinator, merge_units
+from report_sink import ReportSink
+from work_queue import WorkQueue
+
+RAW_REQUEST = "GET /artists.php?artist=1&cat=2 HTTP/1.1\nHost: 127.0.0.1:9\n\n"
+
+def test_fail_units_of_dead_worker(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.reset(["'"])
+    queue.enqueue('t1', RAW_REQUEST, ['artist', 'cat'])
+    unit = queue.claim('local-0')
+    assert queue.fail_units("caído", 'local-1') == 0
+    assert queue.fail_units("caído", 'local-0') == 1
+    assert queue.unfinished() == 1
+    assert queue.fail_units("sin workers") == 1
+    units = queue.target_units(unit['target_seq'])
+    merged = merge_units(units)
+    assert merged['status'] == 'error'
+    assert [entry['error'] for entry in merged['units']] == ["caído", "sin workers"]
+
+def test_coordinator_stops_when_local_workers_die(tmp_path, monkeypatch):
+    monkeypatch.setenv('WORKER_RESTARTS', '1')
+    source = tmp_path / 'requests.jsonl'
+    source.write_text(json.dumps({'id': 't1', 'raw_request': RAW_REQUEST}) + '\n')
+    report = tmp_path / 'report.jsonl'
+    # Opción desconocida: el scanner del worker no se puede construir y el proceso termina con error
+    coordinator = Coordinator(str(tmp_path / 'queue.sqlite3'), {'unknown_option': True}, ReportSink(str(report)),
+                              processes=1)
+    summary = coordinator.run(str(source), ["'"], poll_interval=0.05)
+    assert summary['targets_scanned'] == 1
+    assert summary['errors'] == 1
+    assert summary['units'] == {'error': 2}
+    records = [json.loads(line) for line in report.read_text().splitlines()]
+    assert records[-1]['status'] == 'error'
@@ -0,0 +1,35 @@
+from detection_pipeline import DetectionPipeline
+from excerpt_extractor import has_sql_hints
+from manual_detector import ManualDetector
+
+class FailingOpenAIDetector:
+    """La triage debe decidir sin llegar a OpenAI"""
+
+    def detect(self, *args):
+        raise AssertionError("no se esperaba una llamada a OpenAI")
+
+def test_sql_hints_ignore_markup():
+    page = ("<html><head><script>var warning = 'exception';</script><style>.column{}</style></head><body>"
+            "<table><tr><td><select name='sort'><option>Price</option></select></td></tr></table>"
+            "<!-- database backup --></body></html>")
+    assert not has_sql_hints(page)
+    assert has_sql_hints(page.replace('</table>', '</table><p>Unclosed quotation mark</p>'))
+    assert has_sql_hints("<p>Unknown COLUMN 'x' in 'where clause'</p>")
+
+def test_triage_skips_llm_for_table_markup():
+    pipeline = DetectionPipeline(ManualDetector(), FailingOpenAIDetector(), stages=['benign', 'regex', 'triage', 'openai'],
+                                 mode='tiered')
+    result = pipeline.run("<table><tr><td>Lorem</td></tr></table><select><option>1</option></select>", 'id', "'")
+    assert result['decided_by'] == 'triage'
+    assert not result['contains_sql_error']
+
+def test_benign_hashes_are_bounded(monkeypatch):
+    monkeypatch.setenv('BENIGN_CACHE_MAX_ENTRIES', '2')
+    pipeline = DetectionPipeline(ManualDetector(), FailingOpenAIDetector(), stages=['benign', 'regex', 'triage'],
+                                 mode='tiered')
+    for page in ("<p>uno</p>", "<p>dos</p>", "<p>uno</p>", "<p>tres</p>"):
+        pipeline.run(page, 'id', "'")
+    assert len(pipeline.benign_hashes) == 2
+    assert pipeline.run("<p>uno</p>", 'id', "'")['decided_by'] == 'benign'
+    # "dos" era el menos usado: se descartó y vuelve a pasar por regex y triage
+    assert pipeline.run("<p>dos</p>", 'id', "'")['decided_by'] == 'triage'
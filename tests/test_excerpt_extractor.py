@@ -0,0 +1,24 @@
+from excerpt_extractor import ExcerptExtractor, visible_lines
+
+def test_visible_lines_strip_markup():
+    page = ("<html><head><style>p{}</style><script>var x = 1;</script></head><body><!-- nota -->"
+            "<h1>Artists</h1><p>Lorem <b>ipsum</b> &amp; more</p></body></html>")
+    assert visible_lines(page) == ['Artists', 'Lorem ipsum & more']
+
+def test_ranking_prefers_new_keyword_lines():
+    baseline = ["Table of contents", "Product A", "Product B"]
+    response = ["Table of contents", "Product A", "Product B", "Thanks for visiting", "Unknown column 'x'"]
+    extractor = ExcerptExtractor(token_budget=5, context_lines=0)  # Solo cabe una línea
+    assert extractor.extract("<br>".join(response), set(baseline)) == "Unknown column 'x'"
+
+    ranked = ExcerptExtractor(token_budget=200, context_lines=0).extract("<br>".join(response), set(baseline))
+    assert ranked.splitlines() == ["Table of contents", "[...]", "Thanks for visiting", "Unknown column 'x'"]
+
+def test_large_pages_keep_head_and_tail():
+    rows = "<tr><td>Product item lorem ipsum</td></tr>\n" * 20000
+    page = "<html><body><p>Warning: mysql_connect()</p><table>" + rows + "</table><p>Fatal error: query failed</p></body></html>"
+    extractor = ExcerptExtractor(max_input_chars=64 * 1024)
+    excerpt = extractor.extract(page)
+    assert "Warning: mysql_connect()" in excerpt
+    assert "Fatal error: query failed" in excerpt
+    assert extractor._cap(page).count("<tr>") < 2000
@@ -0,0 +1,75 @@
+import pytest
+
+from host_control import HostControl, HostController
+
+@pytest.fixture(autouse=True)
+def fast_host(monkeypatch):
+    # Sin pausas de backoff ni cooldown: los tests recorren los estados sin esperar
+    monkeypatch.setenv('HOST_BACKOFF_BASE', '0')
+    monkeypatch.setenv('HOST_CIRCUIT_COOLDOWN', '0')
+    monkeypatch.setenv('HOST_CIRCUIT_THRESHOLD', '3')
+
+def run(controller: HostController, outcome: str, latency: float = 0.01):
+    assert controller.try_acquire() == ('ok', 0.0)
+    controller.release(outcome, latency=latency)
+
+def test_slow_start_then_multiplicative_decrease():
+    controller = HostController('shop.test', max_limit=8)
+    assert controller.limit == 2
+    for _ in range(3):
+        run(controller, 'success')
+    assert controller.limit == 5  # Slow start: +1 por respuesta
+
+    run(controller, 'success', latency=1.0)  # Latencia > factor × mínima y > floor: congestión
+    assert controller.limit == 2.5 and not controller.slow_start
+    controller.last_decrease = 0.0
+    run(controller, 'success')
+    assert controller.limit == pytest.approx(2.9)  # Aumento aditivo: +1 por ventana
+
+def test_limit_blocks_extra_requests():
+    controller = HostController('shop.test', max_limit=8)
+    assert controller.try_acquire()[0] == 'ok'
+    assert controller.try_acquire()[0] == 'ok'
+    assert controller.try_acquire()[0] == 'wait'
+
+@pytest.mark.parametrize('error', ['connection_error', 'timeout_error', 'general_error'])
+def test_request_errors_count_as_failures(error):
+    control = HostControl(max_limit=8)
+    controller = control.get('shop.test')
+    controller.limit = 4.0
+    assert control.acquire('shop.test')
+    control.release('shop.test', {'error': error})
+    assert controller.limit == 2 and controller.stats['failures'] == 1
+    assert controller.consecutive_failures == 1
+
+def test_circuit_opens_after_consecutive_failures():
+    controller = HostController('shop.test', max_limit=8)
+    controller.circuit_cooldown = 60
+    for _ in range(3):
+        run(controller, 'failure')
+    assert controller.circuit == 'open' and controller.stats['circuit_opened'] == 1
+    assert controller.try_acquire() == ('open', 0.0)
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    controller = HostController('shop.test', max_limit=8)
+    for _ in range(3):
+        run(controller, 'failure')
+    controller.pause_until = 0.0
+
+    assert controller.try_acquire() == ('ok', 0.0)  # Cooldown cumplido: request de prueba
+    assert controller.circuit == 'half_open' and controller.limit == 1
+    assert controller.try_acquire()[0] == 'wait'  # El resto espera el resultado de la prueba
+    controller.release('success', latency=0.01)
+    assert controller.circuit == 'closed' and controller.consecutive_failures == 0
+
+def test_half_open_probe_failure_reopens_the_circuit():
+    controller = HostController('shop.test', max_limit=8)
+    for _ in range(3):
+        run(controller, 'failure')
+    controller.pause_until = 0.0
+
+    assert controller.try_acquire() == ('ok', 0.0)
+    controller.circuit_cooldown = 60
+    controller.release('failure')
+    assert controller.circuit == 'open' and controller.stats['circuit_opened'] == 2
+    assert controller.try_acquire() == ('open', 0.0)
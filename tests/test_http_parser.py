@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from http_parser import HttpRequest
+
+@pytest.fixture(autouse=True)
+def default_injection_headers(monkeypatch):
+    monkeypatch.delenv('INJECTION_HEADERS', raising=False)
+    monkeypatch.delenv('INJECTION_POINTS', raising=False)
+    monkeypatch.delenv('TARGET_SCHEME', raising=False)
+
+def test_query_slots_and_build_test():
+    request = HttpRequest("GET /artists.php?artist=1&cat=2 HTTP/1.1\nHost: shop.test\n\n")
+    assert request.url == 'http://shop.test/artists.php'
+    assert request.params == {'artist': ['1'], 'cat': ['2']}
+    assert request.slots['artist'].location == 'query'
+    assert request.slots['artist'].original == '1'
+
+    prepared = request.build_test('artist', "1' OR '1'='1")
+    assert prepared.url == 'http://shop.test/artists.php?artist=1%27+OR+%271%27%3D%271&cat=2'
+    assert prepared.location == 'query'
+    assert request.build_baseline().url == 'http://shop.test/artists.php?artist=1&cat=2'
+
+def test_repeated_query_params_get_their_own_slots():
+    request = HttpRequest("GET /search?a=1&a=2&b=3 HTTP/1.1\nHost: shop.test\n\n")
+    assert [name for name in request.slots if not name.startswith(('header:', 'path:'))] == ['a', 'a#2', 'b']
+    assert request.build_test('a#2', 'x').url == 'http://shop.test/search?a=1&a=x&b=3'
+    assert request.build_test('a', 'x').url == 'http://shop.test/search?a=x&a=2&b=3'
+
+def test_form_body_slots_with_crlf():
+    raw = ("POST /login HTTP/1.1\r\nHost: shop.test\r\nContent-Type: application/x-www-form-urlencoded\r\n\r\n"
+           "user=admin&pass=secret")
+    request = HttpRequest(raw)
+    assert request.body == 'user=admin&pass=secret'
+    assert request.slots['user'].location == 'form'
+    prepared = request.build_test('user', "admin'--")
+    assert prepared.body == b"user=admin%27--&pass=secret"
+    assert prepared.url == 'http://shop.test/login'
+
+def test_form_slot_does_not_shadow_query_slot():
+    raw = ("POST /items?id=1 HTTP/1.1\nHost: shop.test\nContent-Type: application/x-www-form-urlencoded\n\n"
+           "id=2")
+    request = HttpRequest(raw)
+    assert request.slots['id'].location == 'query'
+    assert request.slots['form:id'].location == 'form'
+
+def test_json_slots():
+    body = json.dumps({'user': {'id': 7, 'name': 'ana'}, 'tags': ['a'], 'active': True})
+    request = HttpRequest(f"POST /api HTTP/1.1\nHost: shop.test\nContent-Type: application/json\n\n{body}")
+    assert {'json:user.id', 'json:user.name', 'json:tags[0]'} <= set(request.slots)
+    assert 'json:active' not in request.slots  # Los booleanos no son puntos de inyección
+    prepared = request.build_test('json:user.id', '7"')
+    assert json.loads(prepared.body)['user']['id'] == '7"'
+
+def test_cookie_header_and_path_slots():
+    raw = ("GET /shop/42/items.php HTTP/2\nhost: shop.test\nuser-agent: Mozilla\n"
+           "cookie: session=abc\ncookie: lang=es\n\n")
+    request = HttpRequest(raw)
+    assert request.header('Host') == 'shop.test'
+    assert request.header('Cookie') == 'session=abc; lang=es'  # Cookies repetidas (HTTP/2) unidas
+    assert request.slots['cookie:session'].location == 'cookie'
+    assert request.slots['header:user-agent'].location == 'header'
+    assert request.slots['path:2'].original == '42'
+    assert 'path:3' not in request.slots  # items.php no parece un valor
+
+    cookie_test = request.build_test('cookie:lang', "es'")
+    assert cookie_test.headers['cookie'] == 'session=abc; lang=es%27'
+    assert request.send_headers['cookie'] == 'session=abc; lang=es'  # La plantilla no se modifica
+    assert request.build_test('path:2', '42 OR 1=1').url == 'http://shop.test/shop/42%20OR%201%3D1/items.php'
+
+def test_injection_points_filter_by_location(monkeypatch):
+    raw = "GET /items.php?id=1 HTTP/1.1\nHost: shop.test\nCookie: s=1\n\n"
+    request = HttpRequest(raw)
+    assert request.injection_points(['query']) == ['id']
+    assert request.injection_points(['cookie']) == ['cookie:s']
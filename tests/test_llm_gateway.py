@@ -0,0 +1,99 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+import pytest
+
+from llm_gateway import LLMGateway, TokenBucket, parse_json_response, unsupported_response_format
+from mock_openai import MockOpenAI
+
+SCHEMA = {'type': 'object', 'properties': {'contains_sql_error': {'type': 'boolean'}},
+          'required': ['contains_sql_error'], 'additionalProperties': False}
+MESSAGES = [{'role': 'system', 'content': 'Responde en JSON'}, {'role': 'user', 'content': 'hola'}]
+
+def bad_request(message: str, param: str = None) -> openai.BadRequestError:
+    response = httpx.Response(400, request=httpx.Request('POST', 'http://127.0.0.1/v1/chat/completions'))
+    return openai.BadRequestError(message, response=response,
+                                  body={'message': message, 'param': param, 'type': 'invalid_request_error'})
+
+def test_unsupported_response_format():
+    assert unsupported_response_format(bad_request(
+        "Invalid parameter: 'response_format' of type 'json_schema' is not supported with this model.",
+        'response_format'))
+    assert unsupported_response_format(bad_request("Unknown parameter: 'response_format.json_schema'."))
+    assert not unsupported_response_format(bad_request(
+        "Invalid schema for response_format 'verdict': 'required' is required", 'response_format'))
+    assert not unsupported_response_format(bad_request(
+        "This model's maximum context length is 128000 tokens", 'messages'))
+
+def test_parse_json_response():
+    assert parse_json_response('```json\n{"contains_sql_error": true}\n```', ['contains_sql_error']) == \
+        {'contains_sql_error': True}
+    with pytest.raises(ValueError):
+        parse_json_response('{"confidence": 1}', ['contains_sql_error'])
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = MockOpenAI(unsupported_formats=('json_schema',)).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setenv('OPENAI_BASE_URL', stub.base_url)
+    monkeypatch.setenv('LLM_RESPONSE_FORMAT', 'json_schema')
+    yield stub
+    stub.stop()
+
+def test_falls_back_to_json_object_when_schema_is_unsupported(stub):
+    gateway = LLMGateway()
+    result = gateway.complete_json('mock', MESSAGES, 'verdict', SCHEMA)
+    assert result['data']['contains_sql_error'] is False
+    assert gateway.response_format == 'json_object'
+    assert stub.response_formats == {'json_schema': 1, 'json_object': 1}
+
+def test_other_bad_requests_do_not_change_the_format(stub, monkeypatch):
+    gateway = LLMGateway()
+
+    def complete(*args, **kwargs):
+        raise bad_request("This model's maximum context length is 128000 tokens", 'messages')
+
+    monkeypatch.setattr(gateway, 'complete', complete)
+    with pytest.raises(openai.BadRequestError):
+        gateway.complete_json('mock', MESSAGES, 'verdict', SCHEMA)
+    assert gateway.response_format == 'json_schema'
+
+def test_identical_prompts_in_flight_are_sent_once(monkeypatch):
+    stub = MockOpenAI(latency_ms=300).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setenv('OPENAI_BASE_URL', stub.base_url)
+    try:
+        gateway = LLMGateway()
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(pool.map(lambda _: gateway.complete('mock', MESSAGES), range(4)))
+        assert stub.calls == 1
+        assert gateway.stats_counters['requests'] == 1 and gateway.stats_counters['deduplicated'] == 3
+        assert len({id(response) for response in responses}) == 1  # Todos comparten la misma respuesta
+
+        gateway.complete('mock', MESSAGES)  # Sin una llamada igual en vuelo se envía de nuevo
+        assert stub.calls == 2
+    finally:
+        stub.stop()
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(600)  # 10 por segundo
+        assert await bucket.acquire(600) == 0.0
+        start = time.monotonic()
+        waited = await bucket.acquire(2)
+        return waited, time.monotonic() - start
+
+    waited, elapsed = asyncio.run(run())
+    assert 0.15 <= waited <= 0.25
+    assert elapsed >= 0.15
+
+def test_token_bucket_adjusts_to_real_usage():
+    bucket = TokenBucket(60)
+    bucket.tokens = 10.0
+    bucket.adjust(25)  # Se consumieron 25 tokens más de los estimados: queda deuda
+    assert bucket.tokens < 0
+    bucket.adjust(10_000)
+    assert bucket.tokens >= -bucket.capacity  # La deuda se limita a un minuto de capacidad
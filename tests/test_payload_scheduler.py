@@ -0,0 +1,40 @@
+from payload_scheduler import PayloadScheduler, product_name
+
+PAYLOADS = ["'", '"', "1 OR 1=1", "')--"]
+HEADERS = {'Server': 'Apache/2.4.41 (Ubuntu)', 'X-Powered-By': 'PHP/8.1.2'}
+
+def test_product_name():
+    assert product_name('Apache/2.4.41 (Ubuntu)') == 'apache'
+    assert product_name(None) == 'none'
+
+def test_cold_start_keeps_file_order(tmp_path):
+    scheduler = PayloadScheduler(str(tmp_path / 'stats.sqlite3'))
+    fingerprint = scheduler.fingerprint('shop.test', HEADERS)
+    assert fingerprint == 'server=apache;powered=php;engine=unknown'
+    assert scheduler.order(PAYLOADS, fingerprint) == PAYLOADS
+
+def test_learned_order_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'stats.sqlite3')
+    scheduler = PayloadScheduler(path)
+    fingerprint = scheduler.fingerprint('shop.test', HEADERS)
+    for _ in range(3):
+        scheduler.record(fingerprint, {"'": 1, '"': 1, "1 OR 1=1": 1}, hit_payload="1 OR 1=1", position=3,
+                         host='shop.test', engine='MySQL')
+
+    reopened = PayloadScheduler(path)
+    fingerprint = reopened.fingerprint('shop.test', HEADERS)
+    assert fingerprint == 'server=apache;powered=php;engine=MySQL'  # Motor recordado para el host
+    order = reopened.order(PAYLOADS, fingerprint)
+    assert order[0] == "1 OR 1=1"
+    # Sin historial, "')--" hereda la tasa base y queda por delante de los payloads que siempre fallan
+    assert order.index("')--") < order.index("'")
+
+def test_specific_fingerprint_overrides_global_history(tmp_path):
+    scheduler = PayloadScheduler(str(tmp_path / 'stats.sqlite3'))
+    for _ in range(5):
+        scheduler.record('server=nginx;powered=none;engine=unknown', {"'": 1, '"': 1}, hit_payload="'", position=1)
+    for _ in range(5):
+        scheduler.record('server=iis;powered=asp.net;engine=unknown', {"'": 1, '"': 1}, hit_payload='"', position=2)
+
+    assert scheduler.order(["'", '"'], 'server=iis;powered=asp.net;engine=unknown')[0] == '"'
+    assert scheduler.order(["'", '"'], 'server=nginx;powered=none;engine=unknown')[0] == "'"
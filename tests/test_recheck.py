@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+
+from batch_scanner import BatchScanner
+from http_parser import HttpRequest
+from main import SQLInjectionScanner
+from mock_app import MockApp
+
+@pytest.fixture
+def app():
+    app = MockApp(error_style='mysql').start()
+    yield app
+    app.stop()
+
+def scanner():
+    return SQLInjectionScanner(detectors=['regex'], enable_recheck=True, enable_cache=False, adaptive_payloads=False,
+                               enable_clusters=False)
+
+def finding(scanner, request):
+    state = scanner.new_scan_state(request)
+    vulnerability = {'parameter': 'artist', 'payload': "'"}
+    analysis = {'manual_detection': {'engine': 'MySQL'}}
+    return state, vulnerability, analysis
+
+def test_library_recheck_confirms(app):
+    request = HttpRequest(app.raw_request({'artist': '1'}))
+    scan = scanner()
+    state, vulnerability, analysis = finding(scan, request)
+    recheck = scan.recheck_finding(state, vulnerability, request, '', analysis)
+    assert recheck['status'] == 'confirmed'
+    assert recheck['source'] == 'library'
+
+def test_recheck_without_responses_is_an_error(app, monkeypatch, capsys):
+    request = HttpRequest(app.raw_request({'artist': '1'}))
+    scan = scanner()
+    monkeypatch.setattr(scan.request_handler, 'test_parameter', lambda request, parameter, payload: {
+        'url': request.url, 'error': 'timeout_error', 'error_details': 'Timeout'})
+    state, vulnerability, analysis = finding(scan, request)
+    recheck = scan.recheck_finding(state, vulnerability, request, '', analysis)
+
+    assert recheck['status'] == 'error'
+    assert vulnerability['confirmed_vulnerability'] is False
+    output = capsys.readouterr().out
+    assert 'Ningún payload sugerido obtuvo respuesta' in output
+    assert '[FALSO POSITIVO]' not in output
+
+def test_recheck_cache_is_keyed_by_quote_context(tmp_path, monkeypatch):
+    from llm_cache import LLMCache
+    from recheck_detector import RecheckDetector, quote_context
+
+    detector = RecheckDetector(cache=LLMCache(str(tmp_path)), use_llm=False)
+    calls = []
+
+    def analyze(excerpt, original_payload):
+        calls.append(original_payload)
+        quote = quote_context(original_payload)
+        return {'success': True, 'is_sql_injection': True, 'recheck_payload': f"1{quote} AND 1=version()--",
+                'database_engine': 'PostgreSQL'}
+
+    monkeypatch.setattr(detector, '_analyze_with_openai', analyze)
+    error = "<p>ERROR: unterminated quoted string at or near</p>"
+    assert detector.analyze_with_openai(error, "'")['recheck_payload'] == "1' AND 1=version()--"
+    assert detector.analyze_with_openai(error, '"')['recheck_payload'] == '1" AND 1=version()--'
+    # Mismo contexto de comillas: se sirve de la caché
+    assert detector.analyze_with_openai(error, "' OR '1'='1")['cached']
+    assert calls == ["'", '"']
+
+def test_batch_target_records_carry_the_recheck_outcome(app, tmp_path):
+    batch = tmp_path / 'batch.jsonl'
+    batch.write_text(''.join(json.dumps({'id': f"t{index}", 'raw_request': app.raw_request({'artist': str(index)})}) + '\n'
+                             for index in range(3)))
+    scan = SQLInjectionScanner(detectors=['regex'], enable_recheck=True, enable_cache=False, adaptive_payloads=False,
+                               journal_file=str(tmp_path / 'journal.jsonl'), report_file=str(tmp_path / 'report.jsonl'))
+    scan.wait_for_rechecks = False
+    recheck_finding = scan.recheck_finding
+
+    def slow_recheck(*args):
+        time.sleep(0.3)  # El worker del batch termina el target antes que su recheck
+        return recheck_finding(*args)
+
+    scan.recheck_finding = slow_recheck
+    summary = BatchScanner(scan, workers=3, per_host=3).run(str(batch), ["'", '"'])
+    scan.wait_rechecks()
+    scan.close()
+
+    assert summary['vulnerable'] == 3
+    records = [json.loads(line) for line in (tmp_path / 'report.jsonl').read_text().splitlines()]
+    targets = [record for record in records if record['type'] == 'target']
+    assert sorted(record['target_id'] for record in targets) == ['t0', 't1', 't2']
+    for record in targets:
+        assert [vulnerability['recheck']['status'] for vulnerability in record['vulnerabilities']] == ['confirmed']
@@ -0,0 +1,60 @@
+import gzip
+import hashlib
+import json
+import tracemalloc
+
+from report_sink import EvidenceStore, ReportSink
+
+def test_records_are_on_disk_before_close(tmp_path):
+    path = tmp_path / 'report.jsonl'
+    sink = ReportSink(str(path))
+    sink.finding('http://shop.test/items.php', {'parameter': 'id', 'payload': "'"})
+    sink.target({'target_url': 'http://shop.test/items.php', 'status': 'vulnerable'})
+
+    # Buffer de línea: un proceso interrumpido ya habría dejado los dos registros
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [record['type'] for record in records] == ['finding', 'target']
+    assert records[0]['target_url'] == 'http://shop.test/items.php' and records[0]['parameter'] == 'id'
+    assert sink.records == {'finding': 1, 'target': 1}
+    sink.close()
+
+def test_memory_stays_flat_with_many_targets(tmp_path):
+    sink = ReportSink(str(tmp_path / 'report.jsonl'))
+    report = {'target_url': 'http://shop.test/items.php', 'padding': 'x' * 10_000}
+    sink.target(report)  # Calienta el encoder y el buffer del archivo
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(2000):
+        sink.target(report)
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    sink.close()
+
+    assert growth < 1_000_000  # Se escribieron ~20 MB: nada se acumula en memoria
+    assert sink.records['target'] == 2001
+
+def test_excerpt_is_bounded_and_centered_on_the_signature():
+    store = EvidenceStore(excerpt_chars=100)
+    text = 'a' * 5000 + 'sqlite3.OperationalError' + 'b' * 5000
+    described = store.describe(text, {'start': 5000})
+    assert len(described['excerpt']) == 100 and 'sqlite3.Operational' in described['excerpt']
+    assert described['excerpt_start'] == 4950
+    assert described['sha256'] == hashlib.sha256(text.encode('utf-8')).hexdigest()
+    assert described['length'] == len(text) and described['body_file'] is None
+
+    compacted = store.compact({'payload': "'", 'response_text': text, 'fingerprint': object()})
+    assert set(compacted) == {'payload', 'evidence'}
+    assert compacted['evidence']['excerpt_start'] == 0
+
+def test_side_store_keeps_each_body_once(tmp_path):
+    store = EvidenceStore(str(tmp_path / 'evidence'), excerpt_chars=50)
+    body = '<html>' + 'fila ' * 1000 + '</html>'
+    first = store.describe(body)
+    second = store.describe(body)
+
+    assert first['body_file'] == second['body_file']
+    with gzip.open(first['body_file'], 'rt', encoding='utf-8') as f:
+        assert f.read() == body
+    assert store.stats()['bodies_stored'] == 1
+    assert store.stats()['bytes_stored'] == len(body.encode('utf-8'))
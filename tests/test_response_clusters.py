@@ -0,0 +1,42 @@
+from response_clusters import ResponseClusterIndex
+from response_fingerprint import ResponseFingerprint, hamming_distance
+
+LINES = [f"<p>Artículo {index}: descripción del producto con precio y stock</p>" for index in range(800)]
+MYSQL_ERROR = "<p>You have an error in your SQL syntax near '{payload}' at line 1</p>"
+
+def page(extra: str = "") -> str:
+    return "<html><body>\n" + "\n".join(LINES) + extra + "\n</body></html>"
+
+def error_page(payload: str) -> ResponseFingerprint:
+    return ResponseFingerprint(page(MYSQL_ERROR.format(payload=payload)), 200, payload)
+
+VERDICT = {'contains_sql_error': True, 'decided_by': 'regex', 'openai_detection': {}}
+
+def test_clean_page_does_not_inherit_error_verdict():
+    index = ResponseClusterIndex()
+    error = error_page("1'")
+    cluster, verdict = index.claim(error, {'payload': "1'"})
+    assert verdict is None
+    index.resolve(cluster, VERDICT)
+
+    clean = ResponseFingerprint(page(), 200, "2'")
+    assert hamming_distance(error.simhash, clean.simhash) <= index.max_distance
+    other, verdict = index.claim(clean, {'payload': "2'"})
+    assert other is not cluster and verdict is None
+
+    # El mismo error con otro eco del payload sí reutiliza el verdict
+    same, verdict = index.claim(error_page("3'"), {'payload': "3'"})
+    assert same is cluster and verdict is VERDICT
+
+def test_index_evicts_oldest_clusters():
+    index = ResponseClusterIndex(max_entries=2)
+    first, _ = index.claim(ResponseFingerprint("<p>uno</p>", 200), {})
+    index.resolve(first, VERDICT)
+    for text in ("<p>dos</p>", "<p>tres</p>"):
+        cluster, _ = index.claim(ResponseFingerprint(text, 200), {})
+        index.resolve(cluster, VERDICT)
+    assert list(index.clusters) == [2, 3]
+    assert index.stats() == {'clusters': 3, 'evicted': 1, 'reused_verdicts': 0}
+    # El cluster descartado ya no se encuentra: la respuesta se analiza de nuevo
+    cluster, verdict = index.claim(ResponseFingerprint("<p>uno</p>", 200), {})
+    assert cluster.id == 4 and verdict is None
@@ -0,0 +1,27 @@
+from response_fingerprint import ResponseFingerprint
+
+def page(lines):
+    return "<html><body>\n" + "\n".join(f"<p>Artículo {index}: {line}</p>" for index, line in enumerate(lines)) + \
+        "\n</body></html>"
+
+LINES = [f"descripción del producto número {index} con precio y stock" for index in range(800)]
+
+def test_sql_lines_keep_multiword_keywords():
+    text = "<p>ORA-01756: quoted string not properly terminated</p><p>Fatal error: in /var/www/a.php</p><p>hola</p>"
+    assert ResponseFingerprint(text, 500).sql_lines == {"ora-01756: quoted string not properly terminated",
+                                                         "fatal error: in /var/www/a.php"}
+    assert ResponseFingerprint("<table><tr><td>hola</td></tr></table>", 200).sql_lines == frozenset()
+
+def test_new_oracle_error_is_not_equivalent():
+    baseline = ResponseFingerprint(page(LINES), 200)
+    injected = ResponseFingerprint(page(LINES + ["ORA-01756: quoted string not properly terminated"]), 200)
+    comparison = baseline.compare(injected)
+    assert comparison['simhash_distance'] <= 3  # La página es casi idéntica: solo las líneas lo distinguen
+    assert not comparison['equivalent']
+
+def test_echo_and_small_changes_are_equivalent():
+    baseline = ResponseFingerprint(page(LINES + ["Resultados para: 1"]), 200, '1')
+    echoed = ResponseFingerprint(page(LINES + ["Resultados para: 1' OR '1'='1"]), 200, "1' OR '1'='1")
+    assert baseline.compare(echoed)['equivalent']
+    changed = ResponseFingerprint(page(LINES[:-1] + ["descripción del producto agotado"]), 200)
+    assert baseline.compare(changed)['equivalent']
@@ -0,0 +1,31 @@
+import json
+
+from scan_journal import ScanJournal
+
+def write_entries(path, entries):
+    path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+def test_new_run_keeps_interrupted_journal(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    write_entries(path, [{'type': 'test', 'target': 'a', 'parameter': 'id', 'payload': "'"},
+                         {'type': 'report', 'target': 'a', 'report': {}},
+                         {'type': 'test', 'target': 'b', 'parameter': 'id', 'payload': "'"}])
+    interrupted = path.read_text()
+    ScanJournal(str(path)).close()
+
+    rotated = [candidate for candidate in tmp_path.iterdir() if candidate != path]
+    assert len(rotated) == 1 and rotated[0].name.startswith('journal.') and rotated[0].suffix == '.jsonl'
+    assert rotated[0].read_text() == interrupted
+    assert path.read_text() == ''
+    # El journal conservado se puede reanudar
+    journal = ScanJournal(str(rotated[0]), resume=True)
+    assert list(journal.completed_tests('b')) == [('id', "'")]
+    journal.close()
+
+def test_new_run_replaces_finished_journal(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    write_entries(path, [{'type': 'test', 'target': 'a', 'parameter': 'id', 'payload': "'"},
+                         {'type': 'report', 'target': 'a', 'report': {}}])
+    ScanJournal(str(path)).close()
+    assert list(tmp_path.iterdir()) == [path]
+    assert path.read_text() == ''
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+
+from scan_metrics import ScanMetrics, add_token_usage, percentile, token_usage
+
+def test_percentile_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([], 95) == 0.0
+
+def test_token_usage_from_openai_response():
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30,
+                                                     prompt_tokens_details={'cached_tokens': 64}))
+    usage = token_usage(response)
+    assert usage == {'prompt_tokens': 120, 'completion_tokens': 30, 'cached_tokens': 64}
+    assert token_usage(SimpleNamespace()) is None
+    assert add_token_usage(usage, usage)['prompt_tokens'] == 240
+
+def test_summary_per_stage_tokens_and_hosts():
+    metrics = ScanMetrics()
+    for milliseconds in (10, 20, 30, 40):
+        metrics.add_duration('http', milliseconds)
+    metrics.add_timings({'regex': 1.5})
+    usage = {'prompt_tokens': 100, 'completion_tokens': 20, 'cached_tokens': 0}
+    metrics.add_usage('openai', {'usage': usage, 'parse_retries': 1})
+    metrics.add_usage('openai', {'usage': usage, 'cached': True})  # Respuesta desde caché: sin tokens
+    metrics.add_usage('openai', {'error_type': 'skipped'})
+    metrics.count_host('shop.test')
+    metrics.count_host('shop.test')
+
+    summary = metrics.summary()
+    assert summary['stages']['http'] == {'count': 4, 'total_ms': 100, 'p50_ms': 20, 'p95_ms': 40, 'max_ms': 40}
+    assert summary['stages']['regex']['count'] == 1
+    assert summary['llm_tokens']['openai'] == {'calls': 1, 'cached': 1, 'prompt_tokens': 100, 'completion_tokens': 20,
+                                               'cached_tokens': 0, 'parse_retries': 1}
+    assert summary['requests_per_host'] == {'shop.test': 2}
+
+def test_trace_appends_one_event_per_line(tmp_path):
+    trace_file = tmp_path / 'trace.jsonl'
+    metrics = ScanMetrics(str(trace_file))
+    metrics.trace({'param': 'id', 'payload': "'", 'http_ms': 12.5})
+    metrics.trace({'param': 'id', 'payload': '"', 'http_ms': 8.0})
+    metrics.close()
+
+    events = [json.loads(line) for line in trace_file.read_text(encoding='utf-8').splitlines()]
+    assert [event['payload'] for event in events] == ["'", '"']
+    assert ScanMetrics().trace({'ignored': True}) is None  # Sin trace_file no se escribe nada
@@ -0,0 +1,44 @@
+from http_parser import ResponseBodyReader
+from manual_detector import ManualDetector
+from signature_engine import SignatureEngine, StreamMatcher, max_match_width, required_clauses
+
+def test_required_clauses():
+    assert required_clauses(r"You have an error in your SQL syntax") == [frozenset(['you have an error in your sql syntax'])]
+    assert required_clauses(r"Warning.*mysql_fetch") == [frozenset(['warning']), frozenset(['mysql_fetch'])]
+    assert required_clauses(r"(PostgreSQL|Npgsql) error") == [frozenset(['postgresql', 'npgsql']), frozenset([' error'])]
+    assert required_clauses(r"ORA|SQLSTATE") == []
+
+def test_max_match_width():
+    assert max_match_width(r"ORA-\d{5}") == 9
+    assert max_match_width(r"Warning.*mysql_fetch") is None
+    assert max_match_width(r"error(?=.*line)") is None
+
+def test_engine_scan_and_prefilter():
+    engine = SignatureEngine([('MySQL', 'Fetch', r"Warning.*mysql_fetch"), ('Oracle', 'Code', r"ORA-\d{5}")])
+    assert [s.description for s in engine.candidates("warning: ora-01756")] == ['Code']
+    matches = engine.scan("<b>Warning</b>: mysql_fetch_array() expects")
+    assert [(match['engine'], match['start']) for match in matches] == [('MySQL', 3)]
+
+def stream(engine: SignatureEngine, text: str, chunk_size: int) -> ResponseBodyReader:
+    reader = ResponseBodyReader(matcher=StreamMatcher(engine, overlap=512))
+    data = text.encode('utf-8')
+    for start in range(0, len(data), chunk_size):
+        if reader.feed(data[start:start + chunk_size]):
+            break
+    return reader
+
+def test_bounded_signatures_make_stream_exhaustive():
+    engine = SignatureEngine([('Oracle', 'Code', r"ORA-\d{5}")])
+    assert StreamMatcher(engine, overlap=512).exhaustive
+    reader = stream(engine, 'x' * 1020 + 'ORA-01756' + 'y' * 2000, 1024)
+    assert reader.match['start'] == 1020
+    assert reader.result('u', 'p', 200)['stream_exhaustive']
+
+def test_unbounded_signature_spanning_chunks_is_not_a_final_miss():
+    detector = ManualDetector()
+    text = '<b>Warning</b>: ' + 'z' * 1200 + ' mysql_fetch_array() expects parameter 1'
+    reader = stream(detector.engine, text, 1024)
+    result = reader.result('u', "'", 200)
+    assert result['stream_match'] is None  # La coincidencia no cabe en el solapamiento
+    assert not result['stream_exhaustive']
+    assert detector.detect(result['response_text'])['contains_sql_error']
@@ -0,0 +1,112 @@
+import base64
+import json
+
+from traffic_import import (HarReader, RequestFilter, iter_http_requests, iter_import, raw_request_summary,
+                            source_format)
+
+def har_entry(url, method='GET', headers=(), post=None, response_text=''):
+    request = {'method': method, 'url': url, 'httpVersion': 'HTTP/2',
+               'headers': [{'name': name, 'value': value} for name, value in headers]}
+    if post is not None:
+        request['postData'] = post
+    return {'request': request, 'response': {'status': 200, 'content': {'text': response_text}}}
+
+def write_har(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'log': {'version': '1.2', 'creator': {'name': 'test'}, 'entries': entries}}, f)
+    return str(path)
+
+def test_source_format(tmp_path):
+    assert source_format(str(tmp_path)) == 'dir'
+    assert source_format(write_har(tmp_path / 'export.har', [])) == 'har'
+    (tmp_path / 'export.json').write_text('{"log": {"entries": []}}')
+    assert source_format(str(tmp_path / 'export.json')) == 'har'
+    (tmp_path / 'items').write_text('<?xml version="1.0"?><items></items>')
+    assert source_format(str(tmp_path / 'items')) == 'burp'
+    (tmp_path / 'targets.jsonl').write_text('{"raw_request": "GET / HTTP/1.1"}\n')
+    assert source_format(str(tmp_path / 'targets.jsonl')) == 'jsonl'
+
+def test_har_reader_small_chunks(tmp_path):
+    entries = [har_entry(f"https://shop.test/items.php?id={index}", response_text='x' * 300) for index in range(5)]
+    path = write_har(tmp_path / 'export.har', entries)
+    read = list(HarReader(path, chunk_size=64).entries())
+    assert [index for index, _ in read] == [0, 1, 2, 3, 4]
+    assert [entry['request']['url'] for _, entry in read] == [entry['request']['url'] for entry in entries]
+
+def test_har_reader_skips_oversized_entries(tmp_path):
+    # Comillas y llaves escapadas dentro del string no deben romper el salto de la entrada
+    big = har_entry('https://shop.test/big', response_text='\\"}{]' * 200 + '"' * 3)
+    small = har_entry('https://shop.test/small')
+    path = write_har(tmp_path / 'export.har', [small, big, small])
+    read = list(HarReader(path, chunk_size=64, max_entry_bytes=256).entries())
+    assert [entry is None for _, entry in read] == [False, True, False]
+    assert read[2][1]['request']['url'] == 'https://shop.test/small'
+
+def test_har_requests_and_filters(tmp_path):
+    entries = [
+        har_entry('https://api.shop.test/items?id=1', headers=[(':authority', 'api.shop.test'), ('cookie', 's=1')]),
+        har_entry('https://api.shop.test/login', method='POST',
+                  post={'mimeType': 'application/x-www-form-urlencoded', 'text': 'user=a'}),
+        har_entry('https://tracker.ads.test/pixel?u=1'),
+        har_entry('ws://api.shop.test/socket'),
+    ]
+    path = write_har(tmp_path / 'export.har', entries)
+    request_filter = RequestFilter.from_options(hosts='*.shop.test', methods='GET,POST', content_types='form')
+    targets = list(iter_import(path, request_filter))
+    assert [target_id for target_id, _ in targets] == ['entry-0', 'entry-1']
+    assert request_filter.stats() == {'accepted': 2, 'rejected': 1}
+
+    first, second = (raw for _, raw in targets)
+    assert first.startswith('GET https://api.shop.test/items?id=1 HTTP/1.1\r\nHost: api.shop.test\r\n')
+    assert ':authority' not in first
+    assert second.endswith('Content-Type: application/x-www-form-urlencoded\r\n\r\nuser=a')
+
+    requests = list(iter_http_requests(path, RequestFilter.from_options(methods='post')))
+    assert len(requests) == 1
+    assert requests[0].url == 'https://api.shop.test/login'
+    assert requests[0].slots['user'].location == 'form'
+
+def test_har_invalid_entry_reported(tmp_path):
+    path = tmp_path / 'export.har'
+    path.write_text('{"log": {"entries": [{"request": {"method": "GET", "url": "http://shop.test/"}}, '
+                    '{"request": {"url": ]}')
+    targets = list(iter_import(str(path)))
+    assert targets[0][0] == 'entry-0'
+    assert isinstance(targets[1][1], dict) and 'error' in targets[1][1]
+
+def test_burp_export(tmp_path):
+    encoded = base64.b64encode(b"POST /login HTTP/1.1\r\nHost: shop.test\r\n"
+                               b"Content-Type: application/json\r\n\r\n{\"user\": \"a\"}").decode()
+    path = tmp_path / 'items.xml'
+    path.write_text(
+        '<?xml version="1.0"?><items>'
+        f'<item><host>shop.test</host><port>443</port><protocol>https</protocol>'
+        f'<request base64="true">{encoded}</request></item>'
+        '<item><host>cdn.test</host><port>8080</port><protocol>http</protocol>'
+        '<request base64="false">GET /img.php?id=1 HTTP/1.1\nHost: cdn.test:8080\n\n</request></item>'
+        '</items>')
+    targets = list(iter_import(str(path)))
+    assert [target_id for target_id, _ in targets] == ['item-0', 'item-1']
+    assert targets[0][1].startswith('POST https://shop.test/login HTTP/1.1\r\n')
+    assert targets[1][1].startswith('GET http://cdn.test:8080/img.php?id=1 HTTP/1.1\n')
+
+    request_filter = RequestFilter.from_options(hosts='cdn.test:8080')
+    assert [target_id for target_id, _ in iter_import(str(path), request_filter)] == ['item-1']
+
+    requests = list(iter_http_requests(str(path)))
+    assert requests[0].scheme == 'https'
+    assert 'json:user' in requests[0].slots
+
+def test_raw_request_summary():
+    raw = "POST /a HTTP/1.1\r\nHost: shop.test\r\nContent-Type: application/json\r\n\r\n{}"
+    assert raw_request_summary(raw) == ('POST', 'shop.test', 'application/json', True)
+    assert raw_request_summary("GET http://other.test:81/ HTTP/1.1\nHost: shop.test\n\n") == \
+        ('GET', 'other.test:81', '', False)
+
+def test_request_filter_rules():
+    request_filter = RequestFilter.from_options(hosts='api.test', content_types='json')
+    assert request_filter.matches('GET', 'api.test:8443')  # Sin body el content-type no filtra
+    assert request_filter.matches('POST', 'API.test', 'application/json; charset=utf-8', True)
+    assert not request_filter.matches('POST', 'api.test', 'text/plain', True)
+    assert not request_filter.matches('GET', 'www.api.test')
+    assert RequestFilter.from_options().is_empty()
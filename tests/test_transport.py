@@ -0,0 +1,141 @@
+import asyncio
+import shutil
+import socket
+
+import pytest
+
+from http_parser import AsyncRequestHandler, HttpRequest, RequestHandler
+from mock_app import MockApp, generate_certificate
+from transport import ResumingSSLContext, Transport, build_ssl_context, detect_scheme
+
+@pytest.mark.parametrize('host, headers, scheme, expected', [
+    ('shop.test', {}, 'https', 'https'),
+    ('shop.test:443', {}, 'http', 'http'),
+    ('shop.test:443', {}, None, 'https'),
+    ('shop.test:80', {'Origin': 'https://shop.test:80'}, None, 'http'),
+    ('shop.test', {'Referer': 'https://shop.test/items.php'}, None, 'https'),
+    ('shop.test', {'origin': 'https://other.test'}, None, 'http'),
+    ('[::1]', {}, 'auto', 'http'),
+    ('shop.test:8443', {}, 'auto', 'http'),
+])
+def test_detect_scheme(monkeypatch, host, headers, scheme, expected):
+    monkeypatch.delenv('TARGET_SCHEME', raising=False)
+    assert detect_scheme(host, headers, scheme) == expected
+
+def test_detect_scheme_from_env(monkeypatch):
+    monkeypatch.setenv('TARGET_SCHEME', 'https')
+    assert detect_scheme('shop.test:80', {}) == 'https'
+
+def test_request_scheme_from_absolute_url():
+    request = HttpRequest("GET https://shop.test:8443/items.php?id=1 HTTP/1.1\nHost: ignored.test\n\n")
+    assert request.scheme == 'https'
+    assert request.baseline_url == 'https://shop.test:8443/items.php?id=1'
+
+def test_ssl_context_verification_modes(tmp_path):
+    unverified = build_ssl_context(False, ['http/1.1'])
+    assert isinstance(unverified, ResumingSSLContext)
+    assert unverified.verify_mode.name == 'CERT_NONE' and not unverified.check_hostname
+    verified = build_ssl_context(True, ['h2', 'http/1.1'])
+    assert verified.verify_mode.name == 'CERT_REQUIRED' and verified.check_hostname
+
+@pytest.fixture(scope='module')
+def tls_app(tmp_path_factory):
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl no está disponible para generar el certificado')
+    certificate = generate_certificate(str(tmp_path_factory.mktemp('tls')))
+    app = MockApp(tls_cert=certificate).start()
+    yield app, certificate
+    app.stop()
+
+@pytest.fixture
+def transport(tls_app, monkeypatch):
+    monkeypatch.setenv('TLS_VERIFY', tls_app[1])
+    monkeypatch.setenv('TLS_SESSION_RESUMPTION', '1')
+    monkeypatch.setenv('DNS_CACHE_TTL', '0')
+    return Transport(pool_size=2)
+
+def tls_request(app) -> HttpRequest:
+    return HttpRequest(app.raw_request({'artist': '1'}), scheme='https')
+
+def test_https_sync_path_and_stats(tls_app, transport):
+    handler = RequestHandler(pool_size=2, transport=transport)
+    request = tls_request(tls_app[0])
+    assert request.baseline_url.startswith('https://127.0.0.1:')
+
+    assert handler.fetch_baseline(request)['status_code'] == 200
+    result = handler.test_parameter(request, 'artist', "'")
+    assert result['status_code'] == 200
+    assert 'sqlite3.OperationalError' in result['response_text']
+
+    stats = transport.stats_snapshot()
+    assert stats['requests'] == 2
+    assert stats['new_connections'] == 1  # La segunda request reutiliza la conexión keep-alive
+    assert stats['reuse_ratio'] == 0.5
+    assert stats['tls_handshake_ms']['count'] == 1
+    assert stats['http_versions'] == {'HTTP/1.1': 2}
+
+def test_sync_connection_resumes_tls_session(tls_app, transport):
+    handler = RequestHandler(pool_size=2, transport=transport)
+    request = tls_request(tls_app[0])
+    handler.fetch_baseline(request)
+    handler.session.close()  # Cierra el pool: la siguiente request abre una conexión nueva
+    handler.session = transport.create_session()
+    handler.fetch_baseline(request)
+
+    stats = transport.stats_snapshot()
+    assert stats['new_connections'] == 2
+    assert stats['tls_sessions_reused'] == 1
+    assert stats['tls_resumption_ratio'] == 0.5
+
+def test_resumption_can_be_disabled(tls_app, transport, monkeypatch):
+    monkeypatch.setenv('TLS_SESSION_RESUMPTION', '0')
+    transport = Transport(pool_size=2)
+    for _ in range(2):
+        handler = RequestHandler(pool_size=2, transport=transport)
+        handler.fetch_baseline(tls_request(tls_app[0]))
+        handler.session.close()
+    assert transport.stats_snapshot()['tls_sessions_reused'] == 0
+
+def test_https_async_path_and_resumption(tls_app, transport):
+    request = tls_request(tls_app[0])
+
+    async def run():
+        results = []
+        for _ in range(2):
+            handler = AsyncRequestHandler(max_connections=2, transport=transport)
+            results.append(await handler.test_parameter(request, 'artist', '1'))
+            await handler.close()
+        return results
+
+    results = asyncio.run(run())
+    assert [result['status_code'] for result in results] == [200, 200]
+    stats = transport.stats_snapshot()
+    assert stats['new_connections'] == 2
+    assert stats['tls_handshake_ms']['count'] == 2
+    assert stats['tls_sessions_reused'] == 1
+
+def test_dns_cache_stays_inside_the_transport(tls_app, monkeypatch):
+    monkeypatch.setenv('TLS_VERIFY', tls_app[1])
+    monkeypatch.setenv('DNS_CACHE_TTL', '300')
+    original = socket.getaddrinfo
+    transport = Transport(pool_size=2)
+    assert socket.getaddrinfo is original  # El resolver del proceso no se toca
+    request = tls_request(tls_app[0])
+
+    handler = RequestHandler(pool_size=2, transport=transport)
+    for _ in range(2):
+        assert handler.fetch_baseline(request)['status_code'] == 200
+        handler.session.close()  # Fuerza una conexión nueva en la siguiente vuelta
+    assert transport.stats_snapshot()['dns_cache']['misses'] == 1
+    assert transport.stats_snapshot()['dns_cache']['hits'] == 1
+
+    async def run():
+        handler = AsyncRequestHandler(max_connections=2, transport=transport)
+        result = await handler.test_parameter(request, 'artist', '1')
+        await handler.close()
+        return result
+
+    assert asyncio.run(run())['status_code'] == 200
+    stats = transport.stats_snapshot()
+    assert stats['dns_cache']['hits'] == 2  # httpx resuelve con la misma caché
+    assert stats['new_connections'] == 3
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Importación en streaming de exportaciones de tráfico (HAR y XML de Burp) como requests raw
+"""
+
+import base64
+import fnmatch
+import json
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from http_parser import HEADER_END, HttpRequest
+
+# Inicio del array de entradas de un HAR ({"log": {..., "entries": [...]}})
+HAR_ENTRIES_START = re.compile(r'"entries"\s*:\s*\[')
+# Separadores entre entradas del array
+HAR_SEPARATORS = re.compile(r'[\s,]*')
+# Tokens que cambian la profundidad o el estado de string al saltar una entrada sin decodificarla
+JSON_STRUCTURE = re.compile(r'["\\{}\[\]]')
+# Pseudo-headers de HTTP/2 que los navegadores incluyen en los HAR
+PSEUDO_HEADER_PREFIX = ':'
+
+def source_format(path: str) -> str:
+    """Formato del origen del batch: 'dir', 'har', 'burp' o 'jsonl' (por extensión o por el contenido)"""
+    if os.path.isdir(path):
+        return 'dir'
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.har':
+        return 'har'
+    if extension == '.xml':
+        return 'burp'
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        head = f.read(512).lstrip()
+    if head.startswith('<'):
+        return 'burp'
+    if re.match(r'\{\s*"log"\s*:', head):
+        return 'har'
+    return 'jsonl'
+
+def split_patterns(value: Optional[str]) -> List[str]:
+    return [pattern.strip().lower() for pattern in (value or '').split(',') if pattern.strip()]
+
+class RequestFilter:
+    """Filtro por host, método y content-type que se aplica mientras se lee el origen
+
+    - hosts: patrones fnmatch contra el host con y sin puerto ('*.example.com', 'api.test:8443')
+    - methods: métodos aceptados ('GET,POST')
+    - content_types: subcadenas del Content-Type ('json,form'); las requests sin body pasan siempre
+    Un criterio vacío no filtra. Se cuentan las requests aceptadas y descartadas.
+    """
+
+    def __init__(self, hosts: List[str] = None, methods: List[str] = None, content_types: List[str] = None):
+        self.hosts = [host.lower() for host in hosts or []]
+        self.methods = {method.upper() for method in methods or []}
+        self.content_types = [content_type.lower() for content_type in content_types or []]
+        self.accepted = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_options(cls, hosts: str = None, methods: str = None, content_types: str = None) -> 'RequestFilter':
+        """Filtro a partir de listas separadas por comas (opciones --filter-* o IMPORT_FILTER_*)"""
+        return cls(split_patterns(hosts), split_patterns(methods), split_patterns(content_types))
+
+    def is_empty(self) -> bool:
+        return not (self.hosts or self.methods or self.content_types)
+
+    def matches(self, method: str, netloc: str, content_type: str = None, has_body: bool = False) -> bool:
+        accepted = self._matches(method, netloc.lower(), (content_type or '').lower(), has_body)
+        if accepted:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+        return accepted
+
+    def _matches(self, method: str, netloc: str, content_type: str, has_body: bool) -> bool:
+        if self.methods and method.upper() not in self.methods:
+            return False
+        if self.hosts:
+            hostname = netloc.rsplit(':', 1)[0] if ':' in netloc and not netloc.endswith(']') else netloc
+            if not any(fnmatch.fnmatchcase(hostname, pattern) or fnmatch.fnmatchcase(netloc, pattern)
+                       for pattern in self.hosts):
+                return False
+        if self.content_types and has_body:
+            return any(pattern in content_type for pattern in self.content_types)
+        return True
+
+    def stats(self) -> Dict:
+        return {'accepted': self.accepted, 'rejected': self.rejected}
+
+def raw_request_summary(raw_request: str) -> Tuple[str, str, str, bool]:
+    """(método, host, content-type, tiene body) leyendo solo la primera línea y los headers"""
+    header_end = HEADER_END.search(raw_request)
+    head = raw_request[:header_end.start()] if header_end else raw_request
+    lines = head.strip().split('\n')
+    parts = lines[0].split()
+    method = parts[0] if parts else ''
+    target = parts[1] if len(parts) > 1 else ''
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(':')
+        headers.setdefault(key.strip().lower(), value.strip())
+    netloc = urlsplit(target).netloc if target.startswith(('http://', 'https://')) else headers.get('host', '')
+    has_body = bool(header_end and raw_request[header_end.end():].strip())
+    return method, netloc, headers.get('content-type', ''), has_body
+
+class HarReader:
+    """Lee las entradas de un HAR una a una sin cargar el archivo completo
+
+    Se lee por bloques de HAR_CHUNK_KB y cada entrada se decodifica con json en cuanto está completa;
+    si una entrada aún no cabe en el buffer se amplía al doble (coste lineal en su tamaño). Las
+    entradas de más de HAR_MAX_ENTRY_MB (p.ej. respuestas enormes embebidas) se saltan sin
+    decodificarlas, así que la memoria queda acotada por ese límite y no por el tamaño del archivo.
+    """
+
+    def __init__(self, path: str, chunk_size: int = None, max_entry_bytes: int = None):
+        self.path = path
+        self.chunk_size = chunk_size or int(os.getenv("HAR_CHUNK_KB", "1024")) * 1024
+        self.max_entry_bytes = max_entry_bytes or int(os.getenv("HAR_MAX_ENTRY_MB", "64")) * 1024 * 1024
+        self.decoder = json.JSONDecoder()
+
+    def entries(self) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Pares (índice, entrada); la entrada es None si se saltó por tamaño o por JSON inválido"""
+        with open(self.path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            buffer = ''
+            while True:
+                match = HAR_ENTRIES_START.search(buffer)
+                if match:
+                    buffer = buffer[match.end():]
+                    break
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    return  # HAR sin entradas
+                buffer = buffer[-32:] + chunk  # Solapamiento: la clave puede quedar partida entre bloques
+
+            index, position, eof = 0, 0, False
+            while True:
+                position = HAR_SEPARATORS.match(buffer, position).end()
+                if position >= len(buffer):
+                    if eof:
+                        return
+                    buffer, position = f.read(self.chunk_size), 0
+                    eof = not buffer
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    entry, end = self.decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    pending = len(buffer) - position
+                    if eof or pending > self.max_entry_bytes:
+                        # Entrada inválida o demasiado grande: se salta hasta su cierre sin decodificarla
+                        buffer, position, eof = self._skip_entry(f, buffer, position)
+                        yield index, None
+                        index += 1
+                        continue
+                    # Entrada incompleta: se amplía el buffer al menos al doble de lo pendiente
+                    chunk = f.read(max(self.chunk_size, pending))
+                    eof = not chunk
+                    buffer, position = buffer[position:] + chunk, 0
+                    continue
+                yield index, entry
+                index += 1
+                position = end
+                if position > self.chunk_size:
+                    buffer, position = buffer[position:], 0
+
+    def _skip_entry(self, f, buffer: str, position: int) -> Tuple[str, int, bool]:
+        """Avanza hasta el cierre del objeto que empieza en position siguiendo strings y llaves"""
+        depth, in_string, escaped_at = 0, False, -1
+        while True:
+            for token in JSON_STRUCTURE.finditer(buffer, position):
+                index, char = token.start(), token.group()
+                if index == escaped_at:
+                    continue
+                if in_string:
+                    if char == '\\':
+                        escaped_at = index + 1
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in '{[':
+                    depth += 1
+                elif char in '}]':
+                    depth -= 1
+                    if depth <= 0:
+                        return buffer, index + 1, False
+            escaped_at -= len(buffer)
+            buffer, position = f.read(self.chunk_size), 0
+            if not buffer:
+                return '', 0, True
+
+def har_request(entry: Dict) -> Optional[Tuple[str, str, List[Tuple[str, str]], str]]:
+    """(método, URL, headers, body) de una entrada HAR; None si no es una request http(s)"""
+    request = entry.get('request') or {}
+    url = urlsplit(request.get('url', ''))
+    if url.scheme not in ('http', 'https') or not url.netloc:
+        return None
+    headers = [(header.get('name', ''), header.get('value', '')) for header in request.get('headers', [])
+               if header.get('name') and not header['name'].startswith(PSEUDO_HEADER_PREFIX)]
+    post_data = request.get('postData') or {}
+    body = post_data.get('text')
+    if body is None and post_data.get('params'):
+        body = urlencode([(param.get('name', ''), param.get('value', '')) for param in post_data['params']])
+    elif body and post_data.get('encoding') == 'base64':
+        body = base64.b64decode(body).decode('utf-8', errors='replace')
+    if post_data.get('mimeType') and not any(name.lower() == 'content-type' for name, _ in headers):
+        headers.append(('Content-Type', post_data['mimeType']))
+    if not any(name.lower() == 'host' for name, _ in headers):
+        headers.insert(0, ('Host', url.netloc))
+    return request.get('method', 'GET'), url._replace(fragment='').geturl(), headers, body or ''
+
+def iter_har_requests(path: str, request_filter: RequestFilter = None) -> Iterator[Tuple[str, object]]:
+    """Pares (target_id, raw_request) de un HAR, filtrados mientras se lee"""
+    reader = HarReader(path)
+    for index, entry in reader.entries():
+        target_id = f"entry-{index}"
+        if entry is None:
+            yield target_id, {'error': "Entrada HAR inválida o mayor que HAR_MAX_ENTRY_MB"}
+            continue
+        parsed = har_request(entry)
+        if parsed is None:
+            continue
+        method, target, headers, body = parsed
+        content_type = next((value for name, value in headers if name.lower() == 'content-type'), '')
+        if request_filter is not None and \
+                not request_filter.matches(method, urlsplit(target).netloc, content_type, bool(body)):
+            continue
+        raw_headers = ''.join(f"{name}: {value}\r\n" for name, value in headers)
+        # Forma absoluta: HttpRequest toma el esquema y el host de la primera línea
+        yield target_id, f"{method} {target} HTTP/1.1\r\n{raw_headers}\r\n{body}"
+
+def iter_burp_requests(path: str, request_filter: RequestFilter = None) -> Iterator[Tuple[str, object]]:
+    """Pares (target_id, raw_request) de una exportación XML de Burp ('Save items'), con iterparse
+
+    Cada <item> se libera en cuanto se procesa: la memoria no crece con el número de items.
+    """
+    root = None
+    index = 0
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        if event != 'end' or element.tag != 'item':
+            continue
+        target_id = f"item-{index}"
+        index += 1
+        try:
+            yield from burp_item_request(target_id, element, request_filter)
+        finally:
+            element.clear()
+            root.clear()  # El root guarda referencias a los items ya procesados
+
+def burp_item_request(target_id: str, item, request_filter: RequestFilter = None) -> Iterator[Tuple[str, object]]:
+    request_element = item.find('request')
+    if request_element is None or not request_element.text:
+        return
+    text = request_element.text
+    if request_element.get('base64') == 'true':
+        text = base64.b64decode(text).decode('utf-8', errors='replace')
+    method, netloc, content_type, has_body = raw_request_summary(text)
+    protocol = (item.findtext('protocol') or 'http').lower()
+    host = item.findtext('host') or netloc
+    port = item.findtext('port') or ''
+    default_port = {'http': '80', 'https': '443'}.get(protocol)
+    origin_netloc = host if not port or port == default_port else f"{host}:{port}"
+    if request_filter is not None and not request_filter.matches(method, origin_netloc, content_type, has_body):
+        return
+    # Primera línea en forma absoluta con el esquema de la exportación (el Host puede no indicarlo)
+    first_line, separator, rest = text.partition('\n')
+    parts = first_line.split()
+    if len(parts) >= 2 and not parts[1].startswith(('http://', 'https://')):
+        parts[1] = f"{protocol}://{origin_netloc}{parts[1]}"
+        text = ' '.join(parts) + ('\r' if first_line.endswith('\r') else '') + separator + rest
+    yield target_id, text
+
+def iter_import(path: str, request_filter: RequestFilter = None, source: str = None) -> Iterator[Tuple[str, object]]:
+    """Pares (target_id, raw_request) de un HAR o de un XML de Burp según el formato detectado"""
+    source = source or source_format(path)
+    if source == 'har':
+        return iter_har_requests(path, request_filter)
+    if source == 'burp':
+        return iter_burp_requests(path, request_filter)
+    raise ValueError(f"Formato de importación no soportado: {source}")
+
+def iter_http_requests(path: str, request_filter: RequestFilter = None, scheme: str = None) -> Iterator[HttpRequest]:
+    """HttpRequest compiladas una a una a partir de la exportación (las entradas inválidas se omiten)"""
+    for target_id, raw_request in iter_import(path, request_filter):
+        if isinstance(raw_request, dict):
+            continue
+        try:
+            yield HttpRequest(raw_request, scheme=scheme)
+        except Exception as e:
+            print(f"[IMPORT] {target_id}: request inválida ({str(e)})")
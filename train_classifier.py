@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento y evaluación del clasificador local (ml_detector.py) a partir de muestras etiquetadas
+"""
+
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+from main import get_option
+from ml_detector import DEFAULT_DIMENSIONS, DEFAULT_MODEL_FILE, LinearModel, np
+from scan_metrics import percentile
+
+def load_samples(paths: List[str]) -> List[Tuple[str, int]]:
+    """Lee muestras JSONL ({"text", "label"}) y elimina textos duplicados"""
+    samples = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get('text') is None or entry.get('label') is None:
+                    continue
+                samples[entry['text']] = int(entry['label'])
+    return list(samples.items())
+
+def split_samples(samples: List[Tuple[str, int]], eval_split: float):
+    """Separa train/eval por hash del texto: la partición es estable entre ejecuciones"""
+    train, evaluation = [], []
+    for text, label in samples:
+        bucket = zlib.crc32(text.encode('utf-8')) % 100
+        (evaluation if bucket < eval_split * 100 else train).append((text, label))
+    return train, evaluation
+
+def evaluate(model: LinearModel, samples: List[Tuple[str, int]], positive_threshold: float,
+             negative_threshold: float) -> Dict:
+    """Métricas con umbral 0.5 y proporción de casos que el modelo decide sin escalar a OpenAI"""
+    true_positive = false_positive = true_negative = false_negative = 0
+    decisive = decisive_errors = 0
+    latencies = []
+    for text, label in samples:
+        start = time.perf_counter()
+        probability = model.predict_proba(text)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        predicted = probability >= 0.5
+        if predicted and label:
+            true_positive += 1
+        elif predicted:
+            false_positive += 1
+        elif label:
+            false_negative += 1
+        else:
+            true_negative += 1
+        if probability >= positive_threshold or probability <= negative_threshold:
+            decisive += 1
+            decisive_errors += int(predicted != bool(label))
+
+    total = len(samples)
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 0.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 0.0
+    return {
+        'samples': total,
+        'accuracy': round((true_positive + true_negative) / total, 4) if total else 0.0,
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        'false_positives': false_positive,
+        'false_negatives': false_negative,
+        # Casos decididos localmente y errores entre ellos: el resto se escala a OpenAI
+        'decisive_rate': round(decisive / total, 4) if total else 0.0,
+        'decisive_errors': decisive_errors,
+        'p50_us': round(percentile(latencies, 50), 1),
+        'p95_us': round(percentile(latencies, 95), 1)
+    }
+
+def main():
+    """Entrena un modelo nuevo (o evalúa uno existente con --eval-only)"""
+    paths = [arg for arg in sys.argv[1:] if arg.endswith('.jsonl')]
+    if not paths:
+        print("Uso: python3 train_classifier.py <muestras.jsonl> [...] [--output sqli_classifier.npz] "
+              "[--eval-split 0.2] [--epochs 20] [--dimensions 262144]")
+        print("Uso: python3 train_classifier.py <muestras.jsonl> --eval-only [--model sqli_classifier.npz]")
+        print("Las muestras se generan con: python3 main.py request.txt --samples muestras.jsonl")
+        return
+    if np is None:
+        print("[ERROR] El clasificador necesita NumPy: pip install numpy")
+        return
+
+    positive_threshold = float(os.getenv("ML_POSITIVE_THRESHOLD", "0.9"))
+    negative_threshold = float(os.getenv("ML_NEGATIVE_THRESHOLD", "0.1"))
+    samples = load_samples(paths)
+    positives = sum(label for _, label in samples)
+    print(f"[MUESTRAS] {len(samples)} únicas | positivas: {positives} | negativas: {len(samples) - positives}")
+
+    if '--eval-only' in sys.argv:
+        model_path = get_option('--model', os.getenv("ML_MODEL_PATH", DEFAULT_MODEL_FILE))
+        model = LinearModel.load(model_path)
+        evaluation = samples
+    else:
+        train, evaluation = split_samples(samples, float(get_option('--eval-split', '0.2')))
+        print(f"[ENTRENANDO] train: {len(train)} | eval: {len(evaluation)}")
+        start = time.perf_counter()
+        model = LinearModel(int(get_option('--dimensions', str(DEFAULT_DIMENSIONS)))).fit(
+            [text for text, _ in train],
+            [label for _, label in train],
+            epochs=int(get_option('--epochs', '20'))
+        )
+        print(f"[ENTRENANDO] {time.perf_counter() - start:.2f}s")
+        model_path = get_option('--output', DEFAULT_MODEL_FILE)
+        model.save(model_path)
+        print(f"Modelo guardado en: {model_path}")
+
+    if not evaluation:
+        print("[EVAL] Sin muestras de evaluación")
+        return
+    metrics = evaluate(model, evaluation, positive_threshold, negative_threshold)
+    print(f"[EVAL] {json.dumps(metrics, ensure_ascii=False)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Capa de transporte HTTP: esquema del target, pools por host, TLS compartido, HTTP/2, caché DNS y estadísticas de conexión
+"""
+
+import asyncio
+import os
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import certifi
+import requests
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from scan_metrics import percentile
+
+try:
+    import h2  # noqa: F401  (httpx solo negocia HTTP/2 si está instalado)
+    HTTP2_AVAILABLE = True
+except ImportError:  # Dependencia opcional: sin h2 se usa HTTP/1.1 con keep-alive
+    HTTP2_AVAILABLE = False
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+def detect_scheme(host: str, headers: Dict[str, str], scheme: str = None) -> str:
+    """Esquema del target: explícito, por puerto del Host o por Origin/Referer del mismo host
+
+    scheme (o TARGET_SCHEME) puede ser 'http', 'https' o 'auto'. Sin indicios se usa http.
+    """
+    scheme = (scheme or os.getenv("TARGET_SCHEME", "auto")).lower()
+    if scheme in ('http', 'https'):
+        return scheme
+    port = host.rsplit(':', 1)[1] if ':' in host and not host.endswith(']') else ''
+    if port == '443':
+        return 'https'
+    if port == '80':
+        return 'http'
+    # Las requests capturadas en el navegador llevan Origin/Referer con el esquema real
+    lowered = {key.lower(): value for key, value in headers.items()}
+    for header in ('origin', 'referer'):
+        parsed = urlparse(lowered.get(header, ''))
+        if parsed.netloc == host and parsed.scheme in ('http', 'https'):
+            return parsed.scheme
+    return 'http'
+
+def tls_verify_from_env():
+    """TLS_VERIFY: 1 (CAs de certifi), 0 (sin verificar) o ruta a un bundle/directorio de CAs"""
+    value = os.getenv("TLS_VERIFY", "1")
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    return value
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSLContext que ofrece en cada handshake la última sesión TLS obtenida con el mismo host
+
+    Funciona con wrap_socket (urllib3) y wrap_bio (httpx/anyio). La sesión se lee del último socket
+    del host al abrir la siguiente conexión: con TLS 1.3 el ticket llega después del handshake, con
+    la primera respuesta. Si el servidor no acepta la sesión se hace un handshake completo.
+    """
+
+    def __init__(self, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        super().__init__()
+        self.resumption = os.getenv("TLS_SESSION_RESUMPTION", "1") != "0"
+        self.session_lock = threading.Lock()
+        self.tls_peers = {}  # server_hostname -> último SSLSocket/SSLObject
+        self.tls_sessions = {}  # server_hostname -> última sesión reanudable
+
+    def session_for(self, server_hostname: Optional[str]) -> Optional[ssl.SSLSession]:
+        if not self.resumption or not server_hostname:
+            return None
+        peer = self.tls_peers.get(server_hostname)
+        if peer is not None:
+            self.save_session(peer)
+        return self.tls_sessions.get(server_hostname)
+
+    def save_session(self, peer):
+        """Guarda la sesión de un socket TLS; urllib3 lo llama antes de cerrar la conexión"""
+        try:
+            session = peer.session
+        except (AttributeError, ValueError, OSError):  # Socket ya cerrado o sin handshake
+            return
+        if session is not None and (session.has_ticket or session.id) and peer.server_hostname:
+            with self.session_lock:
+                self.tls_sessions[peer.server_hostname] = session
+
+    def remember(self, server_hostname: Optional[str], peer):
+        if self.resumption and server_hostname:
+            with self.session_lock:
+                self.tls_peers[server_hostname] = peer
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        session = session or self.session_for(server_hostname)
+        ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+        self.remember(server_hostname, ssl_sock)
+        return ssl_sock
+
+    def wrap_bio(self, incoming, outgoing, *args, server_hostname=None, session=None, **kwargs):
+        session = session or self.session_for(server_hostname)
+        ssl_object = super().wrap_bio(incoming, outgoing, *args, server_hostname=server_hostname, session=session,
+                                      **kwargs)
+        self.remember(server_hostname, ssl_object)
+        return ssl_object
+
+def build_ssl_context(verify, alpn_protocols) -> ssl.SSLContext:
+    """SSLContext compartido por todas las conexiones: los CAs se cargan una sola vez y las sesiones se reanudan"""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify is False:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context.load_verify_locations(cafile=certifi.where())
+    elif os.path.isdir(verify):
+        context.load_verify_locations(capath=verify)
+    else:
+        context.load_verify_locations(cafile=verify)
+    context.set_alpn_protocols(alpn_protocols)
+    return context
+
+class DNSCache:
+    """Caché de socket.getaddrinfo con TTL, compartida por requests (urllib3) y httpx del mismo transporte
+
+    Solo la usan las conexiones del transporte (socket.getaddrinfo del proceso no se toca); los errores
+    de resolución no se cachean.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # Argumentos de getaddrinfo -> (expira, resultado)
+        self.hits = 0
+        self.misses = 0
+        self._getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+        result = self._getaddrinfo(host, port, family, type, proto, flags)
+        with self.lock:
+            self.entries[key] = (now + self.ttl, tuple(result))
+        return result
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'ttl_s': self.ttl}
+
+class CachedDNSBackend:
+    """Backend de red de httpcore que resuelve con la DNSCache del transporte y delega la conexión
+
+    Prueba las direcciones en orden, como socket.create_connection; el SNI sigue usando el host.
+    """
+
+    def __init__(self, dns_cache: DNSCache):
+        # Import diferido: httpcore llega con httpx, que solo se importa en modo asíncrono
+        import httpcore
+        self.dns_cache = dns_cache
+        self.backend = httpcore.AnyIOBackend()
+        self.connect_errors = (httpcore.ConnectError, httpcore.ConnectTimeout)
+
+    async def connect_tcp(self, host: str, port: int, timeout: float = None, local_address: str = None,
+                          socket_options=None):
+        addresses = await asyncio.to_thread(self.dns_cache.getaddrinfo, host, port, 0, socket.SOCK_STREAM)
+        error = None
+        for *_, address in addresses:
+            try:
+                return await self.backend.connect_tcp(address[0], port, timeout, local_address, socket_options)
+            except self.connect_errors as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: float = None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+class ConnectionStats:
+    """Contadores de conexión thread-safe: conexiones nuevas vs. reutilizadas y tiempos de handshake"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_ms = []  # DNS + TCP
+        self.tls_ms = []
+        self.tls_resumed = 0
+        self.http_versions = {}
+
+    def record_connect(self, connect_ms: float, tls_ms: Optional[float] = None, session_reused: bool = False):
+        with self.lock:
+            self.new_connections += 1
+            self.connect_ms.append(connect_ms)
+            if tls_ms is not None:
+                self.tls_ms.append(tls_ms)
+                self.tls_resumed += int(bool(session_reused))
+
+    def record_request(self, http_version: str):
+        with self.lock:
+            self.requests += 1
+            self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused': reused,
+                'reuse_ratio': round(reused / self.requests, 4) if self.requests else 0.0,
+                'connect_ms': self._summary(self.connect_ms),
+                'tls_handshake_ms': self._summary(self.tls_ms),
+                'tls_sessions_reused': self.tls_resumed,
+                'tls_resumption_ratio': round(self.tls_resumed / len(self.tls_ms), 4) if self.tls_ms else 0.0,
+                'http_versions': dict(self.http_versions)
+            }
+
+    @staticmethod
+    def _summary(values) -> Dict:
+        return {
+            'count': len(values),
+            'p50': round(percentile(values, 50), 3),
+            'p95': round(percentile(values, 95), 3),
+            'total': round(sum(values), 3)
+        }
+
+class _TimedConnection:
+    """Mixin para las conexiones de urllib3: mide DNS + TCP y el handshake TLS de cada conexión nueva"""
+
+    stats = None  # ConnectionStats de la capa de transporte (se fija al crear la subclase)
+    dns_cache = None  # DNSCache del transporte (None = resolución normal)
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn() if self.dns_cache is None else self._new_conn_cached()
+        self._connect_ms = (time.perf_counter() - start) * 1000
+        return sock
+
+    def _new_conn_cached(self):
+        """Conecta a las direcciones de la caché DNS: urllib3 recibe la IP y el SNI sigue usando el host"""
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.getaddrinfo(host.strip('[]'), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        error = None
+        try:
+            for *_, address in addresses:
+                self._dns_host = address[0]
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    error = e
+        finally:
+            self._dns_host = host
+        raise error or NewConnectionError(self, "getaddrinfo no devolvió direcciones")
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        total_ms = (time.perf_counter() - start) * 1000
+        connect_ms = getattr(self, '_connect_ms', total_ms)
+        tls_ms = total_ms - connect_ms if isinstance(self, HTTPSConnection) else None
+        self.stats.record_connect(connect_ms, tls_ms, getattr(self.sock, 'session_reused', False))
+
+    def close(self):
+        # Al cerrar el socket se pierde su sesión: se guarda antes para la próxima conexión al host
+        if isinstance(getattr(self, 'ssl_context', None), ResumingSSLContext) and self.sock is not None:
+            self.ssl_context.save_session(self.sock)
+        super().close()
+
+class TransportAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter con pools por host, un SSLContext compartido y conexiones instrumentadas"""
+
+    def __init__(self, ssl_context: ssl.SSLContext, stats: ConnectionStats, dns_cache: DNSCache = None, **kwargs):
+        self.ssl_context = ssl_context
+        attributes = {'stats': stats, 'dns_cache': dns_cache}
+        connection_classes = {
+            'http': type('TimedHTTPConnection', (_TimedConnection, HTTPConnection), attributes),
+            'https': type('TimedHTTPSConnection', (_TimedConnection, HTTPSConnection), attributes)
+        }
+        self.pool_classes = {
+            'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': connection_classes['http']}),
+            'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': connection_classes['https']})
+        }
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, ssl_context=self.ssl_context, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        # Los CAs ya están en el SSLContext compartido: no se recargan en cada conexión
+        if verify is not False and hasattr(conn, 'ca_certs'):
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+
+class Transport:
+    """Configuración de conexiones compartida por RequestHandler y AsyncRequestHandler
+
+    - HTTP_POOL_SIZE: conexiones keep-alive por host (por defecto pool_size)
+    - HTTP_POOL_HOSTS: hosts con pool propio en la sesión síncrona
+    - HTTP_KEEPALIVE_EXPIRY: segundos que una conexión ociosa sigue abierta (cliente asíncrono)
+    - HTTP2: multiplexación HTTP/2 vía ALPN en el cliente asíncrono (requiere h2)
+    - TLS_VERIFY: verificación de certificados (1, 0 o ruta a CAs)
+    - TLS_SESSION_RESUMPTION: reanudar la sesión TLS del host en las conexiones nuevas (1 por defecto)
+    - DNS_CACHE_TTL: segundos de la caché DNS (0 = desactivada)
+    """
+
+    def __init__(self, pool_size: int = 10, http2: bool = None):
+        self.pool_size = int(os.getenv("HTTP_POOL_SIZE", str(pool_size)))
+        self.pool_hosts = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.timeout = int(os.getenv("REQUEST_TIMEOUT", "10"))
+        http2 = http2 if http2 is not None else os.getenv("HTTP2", "1") != "0"
+        if http2 and not HTTP2_AVAILABLE:
+            print("[TRANSPORTE] h2 no está instalado: se usa HTTP/1.1 (pip install h2)")
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.verify = tls_verify_from_env()
+        if self.verify is False:
+            requests.packages.urllib3.disable_warnings()
+        # urllib3 solo habla HTTP/1.1: cada cliente anuncia por ALPN lo que soporta
+        self.sync_ssl_context = build_ssl_context(self.verify, ['http/1.1'])
+        self.async_ssl_context = build_ssl_context(self.verify, ['h2', 'http/1.1'] if self.http2 else ['http/1.1'])
+        dns_ttl = float(os.getenv("DNS_CACHE_TTL", "300"))
+        # Caché propia del transporte: solo la usan sus conexiones (urllib3 y httpx)
+        self.dns_cache = DNSCache(dns_ttl) if dns_ttl > 0 else None
+        self.stats = ConnectionStats()
+
+    def create_session(self) -> requests.Session:
+        """Sesión síncrona con pool por host y conexiones instrumentadas"""
+        session = requests.Session()
+        session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+        session.verify = self.verify
+        adapter = TransportAdapter(self.sync_ssl_context, self.stats, self.dns_cache, pool_connections=self.pool_hosts,
+                                   pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def create_async_client(self, max_connections: int) -> 'httpx.AsyncClient':
+        """Cliente asíncrono con HTTP/2 (si está disponible) y keep-alive"""
+        # Import diferido: el modo secuencial no necesita httpx y su import pesa en el arranque
+        import httpcore
+        import httpx
+        transport = httpx.AsyncHTTPTransport(
+            verify=self.async_ssl_context,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        )
+        if self.dns_cache is not None:
+            # Mismo pool que arma httpx, pero resolviendo con la caché DNS del transporte
+            transport._pool = httpcore.AsyncConnectionPool(
+                ssl_context=self.async_ssl_context,
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+                http1=True,
+                http2=self.http2,
+                network_backend=CachedDNSBackend(self.dns_cache)
+            )
+        return httpx.AsyncClient(
+            headers={'User-Agent': DEFAULT_USER_AGENT},
+            transport=transport,
+            timeout=self.timeout
+        )
+
+    def async_trace(self, url: str):
+        """Callback 'trace' de httpcore para una request: registra la conexión nueva y sus handshakes"""
+        # La conexión queda lista tras el TCP (http) o tras el handshake TLS (https)
+        last_step = 'start_tls' if url.startswith('https://') else 'connect_tcp'
+        started = {}
+        timings = {}
+
+        async def trace(event_name: str, info: Dict):
+            if not event_name.startswith('connection.'):
+                return
+            step, _, phase = event_name[len('connection.'):].rpartition('.')
+            if phase == 'started':
+                started[step] = time.perf_counter()
+            elif phase == 'complete' and step in started:
+                timings[step] = (time.perf_counter() - started[step]) * 1000
+                if step == last_step:
+                    ssl_object = None
+                    if step == 'start_tls' and info.get('return_value') is not None:
+                        ssl_object = info['return_value'].get_extra_info('ssl_object')
+                    self.stats.record_connect(timings.get('connect_tcp', 0.0), timings.get('start_tls'),
+                                              getattr(ssl_object, 'session_reused', False))
+
+        return trace
+
+    def stats_snapshot(self) -> Dict:
+        """Estadísticas de conexión y de la caché DNS para el reporte"""
+        stats = self.stats.snapshot()
+        stats['http2_enabled'] = self.http2
+        stats['dns_cache'] = self.dns_cache.stats() if self.dns_cache is not None else None
+        return stats
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajo compartida en SQLite para el modo coordinador/workers (procesos locales u otras máquinas)
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# Estados de una unidad (target, parámetro)
+FINISHED_STATUSES = ('done', 'error', 'skipped')
+
+class WorkQueue:
+    """Unidades (target, parámetro) repartidas entre workers a través de un archivo SQLite
+
+    - El coordinador encola los targets y sus parámetros y cierra la cola al terminar de leer el origen
+    - Cada worker reclama una unidad con una transacción IMMEDIATE, la escanea y guarda su reporte
+    - Una unidad reclamada hace más de WORK_LEASE_SECONDS vuelve a 'pending' (worker caído)
+    - Cuando una unidad encuentra una vulnerabilidad, las pendientes del mismo target se marcan
+      'skipped' (la parada temprana del scan secuencial, entre procesos)
+
+    Para workers en otras máquinas el archivo debe estar en un sistema de archivos compartido con
+    bloqueos fiables; en ese caso conviene WORK_QUEUE_WAL=0 (WAL requiere memoria compartida local).
+    """
+
+    def __init__(self, path: str, lease_seconds: float = None):
+        self.path = path
+        self.lease_seconds = lease_seconds or float(os.getenv("WORK_LEASE_SECONDS", "900"))
+        # Autocommit: las transacciones se abren explícitamente donde hace falta atomicidad
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        if os.getenv("WORK_QUEUE_WAL", "1") != "0":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS targets (seq INTEGER PRIMARY KEY, target_id TEXT, raw_request TEXT, "
+            "units INTEGER, emitted INTEGER DEFAULT 0)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS units (id INTEGER PRIMARY KEY, target_seq INTEGER, parameter TEXT, "
+            "status TEXT DEFAULT 'pending', worker TEXT, claimed_at REAL, vulnerable INTEGER DEFAULT 0, "
+            "result TEXT, merged INTEGER DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS units_status ON units (status, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS units_target ON units (target_seq)")
+
+    def reset(self, payloads: List[str]):
+        """Vacía la cola para un scan nuevo y publica los payloads que usarán todos los workers"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        for table in ('meta', 'targets', 'units'):
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.execute("INSERT INTO meta VALUES ('payloads', ?)", (json.dumps(payloads),))
+        self.conn.execute("COMMIT")
+
+    def payloads(self) -> List[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'payloads'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    def enqueue(self, target_id: str, raw_request: str, parameters: List[str]) -> int:
+        """Encola un target con una unidad por parámetro; devuelve su número de secuencia"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        cursor = self.conn.execute("INSERT INTO targets (target_id, raw_request, units) VALUES (?, ?, ?)",
+                                   (target_id, raw_request, len(parameters)))
+        seq = cursor.lastrowid
+        self.conn.executemany("INSERT INTO units (target_seq, parameter) VALUES (?, ?)",
+                              [(seq, parameter) for parameter in parameters])
+        self.conn.execute("COMMIT")
+        return seq
+
+    def close(self):
+        """Marca que no se encolarán más targets (los workers terminan al vaciarse la cola)"""
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('closed', '1')")
+
+    def is_closed(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM meta WHERE key = 'closed'").fetchone() is not None
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Reclama la siguiente unidad pendiente (None si no hay ninguna)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Unidades de workers caídos: vuelven a la cola
+            self.conn.execute("UPDATE units SET status = 'pending', worker = NULL WHERE status = 'running' "
+                              "AND claimed_at < ?", (time.time() - self.lease_seconds,))
+            row = self.conn.execute(
+                "SELECT units.id, units.target_seq, units.parameter, targets.target_id, targets.raw_request "
+                "FROM units JOIN targets ON targets.seq = units.target_seq "
+                "WHERE units.status = 'pending' ORDER BY units.id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE units SET status = 'running', worker = ?, claimed_at = ? WHERE id = ?",
+                                  (worker, time.time(), row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {'id': row[0], 'target_seq': row[1], 'parameter': row[2], 'target_id': row[3], 'raw_request': row[4]}
+
+    def complete(self, unit: Dict, result: Dict, status: str = 'done'):
+        """Guarda el reporte de una unidad; si es vulnerable salta las pendientes del mismo target"""
+        vulnerable = int(result.get('status') == 'vulnerable')
+        self.conn.execute("BEGIN IMMEDIATE")
+        # Si la unidad se reasignó por lease vencido, gana el primer worker que la termina
+        self.conn.execute("UPDATE units SET status = ?, vulnerable = ?, result = ? WHERE id = ? "
+                          "AND status NOT IN ('done', 'error', 'skipped')",
+                          (status, vulnerable, json.dumps(result, ensure_ascii=False), unit['id']))
+        if vulnerable:
+            self.conn.execute("UPDATE units SET status = 'skipped' WHERE target_seq = ? AND status = 'pending'",
+                              (unit['target_seq'],))
+        self.conn.execute("COMMIT")
+
+    def fail_units(self, error: str, worker: str = None) -> int:
+        """Marca como 'error' las unidades en curso de un worker caído, o todas las no terminadas si no se indica"""
+        result = json.dumps({'status': 'error', 'error': error}, ensure_ascii=False)
+        if worker is not None:
+            cursor = self.conn.execute("UPDATE units SET status = 'error', result = ? WHERE worker = ? "
+                                       "AND status = 'running'", (result, worker))
+        else:
+            cursor = self.conn.execute("UPDATE units SET status = 'error', result = ? "
+                                       "WHERE status IN ('pending', 'running')", (result,))
+        return cursor.rowcount
+
+    def unfinished(self) -> int:
+        """Unidades pendientes o en curso"""
+        return self.conn.execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'running')").fetchone()[0]
+
+    def finished_units(self) -> List[Dict]:
+        """Unidades terminadas que el coordinador aún no ha incorporado al reporte"""
+        rows = self.conn.execute(
+            "SELECT id, target_seq, parameter, status, worker, result FROM units "
+            "WHERE merged = 0 AND status IN ('done', 'error', 'skipped') ORDER BY id"
+        ).fetchall()
+        return [{'id': row[0], 'target_seq': row[1], 'parameter': row[2], 'status': row[3], 'worker': row[4],
+                 'result': json.loads(row[5]) if row[5] else None} for row in rows]
+
+    def mark_merged(self, unit_ids: List[int]):
+        self.conn.executemany("UPDATE units SET merged = 1 WHERE id = ?", [(unit_id,) for unit_id in unit_ids])
+
+    def target_units(self, target_seq: int) -> Optional[List[Dict]]:
+        """Unidades de un target si todas han terminado y el target no se ha emitido (None en otro caso)"""
+        rows = self.conn.execute(
+            "SELECT parameter, status, worker, result FROM units WHERE target_seq = ? ORDER BY id", (target_seq,)
+        ).fetchall()
+        if any(row[1] not in FINISHED_STATUSES for row in rows):
+            return None
+        emitted = self.conn.execute("SELECT target_id, emitted FROM targets WHERE seq = ?", (target_seq,)).fetchone()
+        if emitted[1]:
+            return None
+        self.conn.execute("UPDATE targets SET emitted = 1 WHERE seq = ?", (target_seq,))
+        return [{'target_id': emitted[0], 'parameter': row[0], 'status': row[1], 'worker': row[2],
+                 'result': json.loads(row[3]) if row[3] else None} for row in rows]
+
+    def stats(self) -> Dict:
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall()
+        return dict(rows)